@@ -20,12 +20,39 @@ __email__ = "rprincipe@ciefap.org.ar"
 __license__ = "GNU GENERAL PUBLIC LICENSE, Version 3"
 __copyright__ = "Rodrigo E. Principe"
 
-try:
+# Submodules and objects are imported on first access, so importing the
+# package does not import Earth Engine (nor needs it to be initialized)
+SUBMODULES = ('bap', 'date', 'expgen', 'expressions', 'filters', 'footprints',
+              'functions', 'ipytools', 'local', 'masks', 'priority', 'regdec',
+              'scores', 'season', 'sites', 'transforms', 'utils')
+
+OBJECTS = {'Bap': 'bap',
+           'SeasonPriority': 'priority',
+           'Season': 'season'}
+
+
+def __getattr__(name):
+    import importlib
+    if name in SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    if name in OBJECTS:
+        module = importlib.import_module('.' + OBJECTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(
+        __name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(SUBMODULES) +
+                  list(OBJECTS.keys()))
+
+
+import sys as _sys
+if _sys.version_info < (3, 7):
+    # module __getattr__ is not supported
     from . import bap, date, expgen, expressions, filters, functions,\
         ipytools, masks, regdec, scores, season, sites
 
     from .bap import Bap
     from .priority import SeasonPriority
     from .season import Season
-except ImportError:
-    pass
\ No newline at end of file
@@ -2,9 +2,48 @@
 """ Main module holding the Bap Class and its methods """
 
 from geetools import collection, tools
-from . import scores, priority, functions, utils, __version__
+from . import scores, priority, functions, utils, footprints, \
+    transforms, __version__
 import ee
 import json
+from collections import namedtuple
+
+# Everything `Bap.compute_scores` needs that depends only on the Bap
+# configuration and the year, resolved once by `Bap.compile`. Reuse it
+# (`plan` argument) to compute many sites
+BapPlan = namedtuple('BapPlan', ['year', 'years', 'collections', 'col_ids',
+                                 'col_id_images', 'date_ranges',
+                                 'score_names', 'common_bands'])
+
+# Common bands by collection ids and unique score names by score names,
+# shared by all Bap objects
+_COMMON_BANDS = {}
+_SCORE_NAMES = {}
+
+
+def common_bands(collections):
+    """ Names of the bands that all collections have. The result is computed
+    once for each set of collections
+
+    :rtype: tuple
+    """
+    key = tuple(col.id for col in collections)
+    if key not in _COMMON_BANDS:
+        _COMMON_BANDS[key] = tuple(
+            collection.getCommonBands(*collections, match='name'))
+    return _COMMON_BANDS[key]
+
+
+def nominal_scale(collections, bands):
+    """ Finest scale of the given bands (renamed) in the collections. None
+    if no scale is known
+
+    :rtype: float
+    """
+    scales = [col.getBand(band, 'name').scale for col in collections
+              for band in bands if col.getBand(band, 'name')]
+    scales = [scale for scale in scales if scale]
+    return min(scales) if scales else None
 
 
 class Bap(object):
@@ -27,15 +66,44 @@ class Bap(object):
 
         self.score_name = kwargs.get('score_name', 'score')
 
+        # Store scores as fixed-point unsigned integers (uint8 or uint16)
+        self.score_dtype = kwargs.get('score_dtype', None)
+        if self.score_dtype is not None and \
+                self.score_dtype not in functions.SCORE_DTYPES:
+            msg = 'score_dtype must be one of {} or None, found {}'
+            raise ValueError(msg.format(list(functions.SCORE_DTYPES.keys()),
+                                        self.score_dtype))
+
         # Band names in case user needs different names
         self.bandname_col_id = kwargs.get('bandname_col_id', 'col_id')
         self.bandname_date = kwargs.get('bandname_date', 'date')
 
+        # Satellite priorities (priority.PriorityTable). Used when colgroup
+        # is None
+        self.priority_table = kwargs.get('priority_table', None)
+
+        # Select the scenes of the site by path/row or tile (see footprints)
+        # instead of filtering by bounds
+        self.scene_index = kwargs.get('scene_index', False)
+
+        # Apply the BRDF and the harmonization to every scene or only to the
+        # composite (see functions.CORRECTION_MODES)
+        self.correction = kwargs.get('correction', 'scene')
+        self._correction_mode({'correction': self.correction})
+
+    @property
+    def priorities(self):
+        """ The priority table in use """
+        return self.priority_table or priority.DEFAULT_TABLE
+
     @property
     def score_names(self):
         if self.scores:
-            punt = [p.name for p in self.scores]
-            return functions.replace_duplicate(punt)
+            punt = tuple(p.name for p in self.scores)
+            if punt not in _SCORE_NAMES:
+                _SCORE_NAMES[punt] = tuple(
+                    functions.replace_duplicate(list(punt)))
+            return list(_SCORE_NAMES[punt])
         else:
             return []
 
@@ -43,10 +111,75 @@ class Bap(object):
     def max_score(self):
         """ gets the maximum score it can get """
         maxpunt = 0
-        for score in self.scores:
+        for score in self.scores or []:
             maxpunt += score.max
         return maxpunt
 
+    @property
+    def score_step(self):
+        """ Value of one quantization step of the scores. None if scores are
+        stored as float (`score_dtype=None`) """
+        if self.score_dtype is None or not self.max_score:
+            return None
+        return functions.quantization_step(self.max_score, self.score_dtype)
+
+    def resolve_indices(self, indices=None):
+        """ Split the indices in the ones that scores need, which must be
+        computed in every image, and the ones that are only requested for the
+        output
+
+        :param indices: indices requested for the output
+        :type indices: list
+        :return: (score_indices, output_indices)
+        :rtype: tuple
+        """
+        score_indices = []
+        for score in self.scores or []:
+            for band in score.required_bands:
+                if band in functions.INDICES and band not in score_indices:
+                    score_indices.append(band)
+
+        output_indices = [i for i in indices or [] if i not in score_indices]
+
+        return score_indices, output_indices
+
+    def required_bands(self, col, common_bands, indices=None):
+        """ Bands of the collection that are needed after masking: the
+        common bands, the bands read by the scores and the indices, and the
+        first band (its mask is used for all bands). None if a score needs
+        all the bands
+
+        :param col: the collection
+        :type col: geetools.collection.Collection
+        :param common_bands: the common bands (renamed)
+        :type common_bands: list
+        :param indices: the indices that are computed over the images
+        :type indices: list
+        :return: the original band ids, in the order of the collection
+        :rtype: list
+        """
+        if any(score.requires_all_bands for score in self.scores or []):
+            return None
+
+        names = set(common_bands)
+        for score in self.scores or []:
+            names.update(score.required_bands)
+        for index in indices or []:
+            names.update(functions.INDICES.get(index, ()))
+
+        return [band.id for i, band in enumerate(col.bands)
+                if i == 0 or band.name in names]
+
+    def add_indices(self, image, indices):
+        """ Add the given indices to a composite. As the composite has been
+        renamed and rescaled, the indices are computed using the target
+        collection """
+        if not indices:
+            return image
+        computed = [getattr(self.target_collection, i)(image, renamed=True)
+                    for i in indices]
+        return image.addBands(ee.Image.cat(*computed))
+
     def year_range(self, year):
         try:
             i = year - abs(self.range[0])
@@ -60,10 +193,15 @@ class Bap(object):
         """ Get time start property """
         return ee.Date('{}-{}-{}'.format(year, 1, 1))
 
-    def make_proxy(self, image, collection, year):
-        """ Make a proxy collection """
+    def make_proxy(self, image, collection, year, size=None):
+        """ Make a proxy collection
 
-        size = collection.size()
+        :param size: the size that decides if the proxy is used. Defaults to
+            the size of the collection
+        :type size: ee.Number
+        """
+        if size is None:
+            size = collection.size()
 
         # unmask all bands
         unmasked = image.unmask()
@@ -83,6 +221,102 @@ class Bap(object):
                                                    proxy_col))
 
 
+    def order_scores(self):
+        """ Order the scores for computing. Scores that are used by a
+        `MaskCover` filter go first, so the filter can be applied before the
+        rest. The rest of the scores are sorted by their relative cost.
+
+        :return: (prune_scores, other_scores)
+        :rtype: tuple
+        """
+        props = [filt.prop for filt in self.filters
+                 if filt.name in ['MaskCover']]
+
+        prune_scores = []
+        other_scores = []
+        for score in self.scores or []:
+            if isinstance(score, scores.MaskPercent) and score.name in props:
+                prune_scores.append(score)
+            else:
+                other_scores.append(score)
+
+        other_scores = sorted(other_scores, key=lambda score: score.cost)
+
+        return prune_scores, other_scores
+
+    def _apply_scores(self, collection, score_list, **kwargs):
+        """ Apply a list of scores over a collection """
+        col = kwargs.get('col')
+        slcoff = kwargs.get('slcoff', False)
+        for score in score_list:
+            zero = False if slcoff and isinstance(score, (scores.MaskPercent, scores.MaskPercentKernel)) else True
+            collection = score._map(
+                collection,
+                col=col,
+                year=kwargs.get('year'),
+                colEE=collection,
+                geom=kwargs.get('geom'),
+                include_zero=zero,
+                priority_table=self.priorities)
+        return collection
+
+    def _filter_mask_cover(self, collection, props=None, exclude=None):
+        """ Apply MaskCover filters. If `props` is given only the filters
+        that use those properties are applied, and the ones in `exclude` are
+        skipped """
+        for filt in self.filters:
+            if filt.name not in ['MaskCover']:
+                continue
+            if props is not None and filt.prop not in props:
+                continue
+            if exclude and filt.prop in exclude:
+                continue
+            collection = filt.apply(collection)
+        return collection
+
+    @staticmethod
+    def _clip_mode(kwargs):
+        clip = kwargs.get('clip', 'exact')
+        if clip not in functions.CLIP_MODES:
+            msg = 'clip must be one of {}, found {}'
+            raise ValueError(msg.format(functions.CLIP_MODES, clip))
+        return clip
+
+    def _correction_mode(self, kwargs):
+        correction = kwargs.get('correction', self.correction)
+        if correction not in functions.CORRECTION_MODES:
+            msg = 'correction must be one of {}, found {}'
+            raise ValueError(msg.format(functions.CORRECTION_MODES,
+                                        correction))
+        return correction
+
+    def compile(self, year):
+        """ Resolve the collections, common bands, score names, col_id images
+        and season date ranges for the given year
+
+        :rtype: BapPlan
+        """
+        years = tuple(self.year_range(year))
+        if self.colgroup is None:
+            colgroup = self.priorities.colgroup(year)
+            all_col = self.priorities.all_collections(years)
+        else:
+            all_col = self.colgroup.collections
+            colgroup = self.colgroup
+
+        collections = tuple(colgroup.collections)
+        return BapPlan(
+            year=year,
+            years=years,
+            collections=collections,
+            col_ids=tuple(functions.get_col_id(col) for col in collections),
+            col_id_images=tuple(
+                functions.get_col_id_image(col, self.bandname_col_id)
+                for col in collections),
+            date_ranges=tuple(self.season.add_year(y) for y in years),
+            score_names=tuple(self.score_names),
+            common_bands=common_bands(all_col))
+
     def compute_scores(self, year, site, indices=None, **kwargs):
         """ Add scores and merge collections
 
@@ -90,26 +324,40 @@ class Bap(object):
         :type add_individual_scores: bool
         :param buffer: make a buffer before cutting to the given site
         :type buffer: float
+        :param simplify: simplify the site with this maximum error (meters)
+        :type simplify: float
+        :param clip: 'exact' to clip the images with the site or 'bbox' to
+            clip them with the bounds of the site (the mosaic methods clip
+            the final mosaic with the site)
+        :type clip: str
+        :param plan: the result of `compile(year)`, to reuse it across sites
+        :type plan: BapPlan
+        :param correction: 'scene' to apply the BRDF and the harmonization to
+            every image or 'composite' to leave them for the composite.
+            Defaults to the `correction` of the Bap
+        :type correction: str
         """
         add_individual_scores = kwargs.get('add_individual_scores', False)
-        buffer = kwargs.get('buffer', None)
+        clip = self._clip_mode(kwargs)
+        correct_scenes = self._correction_mode(kwargs) == 'scene'
+        prepared = functions.prepare_site(site, kwargs.get('buffer'),
+                                          kwargs.get('simplify'),
+                                          bool(self.scene_index))
+        site = prepared.geometry
+        if clip == 'bbox':
+            clip_geometry = prepared.bounds
+        else:
+            clip_geometry = site
+
+        plan = kwargs.get('plan') or self.compile(year)
+        if plan.year != year:
+            msg = 'the plan was compiled for {}, not for {}'
+            raise ValueError(msg.format(plan.year, year))
 
         # list to 'collect' collections
         all_collections = ee.List([])
 
-        # TODO: get common bands for col of all years
-        if self.colgroup is None:
-            colgroup = priority.SeasonPriority(year).colgroup
-            all_col = []
-            for year in self.year_range(year):
-                _colgroup = priority.SeasonPriority(year).colgroup
-                for col in _colgroup.collections:
-                    all_col.append(col)
-        else:
-            all_col = self.colgroup.collections
-            colgroup = self.colgroup
-
-        common_bands = collection.getCommonBands(*all_col, match='name')
+        common_bands = list(plan.common_bands)
 
         # add col_id to common bands
         common_bands.append(self.bandname_col_id)
@@ -119,7 +367,7 @@ class Bap(object):
 
         # add score names if 'add_individual_scores'
         if add_individual_scores:
-            for score_name in self.score_names:
+            for score_name in plan.score_names:
                 common_bands.append(score_name)
 
         # add indices to common bands
@@ -130,48 +378,76 @@ class Bap(object):
         # add score band to common bands
         common_bands.append(self.score_name)
 
+        # indices needed by the scores are computed once, even if they are
+        # not requested for the output
+        score_indices, _ = self.resolve_indices(indices)
+        all_indices = score_indices + [i for i in indices or []
+                                       if i not in score_indices]
+
+        # order of the scores
+        prune_scores, other_scores = self.order_scores()
+        prune_props = [score.name for score in prune_scores]
+
         # create an empty score band in case no score is parsed
         empty_score = ee.Image.constant(0).rename(self.score_name).toUint8()
 
         # List to store all used images
         used_images = dict()
 
-        for col in colgroup.collections:
-            col_ee_bounds = col.collection
-
-            # Filter bounds
-            if isinstance(site, ee.Feature): site = site.geometry()
-            col_ee_bounds = col_ee_bounds.filterBounds(site)
-
-            # Collection ID
-            col_id = functions.get_col_id(col)
-            col_id_img = functions.get_col_id_image(col)
-
-            for year in self.year_range(year):
-                daterange = self.season.add_year(year)
-
-                # filter date
-                col_ee = col_ee_bounds.filterDate(daterange.start(),
+        # Filters over the source collections: bounds, the seasons of all
+        # years and cloud cover. The scenes are selected with the site
+        # itself (a spatial filter), even in 'bbox' clip mode where the
+        # bounds are only used to clip the images. With the scene index the
+        # collections that have one are filtered by the path/row or tile
+        # metadata instead (see `footprints.ee_filter`)
+        bounds_filter = ee.Filter.bounds(site)
+        seasons_filter = self.season.ee_filter(plan.years)
+        cover_filters = [filt for filt in self.filters
+                         if filt.name in ['CloudCover']]
+
+        for col, col_id, col_id_img in zip(plan.collections, plan.col_ids,
+                                           plan.col_id_images):
+            # One filter for the source collection (all years)
+            if self.scene_index:
+                col_bounds_filter = footprints.ee_filter(col, prepared.box)
+            else:
+                col_bounds_filter = bounds_filter
+            source_filters = [col_bounds_filter, seasons_filter]
+            for filt in cover_filters:
+                cover_filter = filt.ee_filter(col=col)
+                if cover_filter is not None:
+                    source_filters.append(cover_filter)
+            col_ee_source = col.collection.filter(
+                ee.Filter.And(*source_filters))
+
+            # Bands to keep after masking
+            keep_bands = self.required_bands(col, plan.common_bands,
+                                             all_indices)
+
+            # Gain and offset to rescale and harmonize the kept bands
+            transform = transforms.linear_transform(
+                col, self.target_collection,
+                self.harmonize and correct_scenes)
+            if keep_bands:
+                kept = [band.name for band in col.bands
+                        if band.id in keep_bands]
+                transform = transforms.subset(transform, kept)
+
+            for year, daterange in zip(plan.years, plan.date_ranges):
+                # split the filtered collection by year
+                col_ee = col_ee_source.filterDate(daterange.start(),
                                                   daterange.end())
 
-                # some filters
-                if self.filters:
-                    for filt in self.filters:
-                        if filt.name in ['CloudCover']:
-                            col_ee = filt.apply(col_ee, col=col)
-
                 # BRDF
-                if self.brdf:
+                if self.brdf and correct_scenes:
                     if 'brdf' in col.algorithms.keys():
                         col_ee = col_ee.map(lambda img: col.brdf(img))
 
                 # Proxy in case size == 0
                 col_ee = self.make_proxy(col.collection.first(), col_ee, year)
 
-                # clip with site
-                if buffer is not None:
-                    site = site.buffer(buffer)
-                col_ee = col_ee.map(lambda img: img.clip(site))
+                # clip with site (or its bounds)
+                col_ee = col_ee.map(lambda img: img.clip(clip_geometry))
 
                 # Add year as a property (YEAR_BAP)
                 col_ee = col_ee.map(lambda img: img.set('YEAR_BAP', year))
@@ -189,34 +465,42 @@ class Bap(object):
                     for mask in self.masks:
                         col_ee = mask.map(col_ee, col=col)
 
+                # Drop the bands that are not needed anymore
+                if keep_bands:
+                    col_ee = col_ee.map(lambda img: img.select(keep_bands))
+
                 # Rename
                 col_ee = col_ee.map(lambda img: col.rename(img))
 
-                # Rescale
-                col_ee = col_ee.map(
-                    lambda img: collection.rescale(
-                        img, col, self.target_collection, renamed=True))
-
-                # Indices
-                if indices:
-                    for i in indices:
-                        f = getattr(col, i)
-                        def addindex(img):
-                            ind = f(img, renamed=True)
-                            return img.addBands(ind)
-                        col_ee = col_ee.map(addindex)
-
-                # Apply scores
-                if self.scores:
-                    for score in self.scores:
-                        zero = False if slcoff and isinstance(score, (scores.MaskPercent, scores.MaskPercentKernel)) else True
-                        col_ee = score._map(
-                            col_ee,
-                            col=col,
-                            year=year,
-                            colEE=col_ee,
-                            geom=site,
-                            include_zero=zero)
+                # Rescale and harmonize in one linear transform
+                if transform.bands:
+                    col_ee = col_ee.map(
+                        lambda img: transforms.apply(img, transform))
+
+                # Indices (needed by scores and requested) in one map
+                if all_indices:
+                    def addindices(img):
+                        computed = [getattr(col, i)(img, renamed=True)
+                                    for i in all_indices]
+                        return img.addBands(ee.Image.cat(*computed))
+                    col_ee = col_ee.map(addindices)
+
+                # Apply scores. The ones needed by the MaskCover filter go
+                # first, so the images it discards don't pay for the rest
+                col_ee = self._apply_scores(col_ee, prune_scores, col=col,
+                                            year=year, geom=site,
+                                            slcoff=slcoff)
+                if prune_scores:
+                    # Get an image before the filter to make a proxy in case
+                    # all images are filtered
+                    prune_image = col_ee.first()
+                    col_ee = self._filter_mask_cover(col_ee, prune_props)
+                    filtered_size = col_ee.size()
+                    col_ee = self.make_proxy(prune_image, col_ee, year)
+
+                col_ee = self._apply_scores(col_ee, other_scores, col=col,
+                                            year=year, geom=site,
+                                            slcoff=slcoff)
 
                 # Mask all bands with mask
                 col_ee = col_ee.map(lambda img: img.updateMask(img.select([0]).mask()))
@@ -225,13 +509,16 @@ class Bap(object):
                 col_ee_image = col_ee.first()
 
                 # Filter Mask Cover
-                if self.filters:
-                    for filt in self.filters:
-                        if filt.name in ['MaskCover']:
-                            col_ee = filt.apply(col_ee)
+                col_ee = self._filter_mask_cover(col_ee, exclude=prune_props)
 
-                # col_ee = self.make_proxy(col, col_ee, year, True)
-                col_ee = self.make_proxy(col_ee_image, col_ee, year)
+                if prune_scores:
+                    # empty the proxy made before computing the rest of
+                    # scores, or make one if this filter removed all images
+                    col_ee = self.make_proxy(col_ee_image, col_ee, year,
+                                             filtered_size.min(col_ee.size()))
+                else:
+                    # col_ee = self.make_proxy(col, col_ee, year, True)
+                    col_ee = self.make_proxy(col_ee_image, col_ee, year)
 
                 # Add col_id band
                 # Add col_id to the image as a property
@@ -266,17 +553,10 @@ class Bap(object):
                     newdate_img = ee.Image.constant(newdate) \
                         .rename(self.bandname_date).toUint32()
 
-                    return img.addBands(newdate_img)
+                    return img.addBands(newdate_img).set(
+                        self.bandname_date.upper(), newdate)
                 col_ee = col_ee.map(addDateBand)
 
-                # Harmonize
-                if self.harmonize:
-                    # get max value for the needed bands
-
-                    if 'harmonize' in col.algorithms.keys():
-                        col_ee = col_ee.map(
-                            lambda img: col.harmonize(img, renamed=True))
-
                 # store used images
                 # Property name for storing images as properties
                 prop_name = 'BAP_IMAGES_COLID_{}_YEAR_{}'.format(col_id, year)
@@ -294,8 +574,8 @@ class Bap(object):
         # Compute final score
         if self.scores:
             def compute_score(img):
-                score = img.select(self.score_names).reduce('sum') \
-                    .rename('score').toFloat()
+                score = img.select(list(plan.score_names)).reduce('sum') \
+                    .rename(self.score_name).toFloat()
                 return img.addBands(score)
         else:
             def compute_score(img):
@@ -303,6 +583,17 @@ class Bap(object):
 
         all_collection = all_collection.map(compute_score)
 
+        # Quantize scores. The total is computed from the float scores and
+        # every score shares the same step, so they can be compared
+        if self.scores and self.score_step:
+            to_quantize = [self.score_name]
+            if add_individual_scores:
+                to_quantize = list(plan.score_names) + to_quantize
+            step = self.score_step
+            all_collection = all_collection.map(
+                lambda img: functions.quantize(img, to_quantize, step,
+                                               self.score_dtype))
+
         # Select common bands
         # all_collection = functions.select_match(all_collection)
         final_collection = all_collection.map(
@@ -319,12 +610,51 @@ class Bap(object):
         :type add_individual_scores: bool
         :param buffer: make a buffer before cutting to the given site
         :type buffer: float
+        :param simplify: simplify the site with this maximum error (meters)
+        :type simplify: float
+        :param clip: 'exact' (default) to clip every image with the site or
+            'bbox' to clip the images with the bounds of the site and only
+            the composite with the site
+        :type clip: str
+        :param footprint: 'site' (default) to use the site as the footprint
+            of the composite or 'exact' to merge the footprints of the images
+            that won pixels
+        :type footprint: str
+        :param correction: 'scene' to apply the BRDF and the harmonization to
+            every image before scoring or 'composite' to score the
+            uncorrected images and correct only the composite, taking the
+            coefficients of each pixel from its col_id and date bands.
+            Defaults to the `correction` of the Bap
+        :type correction: str
         """
         # TODO: pass properties
+        # Indices that are not needed by scores are computed only once over
+        # the composite
+        score_indices, output_indices = self.resolve_indices(indices)
+        indices = [i for i in indices or [] if i in score_indices]
+
+        site = functions.prepare_site(site, kwargs.get('buffer'),
+                                      kwargs.get('simplify'),
+                                      bool(self.scene_index))
+        plan = kwargs.get('plan') or self.compile(year)
+        kwargs['plan'] = plan
         col = self.compute_scores(year, site, indices, **kwargs)
         mosaic = col.qualityMosaic(self.score_name)
-
-        return self._set_properties(mosaic, year, col)
+        if self._clip_mode(kwargs) == 'bbox':
+            mosaic = mosaic.clip(site.geometry)
+        if self._correction_mode(kwargs) == 'composite':
+            mosaic = transforms.correct_composite(
+                mosaic, plan.collections, plan.col_ids,
+                self.target_collection, plan.common_bands, self.brdf,
+                self.harmonize, self.bandname_col_id, self.bandname_date)
+        mosaic = self.add_indices(mosaic, output_indices)
+
+        footprint = self._footprint_mode(kwargs)
+        if footprint == 'exact':
+            scale = nominal_scale(plan.collections, plan.common_bands)
+            col = self.winners(mosaic, col, site.geometry, scale)
+
+        return self._set_properties(mosaic, year, col, site, footprint)
 
     def build_composite_reduced(self, year, site, indices=None, **kwargs):
         """ Build the composite where
@@ -333,17 +663,98 @@ class Bap(object):
         :type add_individual_scores: bool
         :param buffer: make a buffer before cutting to the given site
         :type buffer: float
+        :param simplify: simplify the site with this maximum error (meters)
+        :type simplify: float
+        :param clip: 'exact' (default) to clip every image with the site or
+            'bbox' to clip the images with the bounds of the site and only
+            the composite with the site
+        :type clip: str
+        :param footprint: 'site' (default) to use the site as the footprint
+            of the composite or 'exact' to merge the footprints of the images
+            that won pixels
+        :type footprint: str
         """
         # TODO: pass properties
         nimages = kwargs.get('set', 5)
         reducer = kwargs.get('reducer', 'interval_mean')
+        # the pixels of the reduced composite come from many images, so they
+        # are always corrected before scoring
+        kwargs['correction'] = 'scene'
+        site = functions.prepare_site(site, kwargs.get('buffer'),
+                                      kwargs.get('simplify'),
+                                      bool(self.scene_index))
         col = self.compute_scores(year, site, indices, **kwargs)
         mosaic = reduce_collection(col, nimages, reducer, self.score_name)
-
-        return self._set_properties(mosaic, year, col)
-
-    def _set_properties(self, mosaic, year, col):
-        """ Set some BAP common properties to the given mosaic """
+        if self._clip_mode(kwargs) == 'bbox':
+            mosaic = mosaic.clip(site.geometry)
+
+        # the reduced composite has no provenance of the pixels, so the
+        # exact footprint merges all images
+        footprint = self._footprint_mode(kwargs)
+        return self._set_properties(mosaic, year, col, site, footprint)
+
+    def winners(self, mosaic, col, geometry, scale=None):
+        """ Images of the collection that won at least one pixel of the
+        mosaic. They are found with a histogram of the col_id and date bands
+        of the mosaic
+
+        :param mosaic: the mosaic made from the collection
+        :type mosaic: ee.Image
+        :param col: the collection (see `compute_scores`)
+        :type col: ee.ImageCollection
+        :param geometry: the region of the histogram
+        :type geometry: ee.Geometry
+        :param scale: the scale of the histogram. Defaults to the nominal
+            scale of the images of the collection (the mosaic itself has the
+            default projection)
+        :type scale: float
+        :rtype: ee.ImageCollection
+        """
+        col_id_prop = self.bandname_col_id.upper()
+        date_prop = self.bandname_date.upper()
+        keyband = 'BAP_KEY'
+
+        if scale is None:
+            scale = ee.Image(col.first()).select(0).projection() \
+                .nominalScale()
+
+        key = mosaic.select(self.bandname_col_id).toInt64() \
+            .multiply(100000000) \
+            .add(mosaic.select(self.bandname_date).toInt64()) \
+            .rename(keyband)
+        # no bestEffort, so the scale is never coarsened and images that won
+        # only a few pixels are kept
+        histogram = key.reduceRegion(ee.Reducer.frequencyHistogram(),
+                                     geometry, scale, maxPixels=1e13)
+        # the histogram is null when the mosaic has no valid pixels
+        counts = ee.Dictionary(ee.Algorithms.If(histogram.get(keyband),
+                                                histogram.get(keyband), {}))
+        keys = counts.keys().map(lambda k: ee.Number.parse(k))
+
+        def add_key(img):
+            value = ee.Number(img.get(col_id_prop)).multiply(100000000) \
+                .add(img.get(date_prop))
+            return img.set(keyband, value)
+
+        return col.map(add_key).filter(ee.Filter.inList(keyband, keys))
+
+    @staticmethod
+    def _footprint_mode(kwargs):
+        footprint = kwargs.get('footprint', 'site')
+        if footprint not in functions.FOOTPRINT_MODES:
+            msg = 'footprint must be one of {}, found {}'
+            raise ValueError(msg.format(functions.FOOTPRINT_MODES, footprint))
+        return footprint
+
+    def _set_properties(self, mosaic, year, col, site=None, footprint='site'):
+        """ Set some BAP common properties to the given mosaic
+
+        :param site: the prepared site (see `functions.prepare_site`)
+        :type site: functions.PreparedSite
+        :param footprint: 'site' to use the site as footprint or 'exact' to
+            merge the footprints of the images in `col`
+        :type footprint: str
+        """
         # # USED IMAGES
         # used_images = self._used_images
         # for prop, value in used_images.items():
@@ -378,16 +789,17 @@ class Bap(object):
         mosaic = mosaic.set('BAP_VERSION', __version__)
 
         # FOOTPRINT
-        geom = tools.imagecollection.mergeGeometries(col)
+        if footprint == 'site' and site is not None:
+            geom = site.geometry
+        else:
+            geom = tools.imagecollection.mergeGeometries(col)
         mosaic = mosaic.set('system:footprint', geom)
 
         # Seasons
         for year in self.year_range(year):
             # yearstr = ee.Number(year).format()
-            daterange = self.season.add_year(year)
-            start = daterange.start().format('yyyy-MM-dd')
-            end = daterange.end().format('yyyy-MM-dd')
-            string = start.cat(' to ').cat(end)
+            start, end = self.season.dates(year)
+            string = '{} to {}'.format(start.isoformat(), end.isoformat())
             # propname = ee.String('BAP_SEASON_').cat(yearstr)
             propname = ee.String('BAP_SEASON')
             mosaic = mosaic.set(propname, string)
@@ -441,6 +853,16 @@ def load(filename, path=None):
                 return result
         return None
 
+    def get_priority_table(param_dict, name):
+        table = param_dict.get('{} (PriorityTable)'.format(name))
+        if not table:
+            return None
+        breaks = [b['(int)'] for b in table['breaks (list)']]
+        satlist = [[sat['(str)'] for sat in sats['(list)']]
+                   for sats in table['satlist (list)']]
+        return priority.PriorityTable(breaks, satlist,
+                                      table.get('name (str)'))
+
     # SEASON
     seas = obj['season (Season)']
     start = seas['_start (SeasonDate)']['date (str)']
@@ -561,7 +983,8 @@ def load(filename, path=None):
             score_param = scores.MaskPercentKernel(kernel, distance, units, name)
         elif score_class == '(Satellite)':
             ratio = get_number(params, 'ratio')
-            score_param = scores.Satellite(ratio, name)
+            relation = get_priority_table(params, 'relation')
+            score_param = scores.Satellite(ratio, name, relation)
         elif score_class == '(Outliers)':
             bands = params.get('bands (tuple)') or params.get('bands (list)')
             bandlist = [band['(str)'] for band in bands]
@@ -585,11 +1008,24 @@ def load(filename, path=None):
             stretch = get_number(params, 'stretch')
             score_param = scores.MultiYear(main_year, Season, ratio, function, stretch, name)
         elif score_class == '(Threshold)':
-            continue
+            bands = params.get('bands (dict)')
+            if bands:
+                # {'band': {'(dict)': {'min': {'(int)': 1}, ...}}}
+                bands = dict(
+                    [(band, dict([(limit, list(value.values())[0])
+                                  for limit, value in
+                                  list(relation.values())[0].items()]))
+                     for band, relation in bands.items()])
+            score_param = scores.Threshold(bands, name)
         elif score_class == '(Medoid)':
             bands = params.get('bands (list)') or params.get('bands (tuple)')
             discard_zeros = params.get('discard_zeros (bool)')
-            score_param = scores.Medoid(bands, discard_zeros, name)
+            sample_size = params.get('sample_size (int)')
+            sample_by = params.get('sample_by (str)')
+            sample_ascending = params.get('sample_ascending (bool)')
+            score_param = scores.Medoid(bands, discard_zeros, name,
+                                        sample_size, sample_by,
+                                        sample_ascending)
         elif score_class == '(Brightness)':
             target = get_number(params, 'target')
             bands = params.get('bands (list)') or params.get('bands (tuple)')
@@ -609,12 +1045,20 @@ def load(filename, path=None):
     brdf_param = obj.get('brdf (bool)')
     harmonize_param = obj.get('harmonize (bool)')
     bandname_col_id_param = obj.get('bandname_col_id (str)')
+    score_dtype_param = obj.get('score_dtype (str)')
+    priority_table_param = get_priority_table(obj, 'priority_table')
+    scene_index_param = obj.get('scene_index (bool)', False)
+    correction_param = obj.get('correction (str)', 'scene')
 
     return Bap(season_param, range_param, colgroup_param, score_list,
                mask_list, filter_list, target_param, brdf_param,
                harmonize_param, score_name=score_name_param,
                bandname_date=bandname_date_param,
-               bandname_col_id=bandname_col_id_param)
+               bandname_col_id=bandname_col_id_param,
+               score_dtype=score_dtype_param,
+               priority_table=priority_table_param,
+               scene_index=scene_index_param,
+               correction=correction_param)
 
 
 def reduce_collection(collection, set=5, reducer='mean',
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """ Date module for Gee Bap """
 import ee
+from .utils import lazy_class_attribute
 
 
 class Date(object):
@@ -16,7 +17,10 @@ class Date(object):
     :mapfecha: estatico para utilizar con ee.ImageCollection.map()
     """
     oneday_local = 86400000  # milisegundos
-    oneday = ee.Number(oneday_local)
+
+    @lazy_class_attribute
+    def oneday(cls):
+        return ee.Number(cls.oneday_local)
 
     def __init__(self):
         ''' This Class doesn't initialize '''
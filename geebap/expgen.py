@@ -3,6 +3,7 @@
 import simpleeval as sval
 import ast
 import math
+from collections import namedtuple
 
 
 class ExpGen(object):
@@ -40,6 +41,26 @@ class ExpGen(object):
         s = SvalEE()
         return s.eval(expr)
 
+    @staticmethod
+    def compile(expr, **params):
+        """ Compile an expression: constant sub-expressions are computed,
+        redundant parentheses and ternaries are removed. The result is cached
+        by expression and parameters
+
+        :param expr: the expression. It can have {placeholders} that will be
+            replaced with `params`
+        :type expr: str
+        :return: the expression for Earth Engine (`ee`) and for `SvalNP`
+            (`numpy`)
+        :rtype: Compiled
+        """
+        key = (expr, repr(sorted(params.items())))
+        if key not in COMPILED:
+            text = expr.format(**params) if params else expr
+            node = Compiler().compile(text)
+            COMPILED[key] = Compiled(emit_ee(node), emit_numpy(node))
+        return COMPILED[key]
+
 
 def cat(op, group=True):
     def wrap(a, b):
@@ -98,4 +119,201 @@ class SvalEE(sval.SimpleEval):
 
         self.operators = DEFAULT_OPERATORS
         self.functions = DEFAULT_FUNCTIONS
-        self.names = DEFAULT_NAMES
\ No newline at end of file
+        self.names = DEFAULT_NAMES
+
+# COMPILER
+# Compiled expression for Earth Engine and for numpy (`expressions.SvalNP`)
+Compiled = namedtuple('Compiled', ['ee', 'numpy'])
+
+# Cache of compiled expressions: (expression, params) -> Compiled
+COMPILED = {}
+
+# Nodes of the compiled tree (tuples):
+# ('const', value), ('name', name), ('call', function, args),
+# ('unary', op, operand), ('binary', op, left, right),
+# ('ternary', condition, if_true, if_false)
+BINARY_OPERATORS = {ast.Add: ('+', lambda a, b: a + b),
+                    ast.Sub: ('-', lambda a, b: a - b),
+                    ast.Mult: ('*', lambda a, b: a * b),
+                    ast.Div: ('/', lambda a, b: a / b),
+                    ast.FloorDiv: ('//', lambda a, b: a // b),
+                    ast.Pow: ('**', lambda a, b: a ** b),
+                    ast.Mod: ('%', lambda a, b: a % b),
+                    ast.Eq: ('==', lambda a, b: a == b),
+                    ast.NotEq: ('!=', lambda a, b: a != b),
+                    ast.Gt: ('>', lambda a, b: a > b),
+                    ast.Lt: ('<', lambda a, b: a < b),
+                    ast.GtE: ('>=', lambda a, b: a >= b),
+                    ast.LtE: ('<=', lambda a, b: a <= b)}
+
+UNARY_OPERATORS = {ast.USub: ('-', lambda a: -a),
+                   ast.UAdd: ('+', lambda a: +a)}
+
+CONSTANT_FUNCTIONS = {'max': max,
+                      'min': min,
+                      'exp': math.exp,
+                      'sqrt': math.sqrt}
+
+# Operator precedence (higher binds tighter)
+PRECEDENCE = {'?': 1, '==': 4, '!=': 4, '>': 5, '<': 5, '>=': 5, '<=': 5,
+              '+': 6, '-': 6, '*': 7, '/': 7, '//': 7, '%': 7, 'unary': 8,
+              '**': 9, 'atom': 10}
+
+
+# Nodes that hold numbers or strings
+if hasattr(ast, 'Constant'):
+    LITERALS = (ast.Constant,)
+else:
+    LITERALS = (ast.Num, ast.Str)
+
+
+def _literal(node):
+    """ Value of a number or string node """
+    for attr in ('value', 'n', 's'):
+        if hasattr(node, attr):
+            return getattr(node, attr)
+
+
+class Compiler(object):
+    """ Parse an expression into a tree folding the constant sub-trees """
+    def compile(self, expr):
+        tree = ast.parse(expr.strip(), mode='eval')
+        return self.visit(tree.body)
+
+    def visit(self, node):
+        if isinstance(node, LITERALS):
+            value = _literal(node)
+            if isinstance(value, str):
+                # quoted names ('var') are variables of the EE expression
+                return ('name', value)
+            return ('const', value)
+        elif isinstance(node, ast.Name):
+            if node.id in DEFAULT_NAMES:
+                return ('const', DEFAULT_NAMES[node.id])
+            return ('name', node.id)
+        elif isinstance(node, ast.UnaryOp):
+            symbol, function = UNARY_OPERATORS[type(node.op)]
+            operand = self.visit(node.operand)
+            if operand[0] == 'const':
+                return ('const', function(operand[1]))
+            if symbol == '+':
+                return operand
+            return ('unary', symbol, operand)
+        elif isinstance(node, ast.BinOp):
+            return self.binary(type(node.op), self.visit(node.left),
+                               self.visit(node.right))
+        elif isinstance(node, ast.Compare) and len(node.ops) == 1:
+            return self.binary(type(node.ops[0]), self.visit(node.left),
+                               self.visit(node.comparators[0]))
+        elif isinstance(node, ast.IfExp):
+            return self.ternary(self.visit(node.test), self.visit(node.body),
+                                self.visit(node.orelse))
+        elif isinstance(node, ast.Call):
+            return self.call(node.func.id, [self.visit(arg)
+                                            for arg in node.args])
+        raise ValueError('{} is not supported in expressions'.format(
+            ast.dump(node)))
+
+    @staticmethod
+    def binary(op, left, right):
+        symbol, function = BINARY_OPERATORS[op]
+        if left[0] == 'const' and right[0] == 'const':
+            value = function(left[1], right[1])
+            return ('const', float(value) if isinstance(value, bool)
+                    else value)
+        return ('binary', symbol, left, right)
+
+    @staticmethod
+    def ternary(condition, if_true, if_false):
+        if condition[0] == 'const':
+            return if_true if condition[1] else if_false
+        if if_true == if_false:
+            return if_true
+        return ('ternary', condition, if_true, if_false)
+
+    def call(self, name, args):
+        if all(arg[0] == 'const' for arg in args) and \
+                name in CONSTANT_FUNCTIONS:
+            return ('const', CONSTANT_FUNCTIONS[name](
+                *[arg[1] for arg in args]))
+        if name in ('max', 'min') and len(args) == 2 and args[0] == args[1]:
+            return args[0]
+        return ('call', name, args)
+
+
+def _precedence(node):
+    kind = node[0]
+    if kind == 'const':
+        return PRECEDENCE['unary'] if node[1] < 0 else PRECEDENCE['atom']
+    elif kind in ('name', 'call'):
+        return PRECEDENCE['atom']
+    elif kind == 'unary':
+        return PRECEDENCE['unary']
+    elif kind == 'binary':
+        return PRECEDENCE[node[1]]
+    return PRECEDENCE['?']
+
+
+def _emit(node, functions, ternary):
+    """ Write the tree as text with the minimum parentheses """
+    kind = node[0]
+
+    def wrap(child, needed):
+        text = _emit(child, functions, ternary)
+        return '({})'.format(text) if needed else text
+
+    if kind == 'const':
+        return repr(node[1])
+    elif kind == 'name':
+        return node[1]
+    elif kind == 'unary':
+        operand = node[2]
+        return '{}{}'.format(node[1], wrap(
+            operand, _precedence(operand) < PRECEDENCE['atom']))
+    elif kind == 'binary':
+        symbol, left, right = node[1:]
+        level = PRECEDENCE[symbol]
+        if symbol == '**':
+            left_parens = _precedence(left) <= level
+            right_parens = _precedence(right) < level
+        else:
+            left_parens = _precedence(left) < level
+            # negative constants on the right too: a-(-1)
+            right_parens = _precedence(right) <= level or \
+                _precedence(right) == PRECEDENCE['unary']
+        return '{}{}{}'.format(wrap(left, left_parens), symbol,
+                               wrap(right, right_parens))
+    elif kind == 'ternary':
+        return ternary(*[_emit(child, functions, ternary)
+                         for child in node[1:]])
+    elif kind == 'call':
+        return functions(node[1], [_emit(arg, functions, ternary)
+                                   for arg in node[2]])
+
+
+def _ee_function(name, args):
+    if name in ('max', 'min') and len(args) == 2:
+        a, b = args
+        return '({a}{op}{b}?{a}:{b})'.format(
+            a=a, b=b, op='>' if name == 'max' else '<')
+    return '{}({})'.format(name, ', '.join(args))
+
+
+def emit_ee(node):
+    """ Earth Engine expression of a compiled tree
+
+    :rtype: str
+    """
+    return _emit(node, _ee_function,
+                 lambda cond, a, b: '({}?{}:{})'.format(cond, a, b))
+
+
+def emit_numpy(node):
+    """ Expression of a compiled tree to evaluate with
+    `expressions.SvalNP` (over numpy arrays)
+
+    :rtype: str
+    """
+    return _emit(node,
+                 lambda name, args: '{}({})'.format(name, ', '.join(args)),
+                 lambda cond, a, b: 'where({}, {}, {})'.format(cond, a, b))
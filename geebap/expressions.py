@@ -4,6 +4,7 @@ import ee
 from . import expgen
 from .functions import drange
 from geetools import tools
+import ast
 import math
 import simpleeval as sval
 import numpy as np
@@ -20,6 +21,58 @@ CUSTOM_NAMES = {"pi": math.pi}
 sval.DEFAULT_FUNCTIONS.update(CUSTOM_FUNCTIONS)
 sval.DEFAULT_NAMES.update(CUSTOM_NAMES)
 
+# Functions, names and operators to evaluate the expressions over numpy arrays
+NUMPY_FUNCTIONS = {"sqrt": np.sqrt,
+                   "where": np.where,
+                   "exp": np.exp,
+                   "max": np.maximum,
+                   "min": np.minimum}
+
+NUMPY_NAMES = {"pi": math.pi,
+               "e": math.e}
+
+NUMPY_OPERATORS = {ast.Add: np.add,
+                   ast.UAdd: np.positive,
+                   ast.Sub: np.subtract,
+                   ast.USub: np.negative,
+                   ast.Mult: np.multiply,
+                   ast.Div: np.true_divide,
+                   ast.FloorDiv: np.floor_divide,
+                   ast.Pow: np.power,
+                   ast.Mod: np.mod,
+                   ast.Eq: np.equal,
+                   ast.NotEq: np.not_equal,
+                   ast.Gt: np.greater,
+                   ast.Lt: np.less,
+                   ast.GtE: np.greater_equal,
+                   ast.LtE: np.less_equal}
+
+
+class SvalNP(sval.SimpleEval):
+    """ Evaluate an expression over numpy arrays. The expression is parsed
+    once, and then it can be evaluated for any value of the variable `var`
+
+    :param expression: the expression. The variable must be called `var`
+    :type expression: str
+    """
+    def __init__(self, expression, **kwargs):
+        super(SvalNP, self).__init__(**kwargs)
+        self.operators = NUMPY_OPERATORS
+        self.functions = NUMPY_FUNCTIONS
+        self.names = dict(NUMPY_NAMES)
+        self.expression = expression
+        self.parsed = ast.parse(expression.strip()).body[0]
+
+    def __call__(self, var):
+        """ Evaluate the expression
+
+        :param var: the value of the variable
+        :type var: float or numpy.ndarray
+        :rtype: numpy.ndarray
+        """
+        self.names["var"] = np.asarray(var, dtype=np.float64)
+        return np.asarray(self._eval(self.parsed))
+
 
 class Expression(object):
     # TODO: Limitante: si hay mas de una variable
@@ -108,6 +161,20 @@ class Expression(object):
         self._std = kwargs.get("std")
         self._mean = kwargs.get("mean")
         self.name = name
+        self._cache = {}
+
+    @property
+    def _state(self):
+        """ Everything the results depend on, to key the cache """
+        return (self.expression, self.range, repr(sorted(self.params.items())),
+                self._max, self._min, self._mean, self._std)
+
+    def _memoize(self, name, function):
+        """ Compute `function` once for the current state of the expression """
+        key = (name, self._state)
+        if key not in self._cache:
+            self._cache[key] = function()
+        return self._cache[key]
 
     def format_local(self):
         """ Reemplaza las variables de la expression por los valores asignados
@@ -123,9 +190,12 @@ class Expression(object):
 
         return self.expression.format(var="{var}", **params)
 
-    def format_ee(self):
-        """ Reemplaza las variables de la expression por los valores asignados
-        al objeto y genera la expression lista para usar en Earth Engine """
+    def compile(self):
+        """ Compila la expression reemplazando las variables por los valores
+        asignados al objeto (ver `expgen.ExpGen.compile`)
+
+        :rtype: expgen.Compiled
+        """
         # reemplaza las variables estadisticas
         params = copy.deepcopy(self.params)
         params["max"] = self.max
@@ -133,9 +203,12 @@ class Expression(object):
         params["mean"] = self.mean
         params["std"] = self.std
 
-        expr = self.expression.format(var="'var'", **params)
+        return expgen.ExpGen.compile(self.expression, var="var", **params)
 
-        return expgen.ExpGen.parse(expr)
+    def format_ee(self):
+        """ Reemplaza las variables de la expression por los valores asignados
+        al objeto y genera la expression lista para usar en Earth Engine """
+        return self.compile().ee
 
 
     @staticmethod
@@ -173,11 +246,20 @@ class Expression(object):
                   " a tuple")
 
     # ESTADISTICAS DEL RANGO
+    @property
+    def range_values(self):
+        """ Valores del range (con un decimal) como array """
+        if type(self.range) is not tuple:
+            raise ValueError("To determine the values of the range the "
+                             "'range' param must be a tuple")
+        return self._memoize("range_values", lambda: np.array(
+            drange(self.range[0], self.range[1] + 1, places=1)))
+
     @property
     def mean(self):
         if type(self.range) is tuple:
-            r = drange(self.range[0], self.range[1] + 1, places=1)
-            return np.mean(r)
+            return self._memoize("mean",
+                                 lambda: np.mean(self.range_values))
         elif self._mean:
             return self._mean
         else:
@@ -187,8 +269,7 @@ class Expression(object):
     @property
     def std(self):
         if type(self.range) is tuple:
-            r = drange(self.range[0], self.range[1] + 1, places=1)
-            return np.std(r)
+            return self._memoize("std", lambda: np.std(self.range_values))
         elif self._std:
             return self._std
         else:
@@ -198,7 +279,7 @@ class Expression(object):
     @property
     def max_result(self):
         """ Determinar el max_result resultado posible. Aplicando la expression
-        localmente con la funcion eval()
+        localmente (sobre un array) con la funcion eval()
 
         :return:
         """
@@ -210,10 +291,11 @@ class Expression(object):
             raise ValueError("To determine the max result the 'range' param "
                              "must be a tuple")
 
-        r = drange(rango[0], rango[1]+1, places=1)
-        lista_result = [self.eval(var) for var in r]
-        maximo = max(lista_result)
-        return maximo
+        def compute():
+            r = np.array(drange(rango[0], rango[1]+1, places=1))
+            return np.max(self.eval(r))
+
+        return self._memoize("max_result", compute)
 
     @property
     def max(self):
@@ -227,31 +309,38 @@ class Expression(object):
         val = self.range[0] if self.range else self.params.get("min", None)
         return val
 
+    @property
+    def compiled(self):
+        """ La expression compilada para evaluarla sobre arrays de numpy
+
+        :rtype: SvalNP
+        """
+        def compute():
+            return SvalNP(self.compile().numpy)
+
+        return self._memoize("compiled", compute)
+
     def eval(self, var):
         """ Metodo para aplicar la funcion localmente con un valor dado
 
-        :param var: Valor que se usara como variable
+        :param var: Valor que se usara como variable. Puede ser un array de
+            numpy (por ejemplo un raster)
         :return: el resultado de evaluar la expression con un valor dado
-        :rtype: float
+        :rtype: float or numpy.ndarray
         """
-        expr = self.format_local()
-        expr = expr.format(var=var)
-        result = sval.simple_eval(expr)
-        return result
+        result = self.compiled(var)
+        return result.item() if result.ndim == 0 else result
 
     def eval_normalized(self, var):
         """ Metodo para aplicar la funcion normalizada (resultado entre 0 y 1)
         localmente con un valor dado. No influye el parametro 'normalize'
 
-        :param var: Valor que se usara como variable
+        :param var: Valor que se usara como variable. Puede ser un array de
+            numpy
         :return: el resultado de evaluar la expression con un valor dado
-        :rtype: float
+        :rtype: float or numpy.ndarray
         """
-        e = self.format_local()
-        expr = "({e})/{maximo}".format(e=e, maximo=self.max_result)
-        expr = expr.format(var=var)
-        result = sval.simple_eval(expr)
-        return result
+        return self.eval(var) / self.max_result
 
     def map(self, name="expression", band=None, prop=None, eval=None,
             map=None, **kwargs):
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """ Module holding custom filters for image collections """
 from abc import ABCMeta, abstractmethod
+import ee
 from .regdec import *
 
 __all__ = []
@@ -46,15 +47,26 @@ class CloudCover(Filter):
         :param kwargs:
         :return:
         """
+        ee_filter = self.ee_filter(**kwargs)
+        if ee_filter is None:
+            return collection
+        return collection.filter(ee_filter)
+
+    def ee_filter(self, **kwargs):
+        """ The filter as an `ee.Filter`, to combine it with others. Takes
+        the same arguments as `apply`
+
+        :return: the filter or None if the cloud cover property is unknown
+        :rtype: ee.Filter
+        """
         col = kwargs.get("col")
-        if col.cloud_cover:
-            return collection.filterMetadata(col.cloud_cover, "less_than",
-                                             self.percent)
+        if col is not None and col.cloud_cover:
+            prop = col.cloud_cover
         elif 'prop' in kwargs.keys():
             prop = kwargs.get('prop')
-            return collection.filterMetadata(prop, 'less_than', self.percent)
         else:
-            return collection
+            return None
+        return ee.Filter.lt(prop, self.percent)
 
 
 @register(factory)
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+""" Index of the Landsat WRS-2 path/rows and the Sentinel-2 MGRS tiles, to
+select the scenes that cover a site with metadata filters
+(`ee.Filter.inList` over `WRS_PATH`/`WRS_ROW` or `MGRS_TILE`) instead of a
+geometric filter (`filterBounds`).
+
+The footprints are computed on the client, without any file:
+
+- WRS-2: scene centers of a circular sun-synchronous orbit (233 paths, 248
+  rows, inclination 98.2°, descending node of path 1 at 64.6° W and row 60
+  over the equator). A scene is taken as the circle that contains it.
+- MGRS: the 100 km squares of the UTM zones and the 8° latitude bands.
+  Sentinel-2 tiles are 109.8 km wide, so they overlap the next square by
+  9.8 km. A tile that crosses the boundary of a band keeps the band of its
+  name, so the bands of the neighbour latitudes are also tried. The Norway
+  and Svalbard zone exceptions are not considered.
+
+Both lookups use a margin, so they can return some tiles that don't touch
+the site, but don't miss the ones that do. They were checked against the
+USGS WRS-2 descending footprints (no corner is more than 12 km out of the
+circle of its computed center, and the default margin is 20 km) and the ESA
+Sentinel-2 tiling grid over South America. `tests/test_footprints.py` keeps
+a sample of both.
+"""
+import math
+import ee
+import numpy as np
+
+EARTH_RADIUS = 6371.0088  # km
+
+# WRS-2
+WRS_PATHS = 233
+WRS_ROWS = 248
+WRS_INCLINATION = math.radians(98.2)
+WRS_PATH1_LONGITUDE = -64.6
+WRS_EQUATOR_ROW = 60
+WRS_CYCLE = 16  # days
+# half of the diagonal of a 185 km x 180 km scene
+WRS_SCENE_RADIUS = 130.0
+
+# MGRS
+MGRS_BANDS = 'CDEFGHJKLMNPQRSTUVWX'
+MGRS_COLUMNS = ('ABCDEFGH', 'JKLMNPQR', 'STUVWXYZ')
+MGRS_ROWS = 'ABCDEFGHJKLMNPQRSTUV'
+MGRS_SQUARE = 100000.0  # m
+S2_OVERLAP = 9800.0  # m
+# size of a Sentinel-2 tile in degrees of latitude
+S2_TILE_DEGREES = 1.0
+
+# WGS84
+SEMI_MAJOR_AXIS = 6378137.0
+FLATTENING = 1 / 298.257223563
+UTM_SCALE = 0.9996
+
+# Landsat satellites that use the WRS-2
+WRS2_LANDSAT = (4, 5, 7, 8, 9)
+
+_WRS2 = {}
+
+
+def bounds(site):
+    """ Bounding box (xmin, ymin, xmax, ymax) in degrees of a site. The site
+    can be a bounding box, a GeoJSON geometry (dict) or an ee.Geometry /
+    ee.Feature. Geometries made on the client don't need a request to the
+    server
+
+    :rtype: tuple
+    """
+    if isinstance(site, (tuple, list)) and len(site) == 4 and \
+            all(isinstance(value, (int, float)) for value in site):
+        return tuple(float(value) for value in site)
+
+    if isinstance(site, ee.Feature):
+        site = site.geometry()
+    if isinstance(site, ee.Geometry):
+        try:
+            site = site.toGeoJSON()
+        except ee.EEException:
+            site = site.bounds().getInfo()
+
+    if site.get('type') == 'GeometryCollection':
+        boxes = [bounds(geom) for geom in site['geometries']]
+        xmins, ymins, xmaxs, ymaxs = zip(*boxes)
+        return min(xmins), min(ymins), max(xmaxs), max(ymaxs)
+
+    points = np.asarray(_flatten(site['coordinates']), dtype=float)
+    xmin, ymin = points.min(axis=0)
+    xmax, ymax = points.max(axis=0)
+    return float(xmin), float(ymin), float(xmax), float(ymax)
+
+
+def _flatten(coordinates):
+    """ List of the points of nested GeoJSON coordinates """
+    if isinstance(coordinates[0], (int, float)):
+        return [coordinates[:2]]
+    points = []
+    for element in coordinates:
+        points.extend(_flatten(element))
+    return points
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """ Great circle distance in km (haversine). Takes degrees """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def distance_to_box(lat, lon, box):
+    """ Distance in km from the points to the nearest point of the bounding
+    box. Zero for the points inside the box """
+    xmin, ymin, xmax, ymax = box
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    near_lat = np.clip(lat, ymin, ymax)
+    # longitude distance to both edges, across the antimeridian
+    to_min = (xmin - lon) % 360
+    to_max = (lon - xmax) % 360
+    inside = (lon >= xmin) & (lon <= xmax)
+    near_lon = np.where(inside, lon, np.where(to_min < to_max, xmin, xmax))
+    return distance(lat, lon, near_lat, near_lon)
+
+
+def wrs2_centers():
+    """ Latitude and longitude (degrees) of the center of every WRS-2 scene.
+    The arrays have shape (path, row) and are computed once
+
+    :rtype: tuple
+    """
+    if not _WRS2:
+        paths = np.arange(1, WRS_PATHS + 1)[:, None]
+        rows = np.arange(1, WRS_ROWS + 1)[None, :]
+
+        # argument of latitude (from the ascending node). The descending node
+        # (pi) is at the equator row
+        step = 2 * np.pi / WRS_ROWS
+        u = np.pi + (rows - WRS_EQUATOR_ROW) * step
+        lat = np.arcsin(np.sin(WRS_INCLINATION) * np.sin(u))
+
+        # longitude from the descending node in the orbit plane, less the
+        # rotation of the earth (one turn per day relative to the orbit plane,
+        # which follows the sun) while the satellite moves
+        along = np.arctan2(np.cos(WRS_INCLINATION) * np.sin(u), np.cos(u))
+        along = np.mod(along, 2 * np.pi) - np.pi
+        rotation = (u - np.pi) * WRS_CYCLE / float(WRS_PATHS)
+        node = WRS_PATH1_LONGITUDE - (paths - 1) * 360.0 / WRS_PATHS
+        lon = node + np.degrees(along - rotation)
+        lon = (lon + 180) % 360 - 180
+
+        _WRS2['lat'] = np.degrees(lat) * np.ones_like(lon)
+        _WRS2['lon'] = lon
+    return _WRS2['lat'], _WRS2['lon']
+
+
+def pathrows(site, margin=20):
+    """ WRS-2 path/rows that intersect the site
+
+    :param site: the site (see `bounds`)
+    :param margin: distance in km added to the size of the scenes, to
+        absorb the error of the orbit approximation
+    :type margin: float
+    :return: sorted list of (path, row)
+    :rtype: list
+    """
+    box = bounds(site)
+    lat, lon = wrs2_centers()
+    near = distance_to_box(lat, lon, box) <= WRS_SCENE_RADIUS + margin
+    paths, rows = np.nonzero(near)
+    return [(int(path) + 1, int(row) + 1) for path, row in zip(paths, rows)]
+
+
+def utm(lat, lon, zone):
+    """ UTM coordinates (easting, northing) in meters of the points in the
+    given zone. Southern points have a false northing of 10000 km
+
+    :rtype: tuple
+    """
+    e2 = FLATTENING * (2 - FLATTENING)
+    ep2 = e2 / (1 - e2)
+    phi = np.radians(lat)
+    lon0 = (np.asarray(zone) - 1) * 6 - 180 + 3
+    dlon = np.radians((np.asarray(lon) - lon0 + 180) % 360 - 180)
+
+    sin, cos, tan = np.sin(phi), np.cos(phi), np.tan(phi)
+    n = SEMI_MAJOR_AXIS / np.sqrt(1 - e2 * sin ** 2)
+    t = tan ** 2
+    c = ep2 * cos ** 2
+    a = cos * dlon
+    m = SEMI_MAJOR_AXIS * (
+        (1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256) * phi -
+        (3 * e2 / 8 + 3 * e2 ** 2 / 32 + 45 * e2 ** 3 / 1024) *
+        np.sin(2 * phi) +
+        (15 * e2 ** 2 / 256 + 45 * e2 ** 3 / 1024) * np.sin(4 * phi) -
+        (35 * e2 ** 3 / 3072) * np.sin(6 * phi))
+
+    easting = UTM_SCALE * n * (
+        a + (1 - t + c) * a ** 3 / 6 +
+        (5 - 18 * t + t ** 2 + 72 * c - 58 * ep2) * a ** 5 / 120) + 500000
+    northing = UTM_SCALE * (m + n * tan * (
+        a ** 2 / 2 + (5 - t + 9 * c + 4 * c ** 2) * a ** 4 / 24 +
+        (61 - 58 * t + t ** 2 + 600 * c - 330 * ep2) * a ** 6 / 720))
+    northing = np.where(np.asarray(lat) < 0, northing + 10000000, northing)
+    return easting, northing
+
+
+def mgrs_square(zone, column, row):
+    """ Two letters id of a 100 km square, given the zone and the square
+    column (easting / 100 km) and row (northing / 100 km) """
+    column_letter = MGRS_COLUMNS[(zone - 1) % 3][column - 1]
+    row_letter = MGRS_ROWS[(row + (5 if zone % 2 == 0 else 0)) % 20]
+    return column_letter + row_letter
+
+
+def mgrs_tiles(site, margin=15, step=5):
+    """ Sentinel-2 tiles (MGRS) that intersect the site. The site, with a
+    margin, is sampled with points every `step` km and every point adds the
+    tiles that contain it, in its own zone and in the neighbour zones
+
+    :param site: the site (see `bounds`)
+    :param margin: distance in km around the site
+    :type margin: float
+    :param step: distance in km between the samples. Must be less than the
+        margin
+    :type step: float
+    :return: sorted list of tile ids (like '19GBQ')
+    :rtype: list
+    """
+    xmin, ymin, xmax, ymax = bounds(site)
+    km = 180 / (np.pi * EARTH_RADIUS)  # degrees of latitude
+    ymin = max(ymin - margin * km, -80)
+    ymax = min(ymax + margin * km, 84 - 1e-9)
+    if ymin > ymax:
+        return []
+    widest = min(abs(ymin), abs(ymax)) if ymin * ymax > 0 else 0
+    lon_km = km / max(np.cos(np.radians(widest)), 1e-6)
+    xmin, xmax = xmin - margin * lon_km, xmax + margin * lon_km
+
+    lats = np.linspace(ymin, ymax,
+                       int(np.ceil((ymax - ymin) / (step * km))) + 1)
+    lons = np.linspace(xmin, xmax,
+                       int(np.ceil((xmax - xmin) / (step * lon_km))) + 1)
+    # also sample the zone borders, where the squares can be narrow
+    borders = np.arange(np.ceil((xmin + 180) / 6) * 6 - 180, xmax, 6)
+    lons = np.union1d(lons, np.concatenate([borders - 1e-9, borders]))
+    lat, lon = [array.ravel() for array in np.meshgrid(lats, lons)]
+    lon = (lon + 180) % 360 - 180
+
+    # the tile of a square that crosses a band boundary has the band of
+    # the tile, so the bands a tile away are also tried
+    bands = set()
+    for shift in (-S2_TILE_DEGREES, 0, S2_TILE_DEGREES):
+        index = ((np.clip(lat + shift, -80, 84 - 1e-9) + 80) // 8)
+        bands.add(tuple(np.array(list(MGRS_BANDS))[
+            np.minimum(index.astype(int), len(MGRS_BANDS) - 1)]))
+    own_zone = (np.floor((lon + 180) / 6).astype(int) % 60) + 1
+
+    tiles = set()
+    for offset in (-1, 0, 1):
+        zone = (own_zone - 1 + offset) % 60 + 1
+        easting, northing = utm(lat, lon, zone)
+        for dx in (0, S2_OVERLAP):
+            for dy in (0, S2_OVERLAP):
+                column = np.floor((easting - dx) / MGRS_SQUARE).astype(int)
+                row = np.floor((northing + dy) / MGRS_SQUARE).astype(int)
+                valid = (column >= 1) & (column <= 8)
+                for band in bands:
+                    band = np.array(band)
+                    keys = set(zip(zone[valid], band[valid], column[valid],
+                                   row[valid]))
+                    for z, b, col, r in keys:
+                        tiles.add('{:02d}{}{}'.format(
+                            int(z), b, mgrs_square(int(z), int(col),
+                                                   int(r))))
+    return sorted(tiles)
+
+
+def ee_filter(col, site, **kwargs):
+    """ Metadata filter with the scenes of the collection that intersect the
+    site. Collections without an index (Landsat 1-3, MODIS, ...) are filtered
+    with `ee.Filter.bounds`
+
+    :param col: the collection
+    :type col: geetools.collection.Collection
+    :param site: the site (see `bounds`). Pass the bounding box to avoid
+        computing it for every collection
+    :param kwargs: passed to `pathrows` or `mgrs_tiles` (margin, step)
+    :rtype: ee.Filter
+    """
+    spacecraft = getattr(col, 'spacecraft', None)
+    if spacecraft == 'LANDSAT' and col.number in WRS2_LANDSAT:
+        by_path = {}
+        for path, row in pathrows(site, **kwargs):
+            by_path.setdefault(path, []).append(row)
+        if not by_path:
+            return ee.Filter.eq('WRS_PATH', -1)
+        return ee.Filter.Or(*[
+            ee.Filter.And(ee.Filter.eq('WRS_PATH', path),
+                          ee.Filter.inList('WRS_ROW', rows))
+            for path, rows in sorted(by_path.items())])
+    elif spacecraft == 'SENTINEL2':
+        return ee.Filter.inList('MGRS_TILE', mgrs_tiles(site, **kwargs))
+
+    if isinstance(site, (tuple, list)):
+        site = ee.Geometry.Rectangle(list(site))
+    return ee.Filter.bounds(site)
@@ -1,6 +1,20 @@
 # -*- coding: utf-8 -*-
 import ee
+from collections import namedtuple
 from geetools import collection
+from . import footprints
+
+# Indices that can be computed for the collections and the (renamed) bands
+# they need
+INDICES = {'ndvi': ('nir', 'red'),
+           'evi': ('nir', 'red', 'blue'),
+           'nbr': ('nir', 'swir2')}
+
+# Bands (renamed) used by the harmonization of the Landsat collections
+HARMONIZE_BANDS = ('blue', 'green', 'red', 'nir', 'swir', 'swir2')
+
+# Maximum value that can be stored in each accepted score type
+SCORE_DTYPES = {'uint8': 255, 'uint16': 65535}
 
 
 def get_id_col(id):
@@ -13,12 +27,72 @@ def get_id_col(id):
         return col
 
 
+# How images are clipped: 'exact' clips every image with the site and 'bbox'
+# clips every image with the bounds of the site and only the final mosaic
+# with the site
+CLIP_MODES = ('exact', 'bbox')
+
+# How the footprint of the composite is computed: 'site' takes the prepared
+# site and 'exact' merges the footprints of the images that won pixels
+FOOTPRINT_MODES = ('site', 'exact')
+
+# Where the BRDF correction and the harmonization are applied: 'scene'
+# corrects every image before scoring and 'composite' corrects only the
+# composite, using its col_id and date bands
+CORRECTION_MODES = ('scene', 'composite')
+
+# A site ready to be used by the Bap: the buffered and simplified geometry,
+# its bounds and, if requested, its bounding box on the client (xmin, ymin,
+# xmax, ymax) or None
+PreparedSite = namedtuple('PreparedSite', ['geometry', 'bounds', 'box'])
+
+# col_id constant images by collection id and band name
+_COL_ID_IMAGES = {}
+
+
 def get_col_id(col):
     return collection.IDS.index(col.id)
 
 
 def get_col_id_image(col, name='col_id'):
-    return ee.Image.constant(get_col_id(col)).rename(name).toUint8()
+    """ Constant image with the col_id of the collection. Each image is
+    created only once """
+    key = (col.id, name)
+    if key not in _COL_ID_IMAGES:
+        _COL_ID_IMAGES[key] = ee.Image.constant(get_col_id(col)) \
+            .rename(name).toUint8()
+    return _COL_ID_IMAGES[key]
+
+
+def prepare_site(site, buffer=None, simplify=None, box=False):
+    """ Prepare the site once for a whole build: make the buffer, simplify
+    it and compute its bounds. A site that has already been prepared is
+    returned as it is (adding the box if it's missing)
+
+    :param site: the site
+    :type site: ee.Geometry or ee.Feature or PreparedSite
+    :param buffer: distance of the buffer in meters
+    :type buffer: float
+    :param simplify: maximum error in meters to simplify the geometry
+    :type simplify: float
+    :param box: compute the bounding box on the client (see
+        `footprints.bounds`). It needs a request to the server if the site
+        was buffered or simplified
+    :type box: bool
+    :rtype: PreparedSite
+    """
+    if isinstance(site, PreparedSite):
+        if box and site.box is None:
+            site = site._replace(box=footprints.bounds(site.geometry))
+        return site
+    if isinstance(site, ee.Feature):
+        site = site.geometry()
+    if buffer is not None:
+        site = site.buffer(buffer)
+    if simplify is not None:
+        site = site.simplify(simplify)
+    return PreparedSite(site, site.bounds(),
+                        footprints.bounds(site) if box else None)
 
 
 def drange(ini, end, step=1, places=0):
@@ -39,6 +113,47 @@ def drange(ini, end, step=1, places=0):
     return result
 
 
+def quantization_step(max_value, dtype):
+    """ Get the value of one quantization step for storing scores that range
+    from 0 to `max_value` as unsigned integers of the given type
+
+    :param max_value: maximum value the score can get
+    :type max_value: float
+    :param dtype: one of 'uint8' or 'uint16'
+    :type dtype: str
+    :return: the score value that represents one unit of the integer
+    :rtype: float
+    """
+    if dtype not in SCORE_DTYPES:
+        msg = 'dtype must be one of {}, found {}'
+        raise ValueError(msg.format(list(SCORE_DTYPES.keys()), dtype))
+    return float(max_value) / SCORE_DTYPES[dtype]
+
+
+def quantize(image, bands, step, dtype):
+    """ Convert the given float bands to fixed-point unsigned integers. The
+    stored value is `round(value/step)`, so multiply by `step` to get the
+    float value back.
+
+    :param image: the image holding the bands
+    :type image: ee.Image
+    :param bands: the bands to quantize
+    :type bands: list
+    :param step: value of one quantization step (see `quantization_step`)
+    :type step: float
+    :param dtype: one of 'uint8' or 'uint16'
+    :type dtype: str
+    :rtype: ee.Image
+    """
+    quantized = image.select(bands).divide(step).round() \
+        .clamp(0, SCORE_DTYPES[dtype])
+    if dtype == 'uint8':
+        quantized = quantized.toUint8()
+    else:
+        quantized = quantized.toUint16()
+    return image.addBands(quantized, overwrite=True)
+
+
 def replace_duplicate(list, separator="_"):
     """ replace duplicated values from a list adding a suffix with a number
 
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+""" Local (NumPy) backend for the Bap process.
+
+It makes it possible to run and check the scoring logic over data that has
+already been downloaded, without Earth Engine.
+
+Conventions:
+
+- A stack of scenes is an array with shape `(time, band, y, x)` and a
+  boolean mask with the same shape. As in Earth Engine, `True` means valid
+  (unmasked) pixel.
+- Pixel scores are float32 arrays with shape `(time, y, x)`, and masked
+  pixels hold `nan`.
+- Scene scores (one value per image, like `Satellite` or `Doy`) are float32
+  arrays with shape `(time,)`.
+"""
+from . import scores, mosaic, stack, compositor, synthetic
@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+""" Local compositor. Computes the scores and the best pixel mosaic of a
+`stack.SceneStack` by spatial blocks, in parallel, writing the result into
+memory-mapped files. The memory used by each worker depends on the size of
+the blocks, not on the number of scenes.
+
+The scores are given as `geebap.scores` objects (or as tuples of class name
+and parameters) and are dispatched to the local functions by class name, so
+Earth Engine is not needed.
+"""
+import os
+import time
+import shutil
+import tempfile
+import numpy as np
+from . import scores as local_scores
+from .mosaic import Mosaic, quality_mosaic, provenance
+from .stack import SceneStack
+
+# Parameters (attributes of the score object) used by each local score
+SCORE_PARAMS = {
+    'CloudScene': [],
+    'CloudDist': ['dmin', 'dmax', 'kernel', 'units'],
+    'Doy': ['best_doy', 'season', 'function', 'stretch'],
+    'MaskPercent': ['band', 'count_zeros'],
+    'MaskPercentKernel': ['kernel', 'distance', 'units'],
+    'Satellite': ['ratio', 'relation'],
+    'Outliers': ['bands', 'process', 'dist'],
+    'Index': ['index', 'target', 'function', 'stretch', 'range_in'],
+    'MultiYear': ['main_year', 'function', 'stretch'],
+    'Threshold': ['bands'],
+    'Medoid': ['bands', 'discard_zeros', 'sample_size', 'sample_by',
+               'sample_ascending'],
+    'Brightness': ['bands', 'target'],
+}
+
+# Local keys (see `stack.SceneStack.append`) of the Earth Engine properties
+# of the scenes
+PROPERTIES = {
+    'CLOUD_COVER': 'cloud_cover',
+    'CLOUDY_PIXEL_PERCENTAGE': 'cloud_cover',
+    'COL_ID': 'col_id',
+}
+
+# Scores with one value per scene. They are computed once for the whole
+# stack
+SCENE_SCORES = ('CloudScene', 'Doy', 'MaskPercent', 'Satellite', 'MultiYear')
+
+
+def score_spec(score):
+    """ Get the class name and the parameters of a score
+
+    :param score: a score object (`geebap.scores`) or a tuple of class name
+        and a dict of parameters
+    :rtype: tuple
+    """
+    if isinstance(score, tuple):
+        name, params = score
+    else:
+        name = score.__class__.__name__
+        if name not in SCORE_PARAMS:
+            raise ValueError('score {} has no local implementation. Available:'
+                             ' {}'.format(name, sorted(SCORE_PARAMS.keys())))
+        params = dict([(param, getattr(score, param))
+                       for param in SCORE_PARAMS[name]])
+        params['range_out'] = score.range_out
+    params = dict(params)
+    params.setdefault('range_out', (0, 1))
+    return name, params
+
+
+def _radius(size, units, pixel_size):
+    """ Radius in pixels """
+    if units == 'meters':
+        return int(np.ceil(size / float(pixel_size)))
+    return int(size)
+
+
+def halo_size(specs, pixel_size=30):
+    """ Size in pixels of the halo needed by the neighbourhood scores
+
+    :param specs: the scores (see `score_spec`)
+    :type specs: list
+    :rtype: int
+    """
+    halo = 0
+    for name, params in specs:
+        if name == 'CloudDist':
+            size = min(params.get('dmax') or 255, 255)
+            halo = max(halo, _radius(size, params.get('units'), pixel_size))
+        elif name == 'MaskPercentKernel':
+            size = params.get('distance', 255)
+            halo = max(halo, _radius(size, params.get('units'), pixel_size))
+    return halo
+
+
+def scene_score(name, params, stack, context):
+    """ Compute a score with one value per scene
+
+    :rtype: numpy.ndarray
+    """
+    range_out = params['range_out']
+    if name == 'CloudScene':
+        return local_scores.cloud_scene(stack.cloud_cover,
+                                        range_out=range_out)
+    elif name == 'Doy':
+        best_date = context['best_date']
+        if best_date is None:
+            # the best date in the season of each scene, like `Doy.map`
+            if not (params.get('best_doy') and params.get('season')):
+                raise ValueError('the Doy score needs best_doy and season, '
+                                 'or the best_date of the Compositor')
+            best_date = [params['season'].date(params['best_doy'], year)
+                         for year in context['years']]
+        return local_scores.doy(stack.dates, best_date,
+                                params.get('function', 'linear'),
+                                params.get('stretch', 1), range_out)
+    elif name == 'Satellite':
+        relation = params.get('relation') or context['relation']
+        # a priority.PriorityTable
+        relation = getattr(relation, 'relation', relation)
+        if not relation:
+            raise ValueError('the Satellite score needs a relation, in the '
+                             'score or in the Compositor')
+        return local_scores.satellite(stack.col_ids, context['years'],
+                                      relation, params.get('ratio', 0.05),
+                                      range_out)
+    elif name == 'MultiYear':
+        target_year = params.get('main_year') or context['year']
+        return local_scores.multi_year(context['years'], target_year,
+                                       params.get('function', 'linear'),
+                                       params.get('stretch', 1), range_out)
+    elif name == 'MaskPercent':
+        band = params.get('band')
+        band = stack.bands.index(band) if band else 0
+        count_zeros = params.get('count_zeros', False)
+
+        masked_pixels, total = 0, 0
+        for rows, cols in local_scores.blocks(stack.data.shape,
+                                              context['block_size']):
+            data, mask = stack.window(rows, cols)
+            block_masked, block_total = local_scores.mask_count(
+                mask[:, band], data=data[:, band], count_zeros=count_zeros)
+            masked_pixels = masked_pixels + block_masked
+            total += block_total
+        return local_scores.mask_percent(None, counts=(masked_pixels, total),
+                                         range_out=range_out)
+    raise ValueError('{} is not a scene score'.format(name))
+
+
+def property_values(name, properties):
+    """ Values of a property of the scenes, given by its Earth Engine name
+    (see `PROPERTIES`) or by its local key
+
+    :param name: name of the property
+    :type name: str
+    :param properties: the properties of the scenes (see
+        `Compositor.context`)
+    :type properties: dict
+    :rtype: list
+    """
+    key = PROPERTIES.get(name, name)
+    if key not in properties:
+        raise ValueError('property {} is not available in the stack. '
+                         'Available: {}'.format(name,
+                                                sorted(properties.keys())))
+    return properties[key]
+
+
+def pixel_score(name, params, data, mask, context):
+    """ Compute a pixel score over a window of the stack
+
+    :rtype: numpy.ndarray
+    """
+    bands = context['bands']
+    range_out = params['range_out']
+    pixel_size = context['pixel_size']
+
+    if name == 'CloudDist':
+        units = params.get('units', 'pixels')
+        return local_scores.cloud_dist(
+            mask[:, 0], params.get('dmin', 0), params.get('dmax', 255),
+            kernel=params.get('kernel', 'euclidean'),
+            pixel_size=pixel_size if units == 'meters' else 1,
+            range_out=range_out)
+    elif name == 'MaskPercentKernel':
+        return local_scores.mask_percent_kernel(
+            mask[:, 0], params.get('kernel', 'square'),
+            params.get('distance', 255), params.get('units', 'pixels'),
+            pixel_size, range_out=range_out)
+    elif name == 'Outliers':
+        return local_scores.outliers(data, mask, bands, params['bands'],
+                                     params.get('process', 'median'),
+                                     params.get('dist', 0.7),
+                                     range_out=range_out)
+    elif name == 'Index':
+        values = local_scores.index_values(data, mask, bands,
+                                           params.get('index', 'ndvi'))
+        return local_scores.index(values, params.get('target', 0.8),
+                                  params.get('range_in', (0, 1)),
+                                  params.get('function', 'linear'),
+                                  params.get('stretch', 1), range_out)
+    elif name == 'Threshold':
+        thresholds = params.get('bands')
+        if not thresholds:
+            raise ValueError('the Threshold score needs the thresholds of '
+                             'the bands (param bands)')
+        return local_scores.threshold(data, mask, bands, thresholds,
+                                      range_out)
+    elif name == 'Medoid':
+        if params.get('sample_size'):
+            sample_by = params.get('sample_by')
+            sort_values = property_values(sample_by, context['properties']) \
+                if sample_by else None
+            result = local_scores.medoid_approximate(
+                data, mask, bands, params.get('bands'),
+                params['sample_size'], sort_values,
+                params.get('discard_zeros', False), sort_by=sample_by,
+                ascending=params.get('sample_ascending'))
+        else:
+            result = local_scores.medoid(data, mask, bands,
+                                         params.get('bands'),
+                                         params.get('discard_zeros', True))
+        return local_scores.adjust(result, range_out)
+    elif name == 'Brightness':
+        return local_scores.brightness(data, mask, bands,
+                                       context['max_value'],
+                                       target=params.get('target', 1),
+                                       names=params.get('bands'),
+                                       range_out=range_out)
+    raise ValueError('{} is not a pixel score'.format(name))
+
+
+def _composite_block(task):
+    """ Compute the score and the mosaic of one block and write it to the
+    output. Runs in the worker processes """
+    stack_path, output_path, rows, cols, specs, context, scene_total = task
+    stack = SceneStack(stack_path, 'r')
+    halo = context['halo']
+    height, width = stack.scene_shape[1:]
+
+    # window with the halo
+    outer_rows = slice(max(rows.start - halo, 0), min(rows.stop + halo, height))
+    outer_cols = slice(max(cols.start - halo, 0), min(cols.stop + halo, width))
+    data, mask = stack.window(outer_rows, outer_cols)
+    inner = (slice(rows.start - outer_rows.start, rows.stop - outer_rows.start),
+             slice(cols.start - outer_cols.start, cols.stop - outer_cols.start))
+
+    total = np.zeros((data.shape[0],) + data.shape[2:], dtype=np.float32)
+    total += scene_total[:, None, None]
+    for name, params in specs:
+        if name in SCENE_SCORES:
+            continue
+        total += pixel_score(name, params, np.asarray(data),
+                             np.asarray(mask), context)
+    # scores are computed over the mask of the first band
+    total[~mask[:, 0]] = np.nan
+
+    window = (Ellipsis,) + inner
+    data = data[window]
+    mask = mask[window]
+    total = total[window]
+    result = quality_mosaic(data, mask, total)
+    score = np.take_along_axis(total, np.clip(result.index, 0, None)[None],
+                               axis=0)[0]
+
+    output = open_output(output_path, stack, 'r+')
+    output['data'][:, rows, cols] = result.data
+    output['mask'][:, rows, cols] = result.mask
+    output['score'][rows, cols] = score
+    output['index'][rows, cols] = result.index
+    for array in output.values():
+        array.flush()
+    return data.shape[-2] * data.shape[-1]
+
+
+def open_output(path, stack, mode='r'):
+    """ Open (or create with mode 'w+') the memory-mapped output files of a
+    composite
+
+    :rtype: dict
+    """
+    band_shape = stack.scene_shape
+    shape = band_shape[1:]
+    files = (('data', stack.dtype, band_shape), ('mask', bool, band_shape),
+             ('score', np.float32, shape), ('index', np.int32, shape))
+    if mode == 'w+' and not os.path.exists(path):
+        os.makedirs(path)
+    return dict([(name, np.memmap(os.path.join(path, name + '.dat'),
+                                  dtype=dtype, mode=mode, shape=shape))
+                 for name, dtype, shape in files])
+
+
+class Compositor(object):
+    """ Best available pixel composite of a `SceneStack`
+
+    :param stack: the stack of scenes
+    :type stack: stack.SceneStack
+    :param scores: the scores (see `score_spec`)
+    :type scores: list
+    :param year: the year of the composite
+    :type year: int
+    :param years: the (season) year of each scene. Defaults to the year of the
+        date of each scene
+    :type years: list
+    :param best_date: the best date for the Doy score. Defaults to the
+        `best_doy` of the score inside the season of each scene
+    :type best_date: str
+    :param relation: satellite priority relation for the Satellite score,
+        if the score has none (see `priority.PriorityTable.relation`)
+    :type relation: dict or priority.PriorityTable
+    :param max_value: maximum value of the bands (for Brightness)
+    :type max_value: float
+    :param pixel_size: size of the pixel in meters
+    :type pixel_size: float
+    :param block_size: size of the blocks in pixels
+    :type block_size: int
+    """
+    def __init__(self, stack, scores, year=None, years=None, best_date=None,
+                 relation=None, max_value=10000, pixel_size=30,
+                 block_size=256):
+        self.stack = stack
+        self.specs = [score_spec(score) for score in scores]
+        self.year = year
+        if years is None:
+            years = stack.dates.astype('datetime64[Y]').astype(int) + 1970
+        self.years = list(years)
+        self.best_date = best_date
+        self.relation = relation
+        self.max_value = max_value
+        self.pixel_size = pixel_size
+        self.block_size = block_size
+
+    @property
+    def halo(self):
+        return halo_size(self.specs, self.pixel_size)
+
+    @property
+    def context(self):
+        """ Parameters shared by all the scores """
+        properties = {}
+        for scene in self.stack.scenes:
+            for key, value in scene.items():
+                properties.setdefault(key, []).append(value)
+        return {'bands': self.stack.bands, 'year': self.year,
+                'years': self.years, 'best_date': self.best_date,
+                'relation': self.relation, 'max_value': self.max_value,
+                'pixel_size': self.pixel_size, 'halo': self.halo,
+                'block_size': self.block_size, 'properties': properties}
+
+    def scene_scores(self):
+        """ Sum of the scores with one value per scene
+
+        :rtype: numpy.ndarray
+        """
+        context = self.context
+        total = np.zeros(len(self.stack), dtype=np.float32)
+        for name, params in self.specs:
+            if name in SCENE_SCORES:
+                total += scene_score(name, params, self.stack, context)
+        return total
+
+    def tasks(self, output_path):
+        context = self.context
+        scene_total = self.scene_scores()
+        for rows, cols in local_scores.blocks(self.stack.data.shape,
+                                              self.block_size):
+            yield (self.stack.path, output_path, rows, cols, self.specs,
+                   context, scene_total)
+
+    def run(self, output_path, workers=None):
+        """ Compute the composite and write it into `output_path`
+
+        :param workers: number of processes. If 1, the blocks are computed in
+            this process. If None, all the cores are used
+        :type workers: int
+        :return: the composite (memory-mapped)
+        :rtype: mosaic.Mosaic
+        """
+        self.stack.flush()
+        output = open_output(output_path, self.stack, 'w+')
+        del output
+
+        tasks = self.tasks(output_path)
+        if workers == 1:
+            for task in tasks:
+                _composite_block(task)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for _ in executor.map(_composite_block, tasks):
+                    pass
+
+        return self.open(output_path)
+
+    def open(self, output_path):
+        """ Open a composite computed with `run`
+
+        :rtype: mosaic.Mosaic
+        """
+        output = open_output(output_path, self.stack)
+        index = output['index']
+        return Mosaic(output['data'], output['mask'], index,
+                      provenance(self.stack.col_ids, index),
+                      provenance(self.stack.dates, index))
+
+
+def benchmark(compositor, workers=(1, 2, 4), repeat=1):
+    """ Measure the throughput of a compositor against the number of workers
+
+    :param compositor: the compositor
+    :type compositor: Compositor
+    :param workers: the numbers of workers to test
+    :type workers: list
+    :param repeat: number of runs for each number of workers (the best time
+        is kept)
+    :type repeat: int
+    :return: a list of dicts with 'workers', 'seconds' and 'pixels_per_second'
+        (pixels of the output per second)
+    :rtype: list
+    """
+    height, width = compositor.stack.scene_shape[1:]
+    pixels = height * width
+    results = []
+    path = tempfile.mkdtemp()
+    try:
+        for number in workers:
+            seconds = None
+            for _ in range(repeat):
+                start = time.time()
+                compositor.run(os.path.join(path, str(number)), number)
+                elapsed = time.time() - start
+                seconds = elapsed if seconds is None else min(seconds, elapsed)
+            results.append({'workers': number, 'seconds': seconds,
+                            'pixels_per_second': pixels / seconds})
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return results
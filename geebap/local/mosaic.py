@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+""" NumPy implementation of the mosaic methods: `qualityMosaic` (used by
+`Bap.build_composite_best`) and `bap.reduce_collection` (used by
+`Bap.build_composite_reduced`).
+
+The stacks can be `numpy.memmap` arrays. When `block_size` is given, the
+stack is processed by spatial blocks, so only one block is in memory at a
+time.
+"""
+from collections import namedtuple
+import numpy as np
+from .scores import by_blocks
+
+# Result of `quality_mosaic`. `data` and `mask` have shape (band, y, x) and
+# `index`, `col_id` and `date` (the provenance of each pixel) have shape
+# (y, x). Pixels without a valid score have index -1 and are masked
+Mosaic = namedtuple('Mosaic', ['data', 'mask', 'index', 'col_id', 'date'])
+
+# Result of `reduce_collection`. `data` has shape (band, y, x), `score` has
+# shape (y, x) and `index`, `col_id` and `date` have shape (set, y, x), from
+# the best score to the worst of the set
+Reduced = namedtuple('Reduced', ['data', 'score', 'index', 'col_id', 'date'])
+
+
+def provenance(values, index):
+    """ Take the per image `values` for each pixel given the image `index`.
+    Pixels with index -1 take the value of the first image """
+    if values is None:
+        return None
+    return np.asarray(values)[np.clip(index, 0, None)]
+
+
+def quality_mosaic(data, mask, score, col_ids=None, dates=None,
+                   block_size=None):
+    """ Take, for each pixel, the values of the image with the highest score
+    (like `ee.ImageCollection.qualityMosaic`). Masked scores never win, and
+    ties are resolved in favour of the first image of the stack
+
+    :param data: the stack `(time, band, y, x)`
+    :type data: numpy.ndarray
+    :param mask: the mask of the stack
+    :type mask: numpy.ndarray
+    :param score: the score `(time, y, x)` with `nan` in masked pixels
+    :type score: numpy.ndarray
+    :param col_ids: the collection id of each image
+    :type col_ids: list
+    :param dates: the date of each image (any numeric or datetime64 type)
+    :type dates: list
+    :param block_size: if given, process by spatial blocks of this size
+    :type block_size: int
+    :rtype: Mosaic
+    """
+    def compute(values, valid, quality):
+        quality = np.where(np.isnan(quality), -np.inf, quality)
+        index = quality.argmax(axis=0)
+        take = index[None, None]
+        selected = np.take_along_axis(values, take, axis=0)[0]
+        selected_mask = np.take_along_axis(valid, take, axis=0)[0]
+        index = np.where(np.isinf(quality.max(axis=0)), -1, index)
+        selected_mask &= index >= 0
+        return selected, selected_mask, index
+
+    selected, selected_mask, index = by_blocks(compute, [data, mask, score],
+                                               block_size)
+    return Mosaic(selected, selected_mask, index,
+                  provenance(col_ids, index),
+                  provenance(dates, index))
+
+
+def _mode(values):
+    """ Most frequent value along the first axis. Ties are resolved in favour
+    of the lowest value """
+    values = np.sort(values, axis=0)
+    counts = (values[:, None] == values[None, :]).sum(axis=1)
+    index = counts.argmax(axis=0)[None]
+    return np.take_along_axis(values, index, axis=0)[0]
+
+
+def _interval_mean(values, min_percentile=50, max_percentile=90):
+    """ Mean of the values between two percentiles along the first axis,
+    like `ee.Reducer.intervalMean` """
+    low = np.percentile(values, min_percentile, axis=0)
+    high = np.percentile(values, max_percentile, axis=0)
+    inside = (values >= low) & (values <= high)
+    return (values * inside).sum(axis=0) / inside.sum(axis=0)
+
+
+REDUCERS = {
+    'mean': lambda values: values.mean(axis=0),
+    'median': lambda values: np.median(values, axis=0),
+    'mode': _mode,
+    'interval_mean': _interval_mean,
+    # the set is sorted from the best score, so the first of the EE array
+    # (sorted ascending) is the last one
+    'first': lambda values: values[-1],
+}
+
+
+def reduce_collection(data, mask, score, set=5, reducer='mean',
+                      col_ids=None, dates=None, block_size=None):
+    """ Reduce the `set` images with the highest score of each pixel (like
+    `bap.reduce_collection`). As in the EE implementation, masked pixels
+    (including the score) take the value 0. The best images are found with
+    `numpy.argpartition`, so the stack is not sorted
+
+    :param score: the score `(time, y, x)` with `nan` in masked pixels
+    :type score: numpy.ndarray
+    :param set: number of images to reduce
+    :type set: int
+    :param reducer: 'mean', 'median', 'mode', 'interval_mean' or 'first'
+    :type reducer: str
+    :param block_size: if given, process by spatial blocks of this size
+    :type block_size: int
+    :rtype: Reduced
+    """
+    if reducer not in REDUCERS:
+        raise ValueError('Reducer {} not recognized'.format(reducer))
+    function = REDUCERS[reducer]
+
+    def compute(values, valid, quality):
+        total = quality.shape[0]
+        size = min(set, total)
+        quality = np.where(np.isnan(quality), 0, quality)
+        if size < total:
+            index = np.argpartition(-quality, size - 1, axis=0)[:size]
+        else:
+            index = np.broadcast_to(np.arange(total)[:, None, None],
+                                    quality.shape)
+        # sort only the set, from the best to the worst
+        subset_quality = np.take_along_axis(quality, index, axis=0)
+        order = np.argsort(-subset_quality, axis=0, kind='stable')
+        index = np.take_along_axis(index, order, axis=0)
+        subset_quality = np.take_along_axis(subset_quality, order, axis=0)
+
+        take = index[:, None]
+        subset = np.take_along_axis(values, take, axis=0)
+        subset_valid = np.take_along_axis(valid, take, axis=0)
+        subset = np.where(subset_valid, subset, 0).astype(np.float64)
+
+        reduced = function(subset).astype(np.float32)
+        reduced_score = function(subset_quality).astype(np.float32)
+        return reduced, reduced_score, index
+
+    reduced, reduced_score, index = by_blocks(
+        compute, [data, mask, score], block_size)
+    return Reduced(reduced, reduced_score, index,
+                   provenance(col_ids, index),
+                   provenance(dates, index))
@@ -0,0 +1,828 @@
+# -*- coding: utf-8 -*-
+""" NumPy implementation of the pixel-wise and scene-level scores of
+`geebap.scores`. Each function follows the formula of the Earth Engine
+implementation, including the `range_out` adjustment, and is vectorized over
+time and space (see the module `geebap.local` for the array conventions).
+"""
+import warnings
+import numpy as np
+
+# Band formulas for the indices (renamed bands)
+INDICES = {
+    'ndvi': lambda b: (b['nir'] - b['red']) / (b['nir'] + b['red']),
+    'evi': lambda b: 2.5 * ((b['nir'] - b['red']) /
+                            (b['nir'] + 6 * b['red'] - 7.5 * b['blue'] + 1)),
+    'nbr': lambda b: (b['nir'] - b['swir2']) / (b['nir'] + b['swir2'])
+}
+
+
+def masked(values, mask):
+    """ Set `nan` in the pixels that are not valid
+
+    :param values: the values
+    :type values: numpy.ndarray
+    :param mask: boolean mask (True is valid)
+    :type mask: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    values = np.asarray(values, dtype=np.float32)
+    return np.where(mask, values, np.float32(np.nan))
+
+
+def select(data, mask, bands, names):
+    """ Select bands from a stack by name
+
+    :param data: the stack `(time, band, y, x)`
+    :param mask: the mask of the stack
+    :param bands: the band names of the stack
+    :type bands: list
+    :param names: the names of the bands to select
+    :type names: list
+    :return: the selected data and mask
+    :rtype: tuple
+    """
+    indices = [list(bands).index(name) for name in names]
+    return data[:, indices], mask[:, indices]
+
+
+def index_values(data, mask, bands, index):
+    """ Compute an index ('ndvi', 'evi' or 'nbr') over a stack. Same formulas
+    as `geetools.indices`
+
+    :return: the index with shape `(time, y, x)`
+    :rtype: numpy.ndarray
+    """
+    formula = INDICES[index]
+    names = {'ndvi': ('nir', 'red'),
+             'evi': ('nir', 'red', 'blue'),
+             'nbr': ('nir', 'swir2')}[index]
+    values, valid = select(data, mask, bands, names)
+    values = values.astype(np.float32)
+    relation = dict([(name, values[:, i]) for i, name in enumerate(names)])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = formula(relation)
+    return masked(result, valid.all(axis=1) & np.isfinite(result))
+
+
+def parametrize(values, range_from, range_to):
+    """ Parametrize from a known range to a new range. Same as
+    `geetools.tools.image.parametrize` """
+    min0, max0 = range_from
+    min1, max1 = range_to
+    values = np.asarray(values, dtype=np.float32)
+    return ((values - min0) / float(max0 - min0)) * (max1 - min1) + min1
+
+
+def adjust(values, range_out=(0, 1)):
+    """ Adjust the score from (0, 1) to `range_out`, like `Score.adjust` """
+    if range_out is None or tuple(range_out) == (0, 1):
+        return np.asarray(values, dtype=np.float32)
+    return parametrize(values, (0, 1), range_out)
+
+
+def linear_function(values, range_min, range_max, mean=None,
+                    output_min=None, output_max=None):
+    """ Linear function of `geetools.tools.image.linearFunction` and
+    `geetools.tools.imagecollection.linearFunctionProperty`
+
+    f(x) = abs(x-mean)*(-1)*((output_max-output_min)/t)+output_max
+
+    where t = max(abs(range_max-mean), abs(range_min-mean)). If t is 0
+    (every value is at the same distance) all values take `output_max`
+    """
+    values = np.asarray(values, dtype=np.float32)
+    mean = range_max if mean is None else mean
+    output_max = range_max if output_max is None else output_max
+    output_min = range_min if output_min is None else output_min
+
+    t = max(abs(range_max - mean), abs(range_min - mean))
+    if t == 0:
+        return np.full(values.shape, output_max, dtype=np.float32)
+    factor = np.float32((output_max - output_min) / float(t))
+
+    return np.abs(values - mean) * (-factor) + np.float32(output_max)
+
+
+def gauss_function(values, range_min, range_max, mean=0, std=None,
+                   output_min=None, output_max=1, stretch=1):
+    """ Gauss function of `geetools.tools.image.gaussFunction`. If `std`
+    is 0 all values take `output_max` """
+    values = np.asarray(values, dtype=np.float32)
+    if std is None:
+        std = (range_max - range_min) / 4.0
+    if std == 0:
+        return np.full(values.shape, output_max, dtype=np.float32)
+
+    def compute_gauss(val):
+        return np.exp(((val - mean) ** 2) / (-2.0 * std ** 2) *
+                      abs(stretch)) * output_max
+
+    no_parametrized = compute_gauss(values)
+
+    if output_min is None:
+        return no_parametrized.astype(np.float32)
+
+    min_result = min(compute_gauss(range_min), compute_gauss(range_max))
+    parametrized = (no_parametrized - min_result) / \
+        (output_max - min_result) * (output_max - output_min) + output_min
+    return parametrized.astype(np.float32)
+
+
+def index(values, target=0.8, range_in=(0, 1), function='linear', stretch=1,
+          range_out=(0, 1)):
+    """ Index score (`scores.Index`)
+
+    :param values: index values `(time, y, x)` with `nan` in masked pixels
+    :type values: numpy.ndarray
+    :param target: the value of the index that takes the top score
+    :type target: float
+    :param range_in: range of the index
+    :type range_in: tuple
+    :param function: 'linear' or 'gauss'
+    :type function: str
+    :rtype: numpy.ndarray
+    """
+    if function == 'linear':
+        return linear_function(values, range_in[0], range_in[1], target,
+                               range_out[0], range_out[1])
+    elif function == 'gauss':
+        return gauss_function(values, range_in[0], range_in[1], target,
+                              output_min=range_out[0],
+                              output_max=range_out[1], stretch=stretch)
+    else:
+        raise ValueError('function parameter must be "linear" or "gauss"')
+
+
+def brightness(data, mask, bands, max_value, min_value=0, target=1,
+               names=None, range_out=(0, 1)):
+    """ Brightness score (`scores.Brightness`). The brightness is the sum of
+    the bands, and the top score goes to `target` times the maximum
+    brightness
+
+    :param bands: the band names of the stack
+    :type bands: list
+    :param max_value: maximum value of each band
+    :type max_value: float
+    :param names: bands used for the brightness. Defaults to green, blue,
+        red, nir and swir
+    :type names: list
+    :rtype: numpy.ndarray
+    """
+    if not names:
+        names = ['green', 'blue', 'red', 'nir', 'swir']
+    values, valid = select(data, mask, bands, names)
+    length = len(names)
+
+    total = values.astype(np.float32).sum(axis=1)
+    result = linear_function(total, min_value * length, max_value * length,
+                             max_value * length * target,
+                             range_out[0], range_out[1])
+    return masked(result, valid.all(axis=1))
+
+
+def threshold(data, mask, bands, thresholds, range_out=(0, 1)):
+    """ Threshold score (`scores.Threshold`). Proportion of bands that fall
+    inside the thresholds
+
+    :param thresholds: a dict of band name and a dict with `min` and/or
+        `max` values. Ex: {'blue': {'min': 50, 'max': 1500}}
+    :type thresholds: dict
+    :rtype: numpy.ndarray
+    """
+    names = list(thresholds.keys())
+    values, valid = select(data, mask, bands, names)
+
+    # shape (1, band, 1, 1) to broadcast over the stack
+    def limits(limit, default):
+        result = [thresholds[name].get(limit) for name in names]
+        result = [default if val is None else val for val in result]
+        return np.array(result, dtype=np.float64)[None, :, None, None]
+
+    inside = (values >= limits('min', -np.inf)) & \
+             (values <= limits('max', np.inf))
+    result = inside.mean(axis=1)
+    return masked(adjust(result, range_out), valid.all(axis=1))
+
+
+def satellite(collection_ids, years, relation, ratio=0.05, range_out=(0, 1)):
+    """ Satellite score (`scores.Satellite`). One value per scene
+
+    :param collection_ids: the collection id of each scene
+    :type collection_ids: list
+    :param years: the (season) year of each scene
+    :type years: list
+    :param relation: a dict of year and list of collection ids sorted by
+        priority. See `priority.PriorityTable.relation`. Years out of it take
+        the nearest year, like `priority.PriorityTable.clamp`
+    :type relation: dict
+    :rtype: numpy.ndarray
+    """
+    first, last = min(relation), max(relation)
+    result = []
+    for colid, year in zip(collection_ids, years):
+        year = min(max(int(year), first), last)
+        prior_list = relation.get(year, [])
+        if colid in prior_list:
+            factor = ratio * prior_list.index(colid)
+        else:
+            factor = 1
+        result.append(1 - factor)
+    return adjust(np.array(result, dtype=np.float32), range_out)
+
+
+def _property_function(values, function, stretch, range_out):
+    """ Linear or gauss function over a property of the whole collection,
+    like `linearFunctionProperty` and `gaussFunctionProperty` with
+    `mean=0` and the range taken from the collection. If all values are
+    equal they take the top score """
+    values = np.asarray(values, dtype=np.float64)
+    range_min = values.min()
+    range_max = values.max()
+    output_min, output_max = range_out
+
+    if function == 'linear':
+        result = linear_function(values, range_min, range_max, 0,
+                                 output_min, output_max)
+    elif function == 'gauss':
+        std = (range_max - range_min) / 4.0
+        if std == 0:
+            return np.full(values.shape, output_max, dtype=np.float32)
+
+        def compute_gauss(value):
+            return np.exp((value ** 2) / (-2.0 * std ** 2) * stretch) * \
+                output_max
+
+        min_result = min(compute_gauss(range_min), compute_gauss(range_max))
+        result = (compute_gauss(values) - min_result) / \
+            (output_max - min_result) * (output_max - output_min) + output_min
+    else:
+        raise ValueError("function must be 'linear' or 'gauss'")
+
+    return np.asarray(result, dtype=np.float32)
+
+
+def doy(dates, best_date, function='linear', stretch=1, range_out=(0, 1)):
+    """ Day of year score (`scores.Doy`). One value per scene
+
+    :param dates: the date of each scene
+    :type dates: numpy.ndarray (datetime64)
+    :param best_date: the date that will be prioritized, or one for each
+        scene
+    :type best_date: numpy.datetime64 or numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    dates = np.asarray(dates, dtype='datetime64[ms]')
+    best_date = np.asarray(best_date, dtype='datetime64[ms]')
+    distance = (dates - best_date) / np.timedelta64(1, 'D')
+    return _property_function(distance, function, stretch, range_out)
+
+
+def multi_year(years, target_year, function='linear', stretch=1,
+               range_out=(0, 1)):
+    """ Multi year score (`scores.MultiYear`). One value per scene
+
+    :param years: the (season) year of each scene
+    :type years: list
+    :param target_year: the central year
+    :type target_year: int
+    :rtype: numpy.ndarray
+    """
+    distance = target_year - np.asarray(years, dtype=np.float64)
+    return _property_function(distance, function, stretch, range_out)
+
+
+def exponential(values, a=-10, range_in=(0, 100)):
+    """ `expressions.Expression.Exponential` """
+    values = np.asarray(values, dtype=np.float64)
+    vmin, vmax = range_in
+    mean = (vmin + vmax) / 2.0
+    exponent = (np.minimum(values, vmax) - mean) * (1.0 / vmax * a)
+    return (1.0 - (1.0 / (np.exp(exponent) + 1.0))).astype(np.float32)
+
+
+def cloud_scene(cloud_cover, formula=None, range_out=(0, 1)):
+    """ Cloud cover of the scene score (`scores.CloudScene`). One value per
+    scene
+
+    :param cloud_cover: the cloud cover of each scene (0 to 100)
+    :type cloud_cover: list
+    :param formula: a function to apply over the cloud cover. Defaults to
+        `exponential`
+    :type formula: callable
+    :rtype: numpy.ndarray
+    """
+    formula = formula or exponential
+    result = formula(np.asarray(cloud_cover, dtype=np.float64))
+    return adjust(result, range_out)
+
+
+def mask_count(mask, region=None, data=None, count_zeros=False):
+    """ Number of masked pixels of each scene inside the region and number of
+    pixels of the region. The counts of the blocks of a stack can be added
+    to get the counts of the whole scenes
+
+    :param mask: the mask of the band that holds the mask `(time, y, x)`
+    :type mask: numpy.ndarray
+    :param region: boolean array `(y, x)` of the pixels inside the geometry.
+        Defaults to all pixels
+    :type region: numpy.ndarray
+    :param data: the values of the band. Needed if `count_zeros` is True
+    :type data: numpy.ndarray
+    :param count_zeros: count pixels with zero value as masked
+    :type count_zeros: bool
+    :return: the masked pixels of each scene and the total
+    :rtype: tuple
+    """
+    valid = np.asarray(mask, dtype=bool)
+    if count_zeros:
+        valid = valid & (np.asarray(data) != 0)
+    if region is None:
+        region = np.ones(valid.shape[1:], dtype=bool)
+
+    masked_pixels = (~valid & region[None]).sum(axis=(1, 2))
+    return masked_pixels, region.sum()
+
+
+def mask_percent(mask, region=None, data=None, count_zeros=False,
+                 range_out=(0, 1), counts=None):
+    """ Mask percentage score (`scores.MaskPercent`). One value per scene: 1
+    minus the proportion of masked pixels inside the region, truncated to 4
+    decimal places
+
+    :param mask: the mask of the band that holds the mask `(time, y, x)`.
+        Not used if `counts` is given
+    :type mask: numpy.ndarray
+    :param counts: the masked pixels and the total, if already computed
+        (see `mask_count`)
+    :type counts: tuple
+    :rtype: numpy.ndarray
+    """
+    if counts is None:
+        counts = mask_count(mask, region, data, count_zeros)
+    masked_pixels, total = counts
+    masked_pixels = np.asarray(masked_pixels)
+    percentage = np.trunc(masked_pixels / float(total) * 1e4) / 1e4
+
+    return adjust(1 - percentage, range_out)
+
+
+def _scipy_ndimage():
+    """ Import scipy.ndimage, which is an optional dependency """
+    try:
+        from scipy import ndimage
+    except ImportError:
+        raise ImportError('scipy is needed for computing distances in the '
+                          'local backend: pip install geebap[local]')
+    return ndimage
+
+
+def distance_to_mask(mask, kernel='euclidean', pixel_size=1, dmax=None):
+    """ Exact distance from every pixel to the nearest masked pixel of the
+    same image, using distance transforms (cost does not depend on the
+    distance)
+
+    :param mask: boolean mask `(time, y, x)` (True is valid)
+    :type mask: numpy.ndarray
+    :param kernel: 'euclidean', 'manhattan' or 'chebyshev'
+    :type kernel: str
+    :param pixel_size: size of the pixel in the distance units
+    :type pixel_size: float
+    :param dmax: maximum distance of interest. Distances greater than this are
+        `inf`
+    :type dmax: float
+    :return: distances with shape `(time, y, x)`. Images without masked
+        pixels get `inf`
+    :rtype: numpy.ndarray
+    """
+    ndimage = _scipy_ndimage()
+    mask = np.asarray(mask, dtype=bool)
+    if mask.all():
+        return np.full(mask.shape, np.inf, dtype=np.float32)
+
+    if kernel == 'euclidean':
+        # A big distance between images along the time axis, so the
+        # nearest masked pixel of other images is never closer than dmax
+        plane = max(mask.shape[1:]) * float(pixel_size)
+        if dmax is not None:
+            plane = min(plane, dmax)
+        sampling = (2 * plane + 1, pixel_size, pixel_size)
+        distance = ndimage.distance_transform_edt(mask, sampling=sampling)
+        distance = distance.astype(np.float32)
+        distance[distance > plane] = np.inf
+    elif kernel in ('manhattan', 'chebyshev'):
+        # structuring element that only connects pixels of the same image
+        metric = np.zeros((3, 3, 3), dtype=bool)
+        if kernel == 'manhattan':
+            metric[1] = ndimage.generate_binary_structure(2, 1)
+        else:
+            metric[1] = True
+        distance = ndimage.distance_transform_cdt(mask, metric=metric)
+        distance = distance.astype(np.float32) * pixel_size
+        distance[distance < 0] = np.inf
+    else:
+        raise ValueError("kernel must be 'euclidean', 'manhattan' or "
+                         "'chebyshev'")
+
+    if dmax is not None:
+        distance[distance > dmax] = np.inf
+
+    return distance
+
+
+def cloud_dist(mask, dmin=0, dmax=255, factor=0.2, kernel='euclidean',
+               pixel_size=1, range_out=(0, 1)):
+    """ Distance to clouds score (`scores.CloudDist`). Same formula as
+    `CloudDist.compute`:
+
+    1-exp((-dist+dmin)/(dmax*factor))
+
+    Pixels further than `dmax` get 1 and masked pixels are masked.
+
+    :param mask: the mask of the image (first band) `(time, y, x)`
+    :type mask: numpy.ndarray
+    :param kernel: 'euclidean', 'manhattan' or 'chebyshev'
+    :type kernel: str
+    :param pixel_size: size of the pixel in the units of `dmin` and `dmax`
+    :type pixel_size: float
+    :rtype: numpy.ndarray
+    """
+    distance = distance_to_mask(mask, kernel, pixel_size, dmax)
+    with np.errstate(over='ignore'):
+        result = 1 - np.exp((-distance + dmin) / float(dmax * factor))
+    result[np.isinf(distance)] = 1
+    return masked(adjust(result, range_out), mask)
+
+
+def _box_sum(values, ry, rx):
+    """ Sum of the values in a window of (2*ry+1, 2*rx+1) pixels around each
+    pixel using an integral image. Pixels outside the image count as zero """
+    padded = np.pad(values, ((0, 0), (ry + 1, ry), (rx + 1, rx)),
+                    mode='constant')
+    integral = padded.cumsum(axis=1).cumsum(axis=2)
+    h = values.shape[1]
+    w = values.shape[2]
+    wy = 2 * ry + 1
+    wx = 2 * rx + 1
+    return (integral[:, wy:wy + h, wx:wx + w] -
+            integral[:, :h, wx:wx + w] -
+            integral[:, wy:wy + h, :w] +
+            integral[:, :h, :w])
+
+
+def kernel_footprint(kernel, radius):
+    """ Boolean footprint of a kernel with the given radius (in pixels)
+
+    :param kernel: 'circle', 'cross', 'diamond', 'octagon', 'plus' or
+        'square'
+    :type kernel: str
+    :rtype: numpy.ndarray
+    """
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    dy = np.abs(dy)
+    dx = np.abs(dx)
+    footprints = {
+        'circle': lambda: dx ** 2 + dy ** 2 <= radius ** 2,
+        'cross': lambda: dx == dy,
+        'diamond': lambda: dx + dy <= radius,
+        'octagon': lambda: dx + dy <= radius * np.sqrt(2),
+        'plus': lambda: (dx == 0) | (dy == 0),
+        'square': lambda: np.ones(dx.shape, dtype=bool)
+    }
+    if kernel not in footprints:
+        raise ValueError('kernel must be one of {}'.format(
+            list(footprints.keys())))
+    return footprints[kernel]()
+
+
+def neighborhood_count(valid, kernel='square', radius=1):
+    """ Count the valid pixels inside a kernel around each pixel. Square and
+    plus kernels use integral images and other kernels use a FFT
+    convolution, so the cost does not depend on the radius
+
+    :param valid: boolean array `(time, y, x)`
+    :type valid: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    values = np.asarray(valid, dtype=np.int32)
+    if kernel == 'square':
+        return _box_sum(values, radius, radius)
+    elif kernel == 'plus':
+        return _box_sum(values, radius, 0) + _box_sum(values, 0, radius) - \
+            values
+
+    footprint = kernel_footprint(kernel, radius).astype(np.float64)
+    h, w = values.shape[1:]
+    shape = (h + 2 * radius, w + 2 * radius)
+    spectrum = np.fft.rfft2(values, s=shape, axes=(1, 2)) * \
+        np.fft.rfft2(footprint, s=shape)
+    count = np.fft.irfft2(spectrum, s=shape, axes=(1, 2))
+    count = count[:, radius:radius + h, radius:radius + w]
+    return np.rint(count).astype(np.int64)
+
+
+def mask_percent_kernel(mask, kernel='square', size=255, units='pixels',
+                        pixel_size=1, data=None, count_zeros=False,
+                        range_out=(0, 1)):
+    """ Mask percent score using a kernel (`scores.MaskPercentKernel`).
+    Number of valid pixels inside the kernel divided by `(size*2+1)**2`, as
+    in `MaskPercentKernel.compute`
+
+    :param mask: the mask of the image (first band) `(time, y, x)`
+    :type mask: numpy.ndarray
+    :param size: radius of the kernel in `units`
+    :type size: int
+    :param units: 'pixels' or 'meters'
+    :type units: str
+    :param pixel_size: size of the pixel in meters
+    :type pixel_size: float
+    :rtype: numpy.ndarray
+    """
+    valid = np.asarray(mask, dtype=bool)
+    if count_zeros:
+        valid = valid & (np.asarray(data) != 0)
+
+    if units == 'pixels' and size > 255:
+        size = 255
+    radius = int(size) if units == 'pixels' else int(size // pixel_size)
+
+    count = neighborhood_count(valid, kernel, radius)
+    result = count / float((size * 2 + 1) ** 2)
+    return masked(adjust(result, range_out), valid)
+
+
+def blocks(shape, block_size):
+    """ Spatial blocks (slices over the last two axes) of `block_size`
+    pixels """
+    height, width = shape[-2:]
+    for y in range(0, height, block_size):
+        for x in range(0, width, block_size):
+            yield (slice(y, min(y + block_size, height)),
+                   slice(x, min(x + block_size, width)))
+
+
+def by_blocks(function, arrays, block_size=None):
+    """ Apply a function that works pixel by pixel (along time and bands)
+    over spatial blocks of the given arrays, so only one block of the stack
+    is in memory at a time. Useful for memory-mapped stacks
+
+    :param function: a function that takes the arrays (in the same order)
+        and returns an array (or a tuple of arrays) whose last two axes are
+        (y, x)
+    :param arrays: the arrays. The last two axes must be (y, x)
+    :type arrays: list
+    :param block_size: size of the blocks in pixels. If None, the function is
+        applied over the whole arrays
+    :type block_size: int
+    :rtype: numpy.ndarray
+    """
+    if not block_size:
+        return function(*arrays)
+
+    result = None
+    for rows, cols in blocks(arrays[0].shape, block_size):
+        part = function(*[np.asarray(array[..., rows, cols])
+                          for array in arrays])
+        parts = part if isinstance(part, tuple) else (part,)
+        if result is None:
+            result = [np.empty(p.shape[:-2] + arrays[0].shape[-2:],
+                               dtype=p.dtype) for p in parts]
+        for array, p in zip(result, parts):
+            array[..., rows, cols] = p
+    return tuple(result) if isinstance(part, tuple) else result[0]
+
+
+def _self_mask(values, valid):
+    """ Values with `nan` in the masked and zero pixels, like `selfMask` """
+    values = values.astype(np.float64)
+    values[~valid | (values == 0)] = np.nan
+    return values
+
+
+def outlier_flags(data, mask, bands, names=None, reducer='mean', amount=None,
+                  block_size=None):
+    """ Determine if pixels are outliers (`scores.Outliers.apply`). The
+    statistics are computed along time over the stack, discarding masked and
+    zero pixels (`selfMask`)
+
+    :param names: the bands to use. If None, all bands are used
+    :type names: list
+    :param reducer: 'mean' (mean and standard deviation) or 'median'
+        (percentiles)
+    :type reducer: str
+    :param amount: how many stdDev (mean) or percentage (median) to determine
+        the upper and lower limit
+    :type amount: float
+    :param block_size: if given, compute over spatial blocks of this size
+    :type block_size: int
+    :return: 1 for outliers and 0 for not outliers, with shape
+        `(time, band, y, x)`. `nan` where it cannot be determined
+    :rtype: numpy.ndarray
+    """
+    if names:
+        indices = [list(bands).index(name) for name in names]
+    else:
+        indices = list(range(data.shape[1]))
+
+    if amount is None:
+        amount = 0.7 if reducer == 'mean' else 0.5
+
+    def compute(values, valid):
+        values = values[:, indices]
+        valid = valid[:, indices]
+        stats = _self_mask(values, valid)
+        with warnings.catch_warnings():
+            # all-nan pixels (only masked or zero values) give nan
+            warnings.simplefilter('ignore', RuntimeWarning)
+            if reducer == 'mean':
+                mean = np.nanmean(stats, axis=0)
+                distance = np.nanstd(stats, axis=0) * amount
+                mmin = mean - distance
+                mmax = mean + distance
+            elif reducer == 'median':
+                mmin = np.nanpercentile(stats, 50 - (50 * amount), axis=0)
+                mmax = np.nanpercentile(stats, 50 + (50 * amount), axis=0)
+            else:
+                raise ValueError("reducer must be 'mean' or 'median'")
+
+        # zeros are compared with the statistics, as in EE
+        values = values.astype(np.float64)
+        inside = (values >= mmin) & (values <= mmax)
+        result = (~inside).astype(np.float32)
+        determined = valid & np.isfinite(mmin) & np.isfinite(mmax)
+        return np.where(determined, result, np.float32(np.nan))
+
+    return by_blocks(compute, [data, mask], block_size)
+
+
+def outliers(data, mask, bands, names, process='median', dist=0.7,
+             block_size=None, range_out=(0, 1)):
+    """ Outliers score (`scores.Outliers`). Proportion of bands that are not
+    outliers
+
+    :param names: the bands to use
+    :type names: list
+    :param process: 'mean' or 'median'
+    :type process: str
+    :param dist: the `amount` of `outlier_flags`
+    :type dist: float
+    :rtype: numpy.ndarray
+    """
+    flags = outlier_flags(data, mask, bands, names, process, dist, block_size)
+    # a masked band masks the sum of bands
+    result = (1 - flags).mean(axis=1)
+    return adjust(result, range_out)
+
+
+def _sum_distance(values, valid, discard_zeros):
+    """ Sum of the euclidean distances of each image to every other image,
+    like `geetools.algorithms.sumDistance`. Masked and negative values are
+    zero """
+    values = np.where(valid & (values > 0), values, 0).astype(np.float64)
+    result = np.empty((values.shape[0],) + values.shape[2:])
+    for i in range(values.shape[0]):
+        diff = values[i][None] - values
+        if discard_zeros:
+            # zeros take the value of the other image, so they do not count
+            diff[(values[i][None] == 0) | (values == 0)] = 0
+        distance = np.sqrt((diff ** 2).sum(axis=1))
+        result[i] = distance.sum(axis=0)
+    return result
+
+
+def _normalize_distance(distance):
+    """ 1-((val-min)/(max-min)) with min and max along time """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        dmin = np.nanmin(distance, axis=0)
+        dmax = np.nanmax(distance, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return 1 - ((distance - dmin) / (dmax - dmin))
+
+
+def medoid(data, mask, bands, names=None, discard_zeros=True, normalize=True,
+           block_size=None):
+    """ Medoid score (`scores.Medoid`), using the sum of the euclidean
+    distances of each image to the rest of the stack
+
+    :param names: the bands to use. If None, all bands are used
+    :type names: list
+    :param discard_zeros: zero values will not count in the distance
+    :type discard_zeros: bool
+    :param normalize: normalize the result to be between 0 and 1. If False,
+        the result is the distance multiplied by -1
+    :type normalize: bool
+    :param block_size: if given, compute over spatial blocks of this size
+    :type block_size: int
+    :rtype: numpy.ndarray
+    """
+    if names:
+        indices = [list(bands).index(name) for name in names]
+    else:
+        indices = list(range(data.shape[1]))
+
+    def compute(values, valid):
+        values = values[:, indices]
+        valid = valid[:, indices]
+        distance = _sum_distance(values, valid, discard_zeros)
+        if normalize:
+            distance = _normalize_distance(distance)
+        else:
+            distance = distance * -1
+        return masked(distance, valid.all(axis=1))
+
+    return by_blocks(compute, [data, mask], block_size)
+
+
+# Cloud properties, same as `scores.CLOUD_PROPERTIES`. The local key
+# (`cloud_cover`) matches in upper case
+CLOUD_PROPERTIES = ('CLOUD_COVER', 'CLOUD_COVER_LAND',
+                    'CLOUDY_PIXEL_PERCENTAGE', 'CLOUD_COVERAGE_ASSESSMENT')
+
+
+def ascending_default(sort_by):
+    """ Default order of the subsample, same as
+    `scores.Medoid.ascending_default`: the lowest values for the cloud
+    properties (the less cloudy images) and the highest for the rest
+
+    :param sort_by: name of the property (Earth Engine or local name)
+    :type sort_by: str
+    :rtype: bool
+    """
+    return bool(sort_by) and sort_by.upper() in CLOUD_PROPERTIES
+
+
+def sample_indices(total, size, sort_values=None, ascending=False):
+    """ Indices of the images of the subsample of `scores.Medoid.subsample`.
+    The stack must be sorted by time
+
+    :param total: number of images in the stack
+    :type total: int
+    :param size: number of images of the subsample
+    :type size: int
+    :param sort_values: if given, take the images with the highest (or the
+        lowest, see `ascending`) values
+    :type sort_values: list
+    :param ascending: take the images with the lowest values of `sort_values`
+    :type ascending: bool
+    :rtype: numpy.ndarray
+    """
+    if sort_values is not None:
+        values = np.asarray(sort_values, dtype=np.float64)
+        if not ascending:
+            values = -values
+        order = np.argsort(values, kind='stable')
+        return order[:size]
+    stride = max(total // size, 1)
+    return np.arange(0, total, stride)[:size]
+
+
+def medoid_approximate(data, mask, bands, names=None, sample_size=50,
+                       sort_values=None, discard_zeros=False, normalize=True,
+                       block_size=None, sort_by=None, ascending=None):
+    """ Approximate medoid score (`scores.Medoid.apply_approximate`), using
+    the distance to the median of a subsample of the stack
+
+    :param sample_size: number of images of the subsample
+    :type sample_size: int
+    :param sort_values: values of the property used to choose the images of
+        the subsample (`sample_by`). If None, a fixed stride over time is used
+    :type sort_values: list
+    :param sort_by: name of the property of `sort_values`, only used to
+        determine the default of `ascending`
+    :type sort_by: str
+    :param ascending: take the images with the lowest values of
+        `sort_values`. Defaults to `ascending_default(sort_by)`
+    :type ascending: bool
+    :rtype: numpy.ndarray
+    """
+    if ascending is None:
+        ascending = ascending_default(sort_by)
+    if names:
+        indices = [list(bands).index(name) for name in names]
+    else:
+        indices = list(range(data.shape[1]))
+    sample = sample_indices(data.shape[0], sample_size, sort_values,
+                            ascending)
+
+    def compute(values, valid):
+        values = values[:, indices].astype(np.float64)
+        valid = valid[:, indices]
+        values[~valid] = np.nan
+
+        subsample = values[sample]
+        if discard_zeros:
+            subsample = np.where(subsample == 0, np.nan, subsample)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            median = np.nanmedian(subsample, axis=0)
+
+        if discard_zeros:
+            values = np.where(values == 0, median, values)
+        distance = np.sqrt(((values - median) ** 2).sum(axis=1))
+        if normalize:
+            distance = _normalize_distance(distance)
+        else:
+            distance = distance * -1
+        return masked(distance, np.isfinite(distance))
+
+    return by_blocks(compute, [data, mask], block_size)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+""" On disk stack of scenes for the local backend.
+
+A stack is a folder with:
+
+- `data.dat`: a `(time, band, y, x)` array (`numpy.memmap`)
+- `mask.dat`: a boolean array with the same shape (True is valid)
+- `meta.json`: the band names, shape, data type and the properties of each
+  scene (collection id, date, cloud cover, etc)
+
+Time is the first axis, so appending a scene only adds bytes at the end of
+the files and existing scenes are never rewritten. Space for new scenes is
+preallocated and grows by doubling.
+"""
+import os
+import json
+import numpy as np
+
+DATA_FILE = 'data.dat'
+MASK_FILE = 'mask.dat'
+META_FILE = 'meta.json'
+
+
+class SceneStack(object):
+    """ Memory-mapped stack of scenes. Use `SceneStack.create` to make a new
+    one and `SceneStack(path)` to open an existing one
+
+    :param path: the folder of the stack
+    :type path: str
+    :param mode: 'r' for read only or 'r+' for read and write
+    :type mode: str
+    """
+    def __init__(self, path, mode='r+'):
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self._map()
+
+    @classmethod
+    def create(cls, path, bands, height, width, dtype='int16', capacity=16):
+        """ Create an empty stack
+
+        :param bands: the band names
+        :type bands: list
+        :param height: number of rows
+        :type height: int
+        :param width: number of columns
+        :type width: int
+        :param dtype: data type of the data
+        :type dtype: str
+        :param capacity: number of scenes to preallocate
+        :type capacity: int
+        :rtype: SceneStack
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        meta = {'bands': list(bands), 'height': int(height),
+                'width': int(width), 'dtype': np.dtype(dtype).name,
+                'capacity': 0, 'scenes': []}
+        for filename in (DATA_FILE, MASK_FILE):
+            open(os.path.join(path, filename), 'wb').close()
+        with open(os.path.join(path, META_FILE), 'w') as f:
+            json.dump(meta, f)
+        stack = cls(path)
+        stack.reserve(capacity)
+        return stack
+
+    @property
+    def bands(self):
+        return self.meta['bands']
+
+    @property
+    def scenes(self):
+        """ Properties of each scene """
+        return self.meta['scenes']
+
+    @property
+    def dtype(self):
+        return np.dtype(self.meta['dtype'])
+
+    @property
+    def scene_shape(self):
+        """ Shape of one scene (band, y, x) """
+        return (len(self.bands), self.meta['height'], self.meta['width'])
+
+    @property
+    def capacity(self):
+        return self.meta['capacity']
+
+    @property
+    def data(self):
+        """ The data of the scenes `(time, band, y, x)` (no copy) """
+        return self._data[:len(self)]
+
+    @property
+    def mask(self):
+        """ The mask of the scenes `(time, band, y, x)` (no copy) """
+        return self._mask[:len(self)]
+
+    @property
+    def col_ids(self):
+        return np.array([scene.get('col_id') for scene in self.scenes])
+
+    @property
+    def dates(self):
+        return np.array([scene.get('date') for scene in self.scenes],
+                        dtype='datetime64[D]')
+
+    @property
+    def cloud_cover(self):
+        return np.array([scene.get('cloud_cover', np.nan)
+                         for scene in self.scenes], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.scenes)
+
+    def _map(self):
+        """ Map the files to memory """
+        shape = (self.capacity,) + self.scene_shape
+        if self.capacity == 0:
+            self._data = np.empty(shape, dtype=self.dtype)
+            self._mask = np.empty(shape, dtype=bool)
+            return
+        self._data = np.memmap(os.path.join(self.path, DATA_FILE),
+                               dtype=self.dtype, mode=self.mode, shape=shape)
+        self._mask = np.memmap(os.path.join(self.path, MASK_FILE),
+                               dtype=bool, mode=self.mode, shape=shape)
+
+    def _save_meta(self):
+        with open(os.path.join(self.path, META_FILE), 'w') as f:
+            json.dump(self.meta, f)
+
+    def reserve(self, capacity):
+        """ Make room for `capacity` scenes. The files are extended at the end,
+        so the scenes already written are not touched
+
+        :type capacity: int
+        """
+        if capacity <= self.capacity:
+            return
+        pixels = int(np.prod(self.scene_shape))
+        sizes = ((DATA_FILE, pixels * self.dtype.itemsize), (MASK_FILE, pixels))
+        self.flush()
+        self._data = self._mask = None
+        for filename, size in sizes:
+            with open(os.path.join(self.path, filename), 'r+b') as f:
+                f.truncate(capacity * size)
+        self.meta['capacity'] = int(capacity)
+        self._save_meta()
+        self._map()
+
+    def append(self, data, mask=None, **properties):
+        """ Add a scene at the end of the stack
+
+        :param data: the scene `(band, y, x)`
+        :type data: numpy.ndarray
+        :param mask: the mask of the scene. If None, all pixels are valid
+        :type mask: numpy.ndarray
+        :param properties: properties of the scene, like `col_id`, `date`
+            (ISO format) and `cloud_cover`
+        :return: the index of the new scene
+        :rtype: int
+        """
+        if self.mode == 'r':
+            raise IOError('the stack was opened in read only mode')
+        data = np.asarray(data)
+        if data.shape != self.scene_shape:
+            raise ValueError('the shape of the scene must be {}, not {}'.format(
+                self.scene_shape, data.shape))
+
+        index = len(self)
+        if index >= self.capacity:
+            self.reserve(max(1, self.capacity * 2))
+
+        self._data[index] = data
+        self._mask[index] = True if mask is None else mask
+
+        if 'date' in properties:
+            properties['date'] = str(np.datetime64(properties['date'], 'D'))
+        self.scenes.append(properties)
+        self._save_meta()
+        return index
+
+    def window(self, rows, cols, times=None):
+        """ A view (no copy) of a spatial window of the stack
+
+        :param rows: the rows (`slice`)
+        :type rows: slice
+        :param cols: the columns (`slice`)
+        :type cols: slice
+        :param times: the scenes (`slice`). If None, all scenes
+        :type times: slice
+        :return: the data and the mask of the window
+        :rtype: tuple
+        """
+        if times is None:
+            times = slice(0, len(self))
+        return (self.data[times, :, rows, cols],
+                self.mask[times, :, rows, cols])
+
+    def flush(self):
+        """ Write the changes to disk """
+        for array in (self._data, self._mask):
+            if isinstance(array, np.memmap):
+                array.flush()
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+""" Synthetic Landsat-like time series to test and benchmark the local
+backend without network access.
+
+Each scene has the renamed bands of the Landsat collections (blue, green,
+red, nir, swir and swir2) with surface reflectance values, a seasonal NDVI
+trend, spatially correlated clouds and shadows and, for Landsat 7 scenes
+since 2003, the SLC-off stripes. The satellites of each year are taken from
+a priority relation (`priority.SeasonPriority.relation` by default).
+
+Scenes are generated one by one, so big stacks can be written into a
+`stack.SceneStack` without holding them in memory.
+"""
+import numpy as np
+from .stack import SceneStack
+
+BANDS = ['blue', 'green', 'red', 'nir', 'swir', 'swir2']
+
+# Days between two scenes of the same satellite and offset (in days) of the
+# first scene of each satellite, so Landsat 7 and 8 are 8 days apart
+REVISIT = 16
+OFFSETS = {'LE07': 8}
+
+# Cloud and shadow reflectance (relative to the maximum value)
+CLOUD_REFLECTANCE = (0.45, 0.75)
+SHADOW_FACTOR = 0.35
+
+
+def correlated_field(rng, shape, scale):
+    """ Gaussian random field with spatial correlation, using a FFT filter.
+    The result has mean 0 and standard deviation 1
+
+    :param rng: the random generator
+    :type rng: numpy.random.RandomState
+    :param shape: (y, x)
+    :type shape: tuple
+    :param scale: correlation length in pixels
+    :type scale: float
+    :rtype: numpy.ndarray
+    """
+    noise = rng.standard_normal(shape)
+    fy = np.fft.fftfreq(shape[0])[:, None]
+    fx = np.fft.rfftfreq(shape[1])[None, :]
+    gauss = np.exp(-2 * (np.pi * scale) ** 2 * (fy ** 2 + fx ** 2))
+    field = np.fft.irfft2(np.fft.rfft2(noise) * gauss, s=shape)
+    std = field.std()
+    return (field - field.mean()) / (std if std > 0 else 1)
+
+
+def slc_off_gaps(shape, period=35, max_width=6):
+    """ Landsat 7 SLC-off stripes: diagonal gaps that are wider towards the
+    east and west edges of the scene and disappear in the center
+
+    :return: boolean array, True in the gaps
+    :rtype: numpy.ndarray
+    """
+    rows, cols = np.mgrid[0:shape[0], 0:shape[1]]
+    center = (shape[1] - 1) / 2.0
+    width = np.abs(cols - center) / max(center, 1) * max_width
+    position = (cols + rows * 0.1) % period
+    return position < width
+
+
+def sensor(col_id):
+    """ Sensor code (LT05, LE07, LC08, ...) of a collection id """
+    for part in col_id.split('/'):
+        if len(part) == 4 and part[:2] in ('LM', 'LT', 'LE', 'LC'):
+            return part
+    return col_id
+
+
+class SyntheticScenes(object):
+    """ Generator of synthetic scenes
+
+    :param year: the year of the scenes. The satellites are taken from the
+        priority relation for this year
+    :type year: int
+    :param height: number of rows
+    :type height: int
+    :param width: number of columns
+    :type width: int
+    :param start: first date (ISO format). Defaults to January 1st of the year
+    :type start: str
+    :param end: last date (ISO format). Defaults to December 31st of the year
+    :type end: str
+    :param relation: the priority relation (year: list of collection ids)
+    :type relation: dict
+    :param seed: the seed for the random numbers
+    :type seed: int
+    :param max_cloud_cover: maximum cloud cover of a scene (0 to 100)
+    :type max_cloud_cover: float
+    :param cloud_scale: correlation length of the clouds in pixels
+    :type cloud_scale: float
+    :param peak_doy: day of the year with the highest NDVI
+    :type peak_doy: int
+    :param max_value: maximum value of the bands (10000 for surface
+        reflectance)
+    :type max_value: int
+    :param toa: include the TOA collections (by default only the SR
+        collections are used)
+    :type toa: bool
+    """
+    def __init__(self, year, height=256, width=256, start=None, end=None,
+                 relation=None, seed=0, max_cloud_cover=80, cloud_scale=20,
+                 peak_doy=15, max_value=10000, toa=False):
+        if relation is None:
+            from ..priority import SeasonPriority
+            relation = SeasonPriority.relation
+        self.year = year
+        self.height = height
+        self.width = width
+        self.start = np.datetime64(start or '{}-01-01'.format(year), 'D')
+        self.end = np.datetime64(end or '{}-12-31'.format(year), 'D')
+        self.relation = relation
+        self.seed = seed
+        self.max_cloud_cover = max_cloud_cover
+        self.cloud_scale = cloud_scale
+        self.peak_doy = peak_doy
+        self.max_value = max_value
+        self.toa = toa
+        self._scenes = None
+
+        # landscape (the same for every scene)
+        rng = np.random.RandomState(seed)
+        shape = (height, width)
+        self.ndvi_base = 0.45 + 0.15 * correlated_field(rng, shape, 15)
+        self.ndvi_amplitude = 0.2 + 0.05 * correlated_field(rng, shape, 25)
+        self.brightness = 0.25 + 0.04 * correlated_field(rng, shape, 10)
+
+    @property
+    def satellites(self):
+        """ Collection ids used for the year """
+        satellites = self.relation[self.year]
+        if not self.toa:
+            satellites = [sat for sat in satellites if 'TOA' not in sat] or \
+                         satellites
+        return satellites
+
+    @property
+    def scenes(self):
+        """ Collection id and date of every scene, sorted by date. The list
+        is computed once for the current satellites and dates
+
+        :rtype: list
+        """
+        key = (tuple(self.satellites), self.start, self.end)
+        if self._scenes is None or self._scenes[0] != key:
+            scenes = []
+            for col_id in key[0]:
+                offset = OFFSETS.get(sensor(col_id), 0)
+                dates = np.arange(self.start + offset, self.end + 1, REVISIT)
+                scenes.extend([(date, col_id) for date in dates])
+            self._scenes = (key, [(col_id, date)
+                                  for date, col_id in sorted(scenes)])
+        return self._scenes[1]
+
+    @property
+    def shape(self):
+        """ Shape of the whole stack (time, band, y, x) """
+        return (len(self.scenes), len(BANDS), self.height, self.width)
+
+    @property
+    def nbytes(self):
+        """ Size in bytes of the data and the mask of the whole stack """
+        return int(np.prod(self.shape)) * (2 + 1)
+
+    def ndvi(self, date):
+        """ NDVI of the landscape for a date
+
+        :type date: numpy.datetime64
+        :rtype: numpy.ndarray
+        """
+        doy = (date - date.astype('datetime64[Y]')).astype(int) + 1
+        season = np.cos(2 * np.pi * (doy - self.peak_doy) / 365.25)
+        return np.clip(self.ndvi_base + self.ndvi_amplitude * season,
+                       -0.1, 0.95)
+
+    def reflectance(self, ndvi, rng):
+        """ Reflectance (0 to 1) of the six bands given the NDVI """
+        nir = self.brightness + 0.2 * ndvi
+        red = nir * (1 - ndvi) / (1 + ndvi)
+        blue = 0.6 * red + 0.01
+        green = 0.5 * (blue + red) + 0.03 * ndvi
+        swir = 0.8 * nir * (1 - 0.4 * ndvi)
+        swir2 = 0.6 * swir
+        bands = np.stack([blue, green, red, nir, swir, swir2])
+        noise = rng.normal(0, 0.005, bands.shape)
+        return np.clip(bands + noise, 0.001, 1)
+
+    def scene(self, index):
+        """ Generate one scene
+
+        :param index: the index of the scene (see `scenes`)
+        :type index: int
+        :return: the data (band, y, x), the mask and the properties
+        :rtype: tuple
+        """
+        col_id, date = self.scenes[index]
+        rng = np.random.RandomState([self.seed, index])
+        shape = (self.height, self.width)
+
+        values = self.reflectance(self.ndvi(date), rng)
+
+        # clouds: threshold a correlated field at the cloud cover quantile
+        cover = rng.uniform(0, self.max_cloud_cover) / 100.0
+        field = correlated_field(rng, shape, self.cloud_scale)
+        clouds = field > np.quantile(field, 1 - cover) if cover > 0 \
+            else np.zeros(shape, dtype=bool)
+        thickness = rng.uniform(*CLOUD_REFLECTANCE)
+        values[:, clouds] = thickness + 0.05 * values[:, clouds]
+
+        # shadows: the clouds moved in a random direction
+        shift = rng.randint(-self.cloud_scale, self.cloud_scale + 1, 2)
+        shadows = np.roll(clouds, tuple(shift), axis=(0, 1)) & ~clouds
+        values[:, shadows] *= SHADOW_FACTOR
+
+        data = np.round(values * self.max_value).astype(np.int16)
+        valid = ~(clouds | shadows)
+
+        if sensor(col_id) == 'LE07' and self.year >= 2003:
+            gaps = slc_off_gaps(shape)
+            data[:, gaps] = 0
+            valid &= ~gaps
+
+        mask = np.broadcast_to(valid, data.shape).copy()
+        properties = {'col_id': col_id, 'date': str(date),
+                      'cloud_cover': round(float(clouds.mean()) * 100, 2),
+                      'year': self.year}
+        return data, mask, properties
+
+    def __iter__(self):
+        for index in range(len(self.scenes)):
+            yield self.scene(index)
+
+    def arrays(self):
+        """ The whole stack in memory (for small sizes)
+
+        :return: data, mask and a list of properties
+        :rtype: tuple
+        """
+        data = np.empty(self.shape, dtype=np.int16)
+        mask = np.empty(self.shape, dtype=bool)
+        properties = []
+        for i, (scene, valid, props) in enumerate(self):
+            data[i] = scene
+            mask[i] = valid
+            properties.append(props)
+        return data, mask, properties
+
+    def to_stack(self, path):
+        """ Write the scenes into a new `SceneStack`, one by one
+
+        :rtype: stack.SceneStack
+        """
+        stack = SceneStack.create(path, BANDS, self.height, self.width,
+                                  capacity=len(self.scenes))
+        for data, mask, properties in self:
+            stack.append(data, mask, **properties)
+        stack.flush()
+        return stack
+
+
+def ee_properties(properties):
+    """ Properties of a scene with the names used in Earth Engine, to be used
+    by an offline stand-in of the `ee` collections
+
+    :param properties: the properties of a synthetic scene
+    :type properties: dict
+    :rtype: dict
+    """
+    date = np.datetime64(properties['date'], 'ms')
+    return {'system:time_start': int(date.astype(np.int64)),
+            'CLOUD_COVER': properties['cloud_cover'],
+            'SPACECRAFT_ID': sensor(properties['col_id']),
+            'COLLECTION': properties['col_id']}
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 import ee
+import json
+from bisect import bisect_right
 from datetime import date
 from geetools import collection
 from geetools.collection.group import CollectionGroup
+from .utils import lazy_class_attribute
 
 # IDS
 ID1 = 'LANDSAT/LM01/C01/T1'
@@ -20,6 +23,148 @@ S2 = 'COPERNICUS/S2'
 S2SR = 'COPERNICUS/S2_SR'
 
 
+# Collections created by id (collection.fromId), shared by all tables
+_COLLECTIONS = {}
+
+
+def get_collection(collection_id):
+    """ Get the geetools collection for the given id. Each collection is
+    created only once
+
+    :rtype: geetools.collection.Collection
+    """
+    if collection_id not in _COLLECTIONS:
+        _COLLECTIONS[collection_id] = collection.fromId(collection_id)
+    return _COLLECTIONS[collection_id]
+
+
+class PriorityTable(object):
+    """ Satellite priorities by periods of years.
+
+    The period `i` goes from `breaks[i]` (included) to `breaks[i+1]`
+    (excluded) and uses the satellites in `satlist[i]`, sorted by priority.
+
+    :param breaks: sorted list of years when there is a break
+    :type breaks: list
+    :param satlist: nested list of collection ids for each period
+    :type satlist: list
+    :param name: a name for the table
+    :type name: str
+    """
+    def __init__(self, breaks, satlist, name=None):
+        breaks = [int(b) for b in breaks]
+        if breaks != sorted(breaks):
+            raise ValueError('breaks must be sorted')
+        if len(satlist) != len(breaks) - 1:
+            msg = 'there must be a list of satellites for each period ({} ' \
+                  'periods, found {} lists)'
+            raise ValueError(msg.format(len(breaks) - 1, len(satlist)))
+        self.breaks = breaks
+        self.satlist = [list(sats) for sats in satlist]
+        self.name = name
+
+    @classmethod
+    def from_config(cls, config):
+        """ Create a table from a compact configuration. Example:
+
+        .. code:: python
+
+            {"name": "Collection 2",
+             "periods": [[2013, ["LANDSAT/LC08/C02/T1_L2",
+                                 "LANDSAT/LE07/C02/T1_L2"]],
+                         [2022, ["LANDSAT/LC09/C02/T1_L2",
+                                 "LANDSAT/LC08/C02/T1_L2"]]],
+             "end": 2030}
+
+        Each period starts in the given year and ends where the next one
+        starts. The last one ends in `end` (excluded), which defaults to next
+        year.
+
+        :param config: the configuration or the path to a JSON file that
+            holds it
+        :type config: dict or str
+        :rtype: PriorityTable
+        """
+        if not isinstance(config, dict):
+            with open(config) as f:
+                config = json.load(f)
+        periods = sorted(config['periods'], key=lambda period: period[0])
+        end = config.get('end', date.today().year + 1)
+        breaks = [period[0] for period in periods] + [end]
+        satlist = [period[1] for period in periods]
+        return cls(breaks, satlist, config.get('name'))
+
+    def period(self, year):
+        """ Index of the period for the given year
+
+        :rtype: int
+        """
+        index = bisect_right(self.breaks, year) - 1
+        if index < 0 or index >= len(self.satlist):
+            raise KeyError('year {} is out of the priority table ({} to {})'
+                           .format(year, self.breaks[0], self.breaks[-1] - 1))
+        return index
+
+    def clamp(self, year):
+        """ Move a year out of the table to the nearest year inside it
+
+        :param year: the year
+        :type year: int or ee.Number
+        :rtype: int or ee.Number
+        """
+        first, last = self.breaks[0], self.breaks[-1] - 1
+        if isinstance(year, int):
+            return min(max(year, first), last)
+        return ee.Number(year).max(first).min(last).toInt()
+
+    def satellites(self, year):
+        """ Collection ids sorted by priority for the given year
+
+        :rtype: list
+        """
+        return self.satlist[self.period(year)]
+
+    def collections(self, year):
+        """ Collections sorted by priority for the given year
+
+        :rtype: list
+        """
+        return [get_collection(colid) for colid in self.satellites(year)]
+
+    def colgroup(self, year):
+        """
+        :rtype: CollectionGroup
+        """
+        return CollectionGroup(*self.collections(year))
+
+    def all_collections(self, years):
+        """ Collections used in any of the given years (without repetition)
+
+        :rtype: list
+        """
+        ids = []
+        periods = sorted(set(self.period(year) for year in years))
+        for index in periods:
+            for colid in self.satlist[index]:
+                if colid not in ids:
+                    ids.append(colid)
+        return [get_collection(colid) for colid in ids]
+
+    @property
+    def relation(self):
+        """ Dict of year and list of collection ids """
+        return dict([(year, sats)
+                     for start, end, sats in zip(self.breaks, self.breaks[1:],
+                                                 self.satlist)
+                     for year in range(start, end)])
+
+    @property
+    def ee_relation(self):
+        """ The relation as an ee.Dictionary (with string keys) """
+        return ee.Dictionary(dict([(str(year), sats) for year, sats
+                                   in self.relation.items()]))
+
+
 class SeasonPriority(object):
     """ Satellite priorities for seasons.
 
@@ -52,12 +197,15 @@ class SeasonPriority(object):
     relation = dict(
         [(p, sat) for per, sat in zip(periods, satlist) for p in per])
 
-    ee_relation = ee.Dictionary(relation)
+    @lazy_class_attribute
+    def ee_relation(cls):
+        return ee.Dictionary(cls.relation)
 
     l7_slc_off = range(2003, date.today().year+1)
 
-    def __init__(self, year):
+    def __init__(self, year, table=None):
         self.year = year
+        self.table = table or DEFAULT_TABLE
 
     @property
     def satellites(self):
@@ -65,7 +213,7 @@ class SeasonPriority(object):
         :return: list of satellite's ids
         :rtype: list
         '''
-        return self.relation[self.year]
+        return self.table.satellites(self.year)
 
     @property
     def collections(self):
@@ -73,12 +221,15 @@ class SeasonPriority(object):
         :return: list of satcol.Collection
         :rtype: list
         '''
-        sat = self.satellites
-        return [collection.fromId(id) for id in sat]
+        return self.table.collections(self.year)
 
     @property
     def colgroup(self):
         '''
         :rtype: CollectionGroup
         '''
-        return CollectionGroup(*self.collections)
+        return self.table.colgroup(self.year)
+
+
+DEFAULT_TABLE = PriorityTable(SeasonPriority.breaks, SeasonPriority.satlist,
+                              'Landsat Collection 1')
@@ -43,26 +43,39 @@ from uuid import uuid4
 __all__ = []
 factory = {}
 
-KERNELS_DISTANCE = {
-    "euclidean": ee.Kernel.euclidean,
-    "manhattan": ee.Kernel.manhattan,
-    "chebyshev": ee.Kernel.chebyshev
-}
-
-KERNELS_BOOL = {
-    "circle": ee.Kernel.circle,
-    "cross": ee.Kernel.cross,
-    "diamond": ee.Kernel.diamond,
-    "octagon": ee.Kernel.octagon,
-    "plus": ee.Kernel.plus,
-    "square": ee.Kernel.square
-}
+# Kernels by name. They are resolved on use, because ee.Kernel is populated
+# by ee.Initialize()
+KERNELS_DISTANCE = ("euclidean", "manhattan", "chebyshev")
+
+KERNELS_BOOL = ("circle", "cross", "diamond", "octagon", "plus", "square")
+
+# Cloud properties of the collections (Landsat and Sentinel-2). The Medoid
+# subsample takes the lowest values of these by default
+CLOUD_PROPERTIES = ("CLOUD_COVER", "CLOUD_COVER_LAND",
+                    "CLOUDY_PIXEL_PERCENTAGE", "CLOUD_COVERAGE_ASSESSMENT")
+
+
+def get_kernel(name, kernels=KERNELS_DISTANCE):
+    """ Get the ee.Kernel function for the given kernel name
+
+    :param name: the name of the kernel
+    :type name: str
+    :param kernels: the valid kernel names
+    :type kernels: tuple
+    """
+    if name not in kernels:
+        raise ValueError('kernel must be one of {}, found {}'.format(
+            kernels, name))
+    return getattr(ee.Kernel, name)
 
 
 class Score(object):
     ''' Abstract Base class for scores '''
     __metaclass__ = ABCMeta
 
+    # Relative cost of computing the score, used to order the scores
+    cost = 1
+
     def __init__(self, name="score", range_in=None, range_out=(0, 1), sleep=0,
                  **kwargs):
         """ Abstract Base Class for scores
@@ -100,6 +113,19 @@ class Score(object):
     def min(self):
         return self.range_out[0]
 
+    @property
+    def required_bands(self):
+        """ Bands (renamed) that the score reads from the images. The ones
+        that are not present in the collections (like indices) are computed
+        once before scoring """
+        return []
+
+    @property
+    def requires_all_bands(self):
+        """ True if the score reads all the bands of the images, so they
+        can't be dropped before scoring """
+        return False
+
     def adjust(self):
         if self.range_out != (0, 1):
             return lambda img: tools.image.parametrize(img, (0, 1),
@@ -147,6 +173,8 @@ class CloudScene(Score):
     :param name: name of the resulting band
     :type name: str
     """
+    cost = 1
+
     def __init__(self, name="score-cld-scene", **kwargs):
         super(CloudScene, self).__init__(**kwargs)
         self.range_in = (0, 100)
@@ -200,6 +228,8 @@ class CloudDist(Score):
     :param dmin: Minimum distance.
     :type dmin: int
     """
+    cost = 6
+
     def __init__(self, dmin=0, dmax=None, name="score-cld-dist", **kwargs):
         super(CloudDist, self).__init__(**kwargs)
         if not dmax or dmax > 255:
@@ -219,7 +249,7 @@ class CloudDist(Score):
         return ee.Image.constant(self.dmin)
 
     def kernelEE(self, radius):
-        fkernel = KERNELS_DISTANCE[self.kernel]
+        fkernel = get_kernel(self.kernel)
         return fkernel(radius=radius, units=self.units)
 
     @staticmethod
@@ -326,7 +356,7 @@ class CloudDist(Score):
 
         params = dict(
             bandmask = first_band.name,
-            kernel = KERNELS_DISTANCE[self.kernel],
+            kernel = get_kernel(self.kernel),
             dmin = self.dmin,
             dmax = dmax,
             bandname = self.name,
@@ -355,6 +385,8 @@ class Doy(Score):
     :param name: name for the resulting band
     :type name: str
     """
+    cost = 1
+
     def __init__(self, best_doy, season, name="score-best_doy",
                  function='linear', stretch=1, **kwargs):
         super(Doy, self).__init__(**kwargs)
@@ -435,11 +467,10 @@ class Doy(Score):
         """
         range_out = self.range_out
         year = kwargs.get('year')
-        date_range = self.season.add_year(year)
-        doy = ee.Date(season_module.SeasonDate(self.best_doy).add_year(year))
-        doy2 = ee.Date(season_module.SeasonDate(self.best_doy).add_year(year-1))
-        condition = date_range.contains(doy)
-        best = ee.Number(ee.Algorithms.If(condition, doy, doy2))
+
+        # best date in the season (computed on the client)
+        doy = self.season.date(self.best_doy, year)
+        best = ee.Date(season_module.to_millis(doy))
 
         return self.apply(collection, best_doy=best, name=self.name,
                           output_min=range_out[0], output_max=range_out[1],
@@ -456,6 +487,8 @@ class AtmosOpacity(Score):
     :param formula: Distribution formula
     :type formula: Expression
     """
+    cost = 2
+
     def __init__(self, range_in=(100, 300), formula=Expression.Exponential,
                  name="score-atm-op", **kwargs):
         super(AtmosOpacity, self).__init__(**kwargs)
@@ -468,6 +501,10 @@ class AtmosOpacity(Score):
         expresion = self.formula(rango=self.range_in)
         return expresion
 
+    @property
+    def required_bands(self):
+        return ['atmos_opacity']
+
     def map(self, collection, **kwargs):
         """ Map the score over a collection
 
@@ -500,6 +537,8 @@ class MaskPercent(Score):
     :param include_zero: include pixels with zero value as mask
     :type include_zero: bool
     """
+    cost = 3
+
     @staticmethod
     def compute(image, **kwargs):
         """ Core function for Mask Percent Score. Has no dependencies in geebap
@@ -606,6 +645,8 @@ class MaskPercent(Score):
 
 class MaskPercentKernel(Score):
     """ Mask percent score using a kernel """
+    cost = 5
+
     def __init__(self, kernel='square', distance=255, units='pixels',
                  name="score-maskper-kernel", **kwargs):
         """ Initialize score with kernel, distance and units """
@@ -621,7 +662,7 @@ class MaskPercentKernel(Score):
 
     @staticmethod
     def _make_kernel(name, radius, units):
-        fkernel = KERNELS_BOOL[name]
+        fkernel = get_kernel(name, KERNELS_BOOL)
         return fkernel(radius=radius, units=units)
 
     @staticmethod
@@ -683,11 +724,18 @@ class Satellite(Score):
     :param rate: 'amount' of the score that will be taken each step of the
         available satellite list
     :type rate: float
+    :param relation: the satellite priorities. Defaults to the priority
+        table of the Bap
+    :type relation: priority.PriorityTable
     """
-    def __init__(self, ratio=0.05, name="score-sat", **kwargs):
+    cost = 1
+
+    def __init__(self, ratio=0.05, name="score-sat", relation=None,
+                 **kwargs):
         super(Satellite, self).__init__(**kwargs)
         self.name = name
         self.ratio = ratio
+        self.relation = relation
 
     @staticmethod
     def compute(image, **kwargs):
@@ -695,10 +743,17 @@ class Satellite(Score):
         year = kwargs.get('year')
         rate = kwargs.get('ratio', 0.05)
         name = kwargs.get('name', 'sat-score')
+        table = kwargs.get('relation') or priority.DEFAULT_TABLE
+
+        # Years out of the table take the nearest period
+        year = table.clamp(year)
 
-        year_str = ee.Number(year).format()
         # List of satellite priority according to year
-        prior_list = ee.List(priority.SeasonPriority.ee_relation.get(year_str))
+        if isinstance(year, int):
+            prior_list = ee.List(table.satellites(year))
+        else:
+            year_str = ee.Number(year).format()
+            prior_list = ee.List(table.ee_relation.get(year_str))
 
         # Get index of current satellite into the list
         index = prior_list.indexOf(colid)
@@ -727,11 +782,13 @@ class Satellite(Score):
         """
         col = kwargs.get('col')
         year = kwargs.get('year')
+        relation = self.relation or kwargs.get('priority_table')
 
         def wrap(img):
-            y = ee.Number(year) if year else img.date().get('year')
+            y = year if year else img.date().get('year')
             score = self.compute(img, collection_id=col.id, year=y,
-                                 rate=self.ratio, name=self.name)
+                                 ratio=self.ratio, name=self.name,
+                                 relation=relation)
             return img.addBands(score).set(self.name, score.get(self.name))
 
         return collection.map(wrap)
@@ -763,6 +820,8 @@ class Outliers(Score):
 
     :type dist: int
     """
+    cost = 8
+
     def __init__(self, bands, process="median", dist=0.7, name="score-outlier",
                  **kwargs):
         super(Outliers, self).__init__(**kwargs)
@@ -779,6 +838,10 @@ class Outliers(Score):
 
         # TODO: create `min` and `max` properties depending on the chosen process
 
+    @property
+    def required_bands(self):
+        return list(self.bands)
+
     @property
     def bands_ee(self):
         return ee.List(self.bands)
@@ -904,6 +967,8 @@ class Index(Score):
     :param index: name of the vegetation index. Can be 'ndvi', 'evi' or 'nbr'
     :type index: str
     """
+    cost = 2
+
     def __init__(self, index="ndvi", target=0.8, name="score-index",
                  function='linear', stretch=1, **kwargs):
         super(Index, self).__init__(**kwargs)
@@ -914,6 +979,10 @@ class Index(Score):
         self.target = target
         self.stretch = stretch
 
+    @property
+    def required_bands(self):
+        return [self.index]
+
     def adjust(self):
         return lambda img: img
 
@@ -998,6 +1067,7 @@ class MultiYear(Score):
         be 0.95 for 2001, 1 for 2002 and 0.95 for 2003
     :type ration: float
     """
+    cost = 1
 
     def __init__(self, season, ratio=0.05, main_year=None, function='linear',
                  stretch=1, name="score-multi", **kwargs):
@@ -1113,6 +1183,17 @@ class MultiYear(Score):
 @register(factory)
 @register_all(__all__)
 class Threshold(Score):
+    """ Threshold score. Pixels with values between the given thresholds get
+    the top score, and the final score is the proportion of bands that fall
+    inside their thresholds.
+
+    :param bands: a dictionary of threshold values for each band (renamed
+        bands), like `{'blue': {'min': 50, 'max': 1500}}`. Values must be in
+        the range of the target collection. Required to map the score
+    :type bands: dict
+    """
+    cost = 2
+
     def __init__(self, bands=None, name='score-thres',
                  **kwargs):
         """ Threshold score """
@@ -1121,6 +1202,10 @@ class Threshold(Score):
         self.bands = bands
         self.name = name
 
+    @property
+    def required_bands(self):
+        return list((self.bands or {}).keys())
+
     @staticmethod
     def compute(img, **kwargs):
         """ Compute the threshold score
@@ -1140,33 +1225,34 @@ class Threshold(Score):
         thresholds = kwargs.get('thresholds')
         name = kwargs.get('name', 'score-threshold')
 
-        # Cast
-        thresholds = ee.Dictionary(thresholds)
-
-        bands_ee = ee.List(thresholds.keys())
-        relation_ee = ee.Dictionary(thresholds)
-        length = ee.Number(bands_ee.size())
-
-        def compute_score(band, first):
-            score_complete = ee.Image(first)
-            img_band = img.select([band])
-            min = ee.Dictionary(relation_ee.get(band)).get('min')  # could be None
-            max = ee.Dictionary(relation_ee.get(band)).get('max')  # could be None
+        # Build the constant images in the client, so all bands are compared
+        # in one operation
+        bands = list(thresholds.keys())
+        selected = img.select(bands)
 
-            score_min = img_band.gte(ee.Image.constant(min))
-            score_max = img_band.lte(ee.Image.constant(max))
+        def condition(limit, relation):
+            values = [thresholds[band].get(limit) for band in bands]
+            constant = ee.Image.constant(
+                [val if val is not None else 0 for val in values]
+            ).rename(bands)
+            result = relation(selected, constant)
 
-            final_score = score_min.And(score_max)  # Image with one band
+            # pass all pixels for bands without limit
+            if None in values:
+                no_limit = ee.Image.constant(
+                    [1 if val is None else 0 for val in values]
+                ).rename(bands)
+                result = result.Or(no_limit)
 
-            return tools.image.replace(score_complete, band, final_score)
+            return result
 
-        scores = ee.Image(bands_ee.iterate(compute_score,
-                                           tools.image.empty(0, bands_ee)))
+        score_min = condition('min', lambda i, c: i.gte(c))
+        score_max = condition('max', lambda i, c: i.lte(c))
 
-        final_score = tools.image.sumBands(scores, name=name) \
-            .divide(ee.Image.constant(length))
+        # proportion of bands inside the thresholds
+        final_score = score_min.And(score_max).reduce(ee.Reducer.mean())
 
-        return final_score.select(name)
+        return final_score.rename(name).toFloat()
 
     def map(self, collection, **kwargs):
         """ map the score over a collection
@@ -1174,22 +1260,176 @@ class Threshold(Score):
         :param col: the collection
         :type col: satcol.Collection
         """
-        print('score not available temporarely')
-        return collection
+        if not self.bands:
+            raise ValueError('the Threshold score needs the thresholds of '
+                             'the bands (param bands)')
+        thresholds = self.bands
+
+        def wrap(img):
+            score = self.compute(img, thresholds=thresholds, name=self.name)
+            return img.addBands(score)
+
+        return collection.map(wrap)
 
 
 @register(factory)
 @register_all(__all__)
 class Medoid(Score):
+    """ Score for the distance to the medoid of the collection
+
+    :param bands: the bands to use for computing the distance. If None, all
+        bands will be used
+    :type bands: list
+    :param discard_zeros: zero values will not count in the distance
+    :type discard_zeros: bool
+    :param sample_size: if given, compute an approximate score using the
+        distance to the median of a subsample of `sample_size` images instead
+        of the distance to every image of the collection. Useful for deep
+        stacks
+    :type sample_size: int
+    :param sample_by: the property used to choose the images of the subsample.
+        If None, the images are taken with a fixed stride over time
+    :type sample_by: str
+    :param sample_ascending: take the images with the lowest values of
+        `sample_by` instead of the highest. Defaults to True for the cloud
+        properties (`CLOUD_PROPERTIES`) and False for the rest
+    :type sample_ascending: bool
+    """
+    cost = 10
+
     def __init__(self, bands=None, discard_zeros=True, name='score-medoid',
+                 sample_size=None, sample_by=None, sample_ascending=None,
                  **kwargs):
         super(Medoid, self).__init__(**kwargs)
         self.name = name
         self.bands = bands
         self.discard_zeros = discard_zeros
+        self.sample_size = sample_size
+        self.sample_by = sample_by
+        if sample_ascending is None:
+            sample_ascending = self.ascending_default(sample_by)
+        self.sample_ascending = sample_ascending
+
+    @staticmethod
+    def ascending_default(sort_by):
+        """ Default order of the subsample: the lowest values for the cloud
+        properties (the less cloudy images) and the highest for the rest """
+        return bool(sort_by) and sort_by.upper() in CLOUD_PROPERTIES
+
+    @property
+    def required_bands(self):
+        return list(self.bands or [])
+
+    @property
+    def requires_all_bands(self):
+        return not self.bands
+
+    @staticmethod
+    def subsample(collection, size, sort_by=None, ascending=None):
+        """ Get a deterministic subsample of the collection
+
+        :param size: number of images of the subsample
+        :type size: int
+        :param sort_by: if given, take the images with the highest (or the
+            lowest, see `ascending`) value of this property. If not, take the
+            images with a fixed stride over time
+        :type sort_by: str
+        :param ascending: take the lowest values of `sort_by`. Defaults to
+            True for cover properties
+        :type ascending: bool
+        :rtype: ee.ImageCollection
+        """
+        if sort_by:
+            if ascending is None:
+                ascending = Medoid.ascending_default(sort_by)
+            return collection.sort(sort_by, ascending).limit(size)
+
+        collection = collection.sort('system:time_start')
+        total = collection.size()
+        imlist = collection.toList(total)
+        stride = total.divide(size).floor().max(1)
+        indices = ee.List.sequence(0, total.subtract(1), stride).slice(0, size)
+        return ee.ImageCollection.fromImages(
+            indices.map(lambda i: imlist.get(i)))
+
+    @staticmethod
+    def apply_approximate(collection, **kwargs):
+        """ Approximate medoid score. The median of a subsample of the
+        collection is used as an estimate of the medoid, and each image is
+        scored by the euclidean distance of its own values to it.
+
+        :param bands: the bands to use. If None, all bands will be used
+        :type bands: list
+        :param sample_size: number of images of the subsample
+        :type sample_size: int
+        :param sample_by: property to choose the images of the subsample
+        :type sample_by: str
+        :param sample_ascending: take the lowest values of `sample_by`
+        :type sample_ascending: bool
+        :param discard_zeros: zero values will not count in the distance
+        :type discard_zeros: bool
+        :param bandname: the name of the resulting band
+        :type bandname: str
+        :param normalize: normalize the result to be between 0 and 1
+        :type normalize: bool
+        :rtype: ee.ImageCollection
+        """
+        bands = kwargs.get('bands')
+        sample_size = kwargs.get('sample_size', 50)
+        sample_by = kwargs.get('sample_by')
+        sample_ascending = kwargs.get('sample_ascending')
+        discard_zeros = kwargs.get('discard_zeros', False)
+        bandname = kwargs.get('bandname', 'sumdist')
+        normalize = kwargs.get('normalize', True)
+
+        if not bands:
+            bands = ee.Image(collection.first()).bandNames()
+
+        sample = Medoid.subsample(collection, sample_size, sample_by,
+                                  sample_ascending)
+        sample = sample.select(bands)
+        if discard_zeros:
+            sample = sample.map(lambda img: img.selfMask())
+        median = sample.median()
+
+        def distance(img):
+            values = img.select(bands)
+            if discard_zeros:
+                # zero values take the median value, so they do not count
+                values = values.where(values.eq(0), median)
+            dist = values.subtract(median).pow(2).reduce('sum').sqrt()
+            if not normalize:
+                # multiply by -1 to get the lowest value in the qualityMosaic
+                dist = dist.multiply(-1)
+            return img.addBands(dist.rename(bandname))
+
+        medcol = collection.map(distance)
+
+        # Normalize result to be between 0 and 1
+        if normalize:
+            min_dist = ee.Image(medcol.select(bandname).min())
+            max_dist = ee.Image(medcol.select(bandname).max())
+
+            def to_normalize(img):
+                newband = ee.Image().expression(
+                    '1-((val-min)/(max-min))',
+                    {'val': img.select(bandname),
+                     'min': min_dist,
+                     'max': max_dist}
+                ).rename(bandname)
+                return img.addBands(newband, overwrite=True)
+
+            medcol = medcol.map(to_normalize)
+
+        return medcol
 
     @staticmethod
     def apply(collection, **kwargs):
+        if kwargs.get('sample_size'):
+            return Medoid.apply_approximate(collection, **kwargs)
+        kwargs.pop('sample_size', None)
+        kwargs.pop('sample_by', None)
+        kwargs.pop('sample_ascending', None)
         return composite.medoidScore(collection, **kwargs)
 
     def map(self, collection, **kwargs):
@@ -1197,12 +1437,17 @@ class Medoid(Score):
         return self.apply(collection, bands=self.bands,
                           discard_zeros=self.discard_zeros,
                           bandname=self.name,
-                          normalize=self.normalize)
+                          normalize=self.normalize,
+                          sample_size=self.sample_size,
+                          sample_by=self.sample_by,
+                          sample_ascending=self.sample_ascending)
 
 
 @register(factory)
 @register_all(__all__)
 class Brightness(Score):
+    cost = 2
+
     def __init__(self, target=1, bands=None, name='score-brightness',
                  function='linear', **kwargs):
         """ Brightness score
@@ -1219,6 +1464,10 @@ class Brightness(Score):
         self.function = function
         self.target = target
 
+    @property
+    def required_bands(self):
+        return list(self.bands)
+
     def adjust(self):
         return lambda img: img
 
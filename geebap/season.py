@@ -1,15 +1,24 @@
 # -*- coding: utf-8 -*-
 import ee
+import datetime
+import numpy as np
 from collections import OrderedDict
 
+EPOCH = datetime.date(1970, 1, 1)
+
+# Parsed season dates: 'MM-DD' -> (month, day)
+_PARSED = {}
+
 
 def is_leap(year):
+    """ Gregorian leap year: divisible by 4, except centuries that are not
+    divisible by 400 """
     if isinstance(year, (int, float)):
-        mod = year%4
-        return True if mod == 0 else False
+        year = int(year)
+        return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
     elif isinstance(year, (ee.Number,)):
-        mod = year.mod(4)
-        return mod.Not()
+        return year.mod(4).eq(0).And(
+            year.mod(100).neq(0).Or(year.mod(400).eq(0)))
 
 
 def _rel_month_day(leap_year):
@@ -25,6 +34,29 @@ def _rel_month_day(leap_year):
     return month_day
 
 
+# Days before each month in a leap year
+_DAYS_BEFORE = dict(zip(
+    range(1, 13),
+    np.cumsum([0] + list(_rel_month_day(True).values())[:-1]).tolist()))
+
+
+def _parse(date):
+    """ Month and day of a season date (cached) """
+    if date not in _PARSED:
+        month, day = date.split('-')
+        _PARSED[date] = (int(month), int(day))
+    return _PARSED[date]
+
+
+def to_millis(date):
+    """ Milliseconds since the epoch of a date (as `ee.Date` uses)
+
+    :type date: datetime.date
+    :rtype: int
+    """
+    return (date - EPOCH).days * 86400000
+
+
 class SeasonDate(object):
     """ A simple class to hold dates as MM-DD """
     def __init__(self, date):
@@ -35,32 +67,38 @@ class SeasonDate(object):
 
     @property
     def month(self):
-        return int(self.date.split('-')[0])
+        return _parse(self.date)[0]
 
     @property
     def day(self):
-        return int(self.date.split('-')[1])
+        return _parse(self.date)[1]
 
     @property
     def day_of_year(self):
-        """ Day of the year """
-        month = self.month
-        day = self.day
-
-        if month == 1:
-            return day
-        else:
-            ini = 31
-
-        for rel_month, days in _rel_month_day(True).items():
-            if rel_month == 1: continue
-
-            if rel_month != month:
-                ini += days
-            else:
-                break
-
-        return ini + day
+        """ Day of the year (of a leap year) """
+        month, day = _parse(self.date)
+        return _DAYS_BEFORE[month] + day
+
+    def day_in_year(self, year):
+        """ The day for the given year. February 29th is February 28th in non
+        leap years
+
+        :type year: int
+        :rtype: int
+        """
+        month, day = _parse(self.date)
+        if month == 2 and day == 29 and not is_leap(year):
+            return 28
+        return day
+
+    def to_date(self, year):
+        """ The date for the given year (February 29th is February 28th in
+        non leap years)
+
+        :type year: int
+        :rtype: datetime.date
+        """
+        return datetime.date(int(year), self.month, self.day_in_year(year))
 
     def add_year(self, year):
         """ Just add the year """
@@ -148,9 +186,97 @@ class Season(object):
 
     @property
     def range_in_days(self):
-        return abs(self.start.difference(self.end, self.over_end))
+        """ Number of days between the start and the end of the season (in a
+        non leap year) """
+        start, end = self.dates(2001)
+        return (end - start).days
+
+    def dates(self, year):
+        """ Start and end dates of the season for the given year. If the
+        season goes over the end of the year, it starts the year before
+
+        :type year: int
+        :rtype: tuple
+        """
+        year = int(year)
+        start_year = year - 1 if self.over_end else year
+        return self.start.to_date(start_year), self.end.to_date(year)
+
+    def date(self, season_date, year):
+        """ The date of `season_date` inside the season of the given year. If
+        the season goes over the end of the year, dates after the end fall in
+        the year before
+
+        :param season_date: the date (MM-DD)
+        :type season_date: str or SeasonDate
+        :type year: int
+        :rtype: datetime.date
+        """
+        if not isinstance(season_date, SeasonDate):
+            season_date = SeasonDate(season_date)
+        start, end = self.dates(year)
+        date = season_date.to_date(year)
+        if not start <= date < end:
+            date = season_date.to_date(int(year) - 1)
+        return date
+
+    def date_range_table(self, years):
+        """ Start and end of the season for many years at once
+
+        :param years: the years
+        :type years: list
+        :return: a dict with the years ('year') and the start and end dates
+            ('start' and 'end') as numpy.datetime64 arrays
+        :rtype: dict
+        """
+        years = np.asarray(years, dtype=np.int64)
+        start_years = years - 1 if self.over_end else years
+
+        def dates(years, season_date):
+            month = (years - 1970).astype('datetime64[Y]').astype(
+                'datetime64[M]') + (season_date.month - 1)
+            month_length = ((month + 1).astype('datetime64[D]') -
+                            month.astype('datetime64[D]')).astype(np.int64)
+            day = np.minimum(season_date.day, month_length)
+            return month.astype('datetime64[D]') + (day - 1)
+
+        return {'year': years,
+                'start': dates(start_years, self.start),
+                'end': dates(years, self.end)}
+
+    def date_range_millis(self, year):
+        """ Start and end of the season for the given year in milliseconds
+        since the epoch
+
+        :type year: int
+        :rtype: tuple
+        """
+        start, end = self.dates(year)
+        return to_millis(start), to_millis(end)
+
+    def ee_filter(self, years):
+        """ A filter that keeps the images inside the season of any of the
+        given years (one `ee.Filter.Or` for all of them)
+
+        :type years: list
+        :rtype: ee.Filter
+        """
+        ranges = [self.date_range_millis(year) for year in years]
+        return ee.Filter.Or(*[ee.Filter.date(start, end)
+                              for start, end in ranges])
 
     def add_year(self, year):
+        """ Date range of the season for the given year. If `year` is a
+        python number, the dates are computed on the client and passed as
+        constants
+
+        :type year: int or ee.Number
+        :rtype: ee.DateRange
+        """
+        if isinstance(year, (int, float)):
+            start, end = self.date_range_millis(year)
+            return ee.DateRange(ee.Date(start), ee.Date(end))
+
         year = ee.Number(year)
         if self.over_end:
             start_year = year.subtract(1)
@@ -158,17 +284,17 @@ class Season(object):
             start_year = ee.Number(year)
         end_year = ee.Number(year)
 
+        leap = is_leap(year)
         sday = self.start.day
         eday = self.end.day
 
         # look for feb 29h in non leap
-        if not is_leap(year):
-            if self.start.month == 2 and sday == 29:
-                sday = 28
-            if self.end.month == 2 and eday == 29:
-                eday = 28
+        if self.start.month == 2 and sday == 29:
+            sday = ee.Number(ee.Algorithms.If(leap, 29, 28))
+        if self.end.month == 2 and eday == 29:
+            eday = ee.Number(ee.Algorithms.If(leap, 29, 28))
 
         start = ee.Date.fromYMD(start_year, self.start.month, sday)
         end = ee.Date.fromYMD(end_year, self.end.month, eday)
         daterange = ee.DateRange(ee.Date(start), ee.Date(end))
-        return daterange
\ No newline at end of file
+        return daterange
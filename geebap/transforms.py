@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+""" Per band corrections of the reflectances.
+
+The rescale of the values of a collection to the range of the target
+collection (`geetools.collection.rescale`) and the harmonization of Landsat 8
+to Landsat 7 (Roy et al. 2016) are both linear, so they are combined on the
+client in one gain and one offset per band and applied with a single
+`multiply().add()`. As in geetools, the harmonized bands are resampled with
+bicubic interpolation.
+
+The BRDF and the harmonization can also be applied once to the composite
+(`correct_composite`), taking the coefficients of each pixel from its
+`col_id` band and the solar geometry from its `date` band.
+"""
+import math
+from collections import namedtuple
+import ee
+from .functions import HARMONIZE_BANDS
+from .footprints import WRS_INCLINATION
+
+# Roy, D.P., Kovalskyy, V., Zhang, H.K., Vermote, E.F., Yan, L., Kumar, S.S,
+# Egorov, A., 2016, Characterization of Landsat-7 to Landsat-8 reflective
+# wavelength and normalized difference vegetation index continuity, Remote
+# Sensing of Environment, 185, 57-70. Table 2 - reduced major axis (RMA)
+# regression coefficients (same as geetools)
+HARMONIZE_SLOPES = dict(zip(HARMONIZE_BANDS,
+                            (0.9785, 0.9542, 0.9825, 1.0073, 1.0171, 0.9949)))
+HARMONIZE_INTERCEPTS = dict(zip(HARMONIZE_BANDS,
+                                (-0.0095, -0.0016, -0.0022, -0.0021, -0.0030,
+                                 0.0029)))
+
+# Image methods to convert to each precision
+CONVERSIONS = {'float': 'toFloat', 'double': 'toDouble', 'int8': 'toInt8',
+               'uint8': 'toUint8', 'uint16': 'toUint16', 'int16': 'toInt16',
+               'uint32': 'toUint32', 'int32': 'toInt32', 'int64': 'toInt64'}
+
+# `value * gain + offset` for each band (renamed), converted to the precision
+# of the band. `resample` is True for the bands that are resampled with
+# bicubic interpolation (the harmonized ones)
+LinearTransform = namedtuple('LinearTransform',
+                             ['bands', 'gains', 'offsets', 'precisions',
+                              'resample'])
+
+# Transforms by (collection id, target collection id, harmonize)
+_TRANSFORMS = {}
+
+
+def can_harmonize(col):
+    """ True if the collection is harmonized (Landsat 8) """
+    return 'harmonize' in col.algorithms.keys() and \
+        getattr(col, 'spacecraft', None) == 'LANDSAT' and col.number == 8
+
+
+def harmonize_coefficients(col):
+    """ Gain and offset of the harmonization of each band (renamed) of the
+    collection. Empty if the collection is not harmonized
+
+    :rtype: dict
+    """
+    if not can_harmonize(col):
+        return {}
+    bands = [band for band in col.bands if band.name in HARMONIZE_BANDS]
+    max_value = max([band.max for band in bands])
+    return {band.name: (1.0 / HARMONIZE_SLOPES[band.name],
+                        -HARMONIZE_INTERCEPTS[band.name] * max_value /
+                        HARMONIZE_SLOPES[band.name])
+            for band in bands}
+
+
+def linear_transform(col, target, harmonize=True):
+    """ Gain and offset of each band to rescale the values of the collection
+    to the range of the target collection and (optionally) harmonize them.
+    Bands that don't change are not included. The result is computed once
+    for each collection, target and harmonize option
+
+    :param col: the collection of the images
+    :type col: geetools.collection.Collection
+    :param target: the collection to take the ranges from
+    :type target: geetools.collection.Collection
+    :param harmonize: include the harmonization
+    :type harmonize: bool
+    :rtype: LinearTransform
+    """
+    key = (col.id, target.id, harmonize)
+    if key in _TRANSFORMS:
+        return _TRANSFORMS[key]
+
+    harmonized = harmonize_coefficients(col) if harmonize else {}
+    bands, gains, offsets, precisions, resample = [], [], [], [], []
+    for band in col.bands:
+        gain, offset, precision = 1.0, 0.0, band.precision
+        other = target.getBand(band.name, 'name')
+        if other is not None and \
+                None not in (band.min, band.max, other.min, other.max):
+            precision = other.precision
+            if (band.min, band.max) != (other.min, other.max):
+                gain = float(other.max - other.min) / (band.max - band.min)
+                offset = other.min - band.min * gain
+        if band.name in harmonized:
+            hgain, hoffset = harmonized[band.name]
+            gain, offset = gain * hgain, offset * hgain + hoffset
+        if (gain, offset) == (1.0, 0.0) and precision == band.precision:
+            continue
+        bands.append(band.name)
+        gains.append(gain)
+        offsets.append(offset)
+        precisions.append(precision)
+        resample.append(band.name in harmonized)
+
+    transform = LinearTransform(tuple(bands), tuple(gains), tuple(offsets),
+                                tuple(precisions), tuple(resample))
+    _TRANSFORMS[key] = transform
+    return transform
+
+
+def subset(transform, bands):
+    """ The transform of the given bands only
+
+    :rtype: LinearTransform
+    """
+    keep = [i for i, band in enumerate(transform.bands) if band in bands]
+    return LinearTransform(*[tuple(values[i] for i in keep)
+                             for values in transform])
+
+
+def apply(image, transform):
+    """ Apply the transform to the (renamed) image. The order of the bands is
+    kept
+
+    :type image: ee.Image
+    :type transform: LinearTransform
+    :rtype: ee.Image
+    """
+    if not transform.bands:
+        return image
+    bands = list(transform.bands)
+    values = image.select(bands)
+    resampled = [band for band, resample
+                 in zip(bands, transform.resample) if resample]
+    if resampled:
+        values = values.addBands(image.select(resampled).resample('bicubic'),
+                                 overwrite=True).select(bands)
+    values = values \
+        .multiply(ee.Image.constant(list(transform.gains))) \
+        .add(ee.Image.constant(list(transform.offsets))) \
+        .rename(bands)
+
+    return replace(image, values, transform.precisions)
+
+
+def replace(image, values, precisions):
+    """ Replace the bands of the image with `values`, converted to the given
+    precisions (one per band). The order of the bands is kept
+
+    :type image: ee.Image
+    :type values: ee.Image
+    :type precisions: list
+    :rtype: ee.Image
+    """
+    converted = []
+    for precision in sorted(set(precisions), key=str):
+        group = [i for i, band_precision in enumerate(precisions)
+                 if band_precision == precision]
+        selected = values.select(group)
+        if precision in CONVERSIONS:
+            selected = getattr(selected, CONVERSIONS[precision])()
+        converted.append(selected)
+
+    return image.addBands(ee.Image.cat(*converted), overwrite=True) \
+        .select(image.bandNames())
+
+
+# BRDF c-factor (Roy et al. 2016) with the coefficients (fiso, fgeo, fvol) of
+# geetools.algorithms.Landsat.brdfCorrect for each band (renamed)
+BRDF_COEFFICIENTS = {'blue': (0.0774, 0.0079, 0.0372),
+                     'green': (0.1306, 0.0178, 0.0580),
+                     'red': (0.1690, 0.0227, 0.0574),
+                     'nir': (0.3093, 0.0330, 0.1535),
+                     'swir': (0.3430, 0.0453, 0.1154),
+                     'swir2': (0.2658, 0.0387, 0.0639)}
+BRDF_KVOL_FACTOR = 3
+
+# Nominal local solar time (hours) of the descending node and inclination
+# (degrees) of the orbit of each spacecraft
+OVERPASS_HOURS = {'LANDSAT': 10.0, 'SENTINEL2': 10.5}
+ORBIT_INCLINATIONS = {'LANDSAT': math.degrees(WRS_INCLINATION),
+                      'SENTINEL2': 98.62}
+
+# Days of a non leap year before each month
+DAYS_BEFORE_MONTH = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]
+
+
+def day_of_year(date):
+    """ Day of the year of a date image with format YYYYMMDD (without leap
+    days)
+
+    :type date: ee.Image
+    :rtype: ee.Image
+    """
+    date = date.toDouble()
+    month = date.divide(100).floor().mod(100)
+    day = date.mod(100)
+    return month.remap(list(range(1, 13)), DAYS_BEFORE_MONTH).add(day)
+
+
+def overpass_hour(node_hour, inclination):
+    """ Local solar time (hours) of the overpass of each pixel. In a
+    descending sun-synchronous orbit it is later to the north of the
+    descending node and earlier to the south
+
+    :param node_hour: local solar time of the descending node
+    :type node_hour: ee.Image
+    :param inclination: inclination of the orbit (degrees)
+    :type inclination: ee.Image
+    :rtype: ee.Image
+    """
+    latitude = ee.Image.pixelLonLat().select('latitude') \
+        .multiply(math.pi / 180)
+    retrograde = ee.Image(180).subtract(inclination).multiply(math.pi / 180)
+    ratio = latitude.tan().divide(retrograde.tan()).clamp(-1, 1)
+    return node_hour.add(ratio.asin().multiply(180 / math.pi / 15))
+
+
+def solar_zenith(date, hour):
+    """ Solar zenith (radians) of each pixel given a date image (YYYYMMDD)
+    and the local solar time (hours), with the equations of geetools
+
+    :type date: ee.Image
+    :type hour: ee.Image
+    :rtype: ee.Image
+    """
+    latitude = ee.Image.pixelLonLat().select('latitude') \
+        .multiply(math.pi / 180)
+    # julian date proportion in radians
+    jdpr = day_of_year(date).subtract(1).divide(365).multiply(2 * math.pi)
+    delta = jdpr.expression(
+        '0.006918 - 0.399912 * cos(j) + 0.070257 * sin(j)'
+        '- 0.006758 * cos(2 * j) + 0.000907 * sin(2 * j)'
+        '- 0.002697 * cos(3 * j) + 0.001480 * sin(3 * j)', {'j': jdpr})
+    # difference between the true and the mean solar time (hours)
+    difference = jdpr.expression(
+        '(0.000075 + 0.001868 * cos(j) - 0.032077 * sin(j)'
+        '- 0.014615 * cos(2 * j) - 0.040849 * sin(2 * j)) * 12 / {}'.format(
+            math.pi), {'j': jdpr})
+    angle = hour.add(difference).subtract(12).multiply(15 * math.pi / 180)
+    return latitude.expression(
+        'acos(sin(lat) * sin(delta) + cos(lat) * cos(delta) * cos(angle))',
+        {'lat': latitude, 'delta': delta, 'angle': angle})
+
+
+def solar_zenith_out():
+    """ Solar zenith (radians) to normalize to, with the polynomial of the
+    HLS v1.0 user guide. As geetools.algorithms.Landsat.brdfCorrect (used
+    to correct each scene), it takes the latitude in radians, so the result
+    is about 31° and both correction modes normalize to the same zenith """
+    latitude = ee.Image.pixelLonLat().select('latitude') \
+        .multiply(math.pi / 180)
+    return latitude.expression(
+        '(31.0076 - 0.1272 * lat + 0.01187 * pow(lat, 2)'
+        '+ 2.40E-05 * pow(lat, 3) - 9.48E-07 * pow(lat, 4)'
+        '- 1.95E-09 * pow(lat, 5) + 6.15E-11 * pow(lat, 6))'
+        '* {} / 180'.format(math.pi), {'lat': latitude})
+
+
+def ross_thick(sun_zenith):
+    """ Ross-Thick volumetric kernel for a nadir view
+
+    :type sun_zenith: ee.Image
+    :rtype: ee.Image
+    """
+    return sun_zenith.expression(
+        '(({pi} / 2 - z) * cos(z) + sin(z)) / (cos(z) + 1) - {pi} / 4'.format(
+            pi=math.pi), {'z': sun_zenith})
+
+
+def c_factor(band, kvol, kvol_out):
+    """ BRDF correction factor of a band. As in geetools, the volumetric
+    kernel is used for both the volumetric and the geometric terms
+
+    :rtype: ee.Image
+    """
+    fiso, fgeo, fvol = BRDF_COEFFICIENTS[band]
+
+    def brdf(kernel):
+        return kernel.multiply(BRDF_KVOL_FACTOR * (fvol + fgeo)).add(fiso)
+
+    return brdf(kvol_out).divide(brdf(kvol))
+
+
+def correct_composite(image, collections, col_ids, target, bands, brdf=False,
+                      harmonize=False, col_id_band='col_id',
+                      date_band='date'):
+    """ Apply the BRDF correction and the harmonization to a composite. The
+    coefficients of each pixel are taken from the collection of its
+    `col_id`. The BRDF takes the solar geometry from the date of the pixel
+    and the overpass time of the orbit of the spacecraft at its latitude.
+    The view is taken as nadir (Landsat scenes go up to 7.5°), so the
+    c-factor can differ up to about 8% from the one of each scene
+
+    :param image: the composite (rescaled to the target collection)
+    :type image: ee.Image
+    :param collections: the collections used in the composite
+    :type collections: list
+    :param col_ids: the col_id of each collection
+    :type col_ids: list
+    :param target: the target collection (for the precision of the bands)
+    :type target: geetools.collection.Collection
+    :param bands: the bands of the composite (renamed)
+    :type bands: list
+    :rtype: ee.Image
+    """
+    if not (brdf or harmonize):
+        return image
+    bands = [band for band in bands if band in BRDF_COEFFICIENTS]
+    if not bands:
+        return image
+
+    col_ids = list(col_ids)
+    col_id = image.select(col_id_band)
+    values = image.select(bands).toFloat()
+
+    if brdf:
+        has_brdf = [1 if 'brdf' in col.algorithms.keys() else 0
+                    for col in collections]
+        spacecrafts = [getattr(col, 'spacecraft', None) for col in collections]
+        spacecrafts = [sc if sc in OVERPASS_HOURS else 'LANDSAT'
+                       for sc in spacecrafts]
+        node_hour = col_id.remap(
+            col_ids, [OVERPASS_HOURS[sc] for sc in spacecrafts],
+            OVERPASS_HOURS['LANDSAT'])
+        inclination = col_id.remap(
+            col_ids, [ORBIT_INCLINATIONS[sc] for sc in spacecrafts],
+            ORBIT_INCLINATIONS['LANDSAT'])
+        hour = overpass_hour(node_hour, inclination)
+        kvol = ross_thick(solar_zenith(image.select(date_band), hour))
+        kvol_out = ross_thick(solar_zenith_out())
+        skip = col_id.remap(col_ids, has_brdf, 0).Not()
+        factors = [c_factor(band, kvol, kvol_out).where(skip, 1)
+                   for band in bands]
+        values = values.multiply(ee.Image.cat(*factors))
+
+    if harmonize:
+        coefficients = [harmonize_coefficients(col) for col in collections]
+        gains, offsets = [], []
+        for band in bands:
+            pairs = [coef.get(band, (1.0, 0.0)) for coef in coefficients]
+            gains.append(col_id.remap(col_ids, [p[0] for p in pairs], 1))
+            offsets.append(col_id.remap(col_ids, [p[1] for p in pairs], 0))
+        values = values.multiply(ee.Image.cat(*gains)) \
+            .add(ee.Image.cat(*offsets))
+
+    precisions = []
+    for band in bands:
+        target_band = target.getBand(band, 'name')
+        precisions.append(target_band.precision if target_band else 'float')
+    return replace(image, values.rename(bands), precisions)
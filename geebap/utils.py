@@ -2,6 +2,24 @@
 """ Util functions """
 
 
+class lazy_class_attribute(object):
+    """ Class attribute computed on first access (and then stored in the
+    class). Used for Earth Engine objects, that can only be created after
+    `ee.Initialize()`
+
+    :param function: function that takes the class and returns the value
+    """
+    def __init__(self, function):
+        self.function = function
+        self.name = function.__name__
+        self.__doc__ = function.__doc__
+
+    def __get__(self, obj, cls):
+        value = self.function(cls)
+        setattr(cls, self.name, value)
+        return value
+
+
 def get_init_params(obj):
     init_params = obj.__init__.__code__.co_varnames
     obj_params = obj.__dict__.items()
@@ -38,6 +38,7 @@ setup(
     'dev': [],
     'docs': [],
     'testing': [],
+    'local': ['scipy', 'futures; python_version < "3"'],
     },
     classifiers=['Programming Language :: Python :: 2',
                  'Programming Language :: Python :: 2.7',
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import ee
+import pytest
 ee.Initialize()
 from geebap import scores, bap, season, masks, filters
+from geetools import collection, tools
 
 
 # FILTERS
@@ -21,7 +23,7 @@ pmascpor = scores.MaskPercent()
 pindice = scores.Index()
 pout = scores.Outliers(("ndvi",))
 pdoy = scores.Doy('01-15', seas)
-thres = scores.Threshold()
+thres = scores.Threshold({'blue': {'min': 50, 'max': 1500}})
 
 # SITES
 site = ee.Geometry.Polygon(
@@ -44,3 +46,122 @@ def test_bap2016_0():
     composite = objbap.build_composite_best(2016, site, indices=("ndvi",))
 
     assert isinstance(composite, ee.Image) == True
+
+
+def test_compile():
+    objbap = bap.Bap(season=seas, range=(1, 0), scores=(psat, pop))
+    plan = objbap.compile(2016)
+    assert plan.years == (2015, 2016)
+    assert plan.score_names == (psat.name, pop.name)
+    assert len(plan.col_ids) == len(plan.collections)
+    assert plan.common_bands is objbap.compile(2017).common_bands
+
+    composite = objbap.build_composite_best(2016, site, plan=plan)
+    assert isinstance(composite, ee.Image)
+
+
+def test_source_filter():
+    col = ee.ImageCollection('LANDSAT/LC08/C01/T1_SR').filterBounds(site)
+    filtered = col.filter(seas.ee_filter([2016, 2017]))
+    expected = col.filterDate('2015-11-15', '2016-02-15').merge(
+        col.filterDate('2016-11-15', '2017-02-15'))
+    assert filtered.size().getInfo() == expected.size().getInfo()
+
+    l8 = collection.Landsat8SR()
+    covered = col.filter(filter.ee_filter(col=l8))
+    expected = col.filterMetadata(l8.cloud_cover, 'less_than', filter.percent)
+    assert covered.size().getInfo() == expected.size().getInfo()
+
+
+def test_clip_bbox():
+    # a triangle, so part of its bounds is out of the site
+    triangle = ee.Geometry.Polygon([[[-71.78, -42.79],
+                                     [-71.78, -42.89],
+                                     [-71.57, -42.89]]])
+    inside = ee.Geometry.Point([-71.75, -42.87])
+    outside = ee.Geometry.Point([-71.60, -42.80])
+    objbap = bap.Bap(season=seas, scores=(psat, pop))
+    composite = objbap.build_composite_best(2016, triangle, clip='bbox')
+
+    def value(point):
+        return composite.select(objbap.bandname_col_id).reduceRegion(
+            ee.Reducer.first(), point, 30).get(objbap.bandname_col_id) \
+            .getInfo()
+
+    assert value(inside) is not None
+    assert value(outside) is None
+    footprint = ee.Geometry(composite.get('system:footprint'))
+    assert not footprint.contains(outside, 1).getInfo()
+
+    prepared = bap.functions.prepare_site(site, 100, 10)
+    assert prepared.box is None
+    assert bap.functions.prepare_site(prepared) is prepared
+
+    # the box of the buffered site is computed once
+    boxed = bap.functions.prepare_site(prepared, box=True)
+    xmin, ymin, xmax, ymax = boxed.box
+    assert xmin < -71.78 and xmax > -71.57
+    assert bap.functions.prepare_site(boxed, box=True) is boxed
+
+
+def test_footprint_exact():
+    objbap = bap.Bap(season=seas, scores=(psat, pop))
+    composite = objbap.build_composite_best(2016, site, footprint='exact')
+    footprint = ee.Geometry(composite.get('system:footprint'))
+    assert footprint.contains(centroid, 1).getInfo()
+
+
+def test_winners_empty():
+    objbap = bap.Bap(season=seas, scores=(psat, pop))
+    col = objbap.compute_scores(2016, site)
+    empty = col.qualityMosaic(objbap.score_name).updateMask(0)
+    assert objbap.winners(empty, col, site).size().getInfo() == 0
+    assert bap.nominal_scale([collection.Landsat8SR(),
+                              collection.Sentinel2()], ['red']) == 10
+
+
+def test_required_bands():
+    l8 = collection.Landsat8SR()
+    objbap = bap.Bap(season=seas, scores=(psat, pop, pindice))
+    bands = objbap.required_bands(l8, ['blue', 'red'], ['ndvi'])
+    assert bands[0] == l8.bands[0].id
+    assert l8.getBand('nir', 'name').id in bands
+    assert l8.getBand('atmos_opacity', 'name').id in bands
+    assert l8.getBand('pixel_qa', 'name').id not in bands
+
+    medoid = bap.Bap(season=seas, scores=(scores.Medoid(),))
+    assert medoid.required_bands(l8, ['blue']) is None
+
+
+def test_correction_composite():
+    # scores that don't read the reflectances, so both modes take the same
+    # pixels
+    options = dict(season=seas, scores=(psat, pdoy), brdf=True)
+    by_scene = bap.Bap(**options).build_composite_best(2016, site)
+    by_composite = bap.Bap(correction='composite', **options) \
+        .build_composite_best(2016, site)
+
+    scene_values = tools.image.getValue(by_scene, centroid, 30, 'client')
+    values = tools.image.getValue(by_composite, centroid, 30, 'client')
+    assert values['col_id'] == scene_values['col_id']
+    assert values['date'] == scene_values['date']
+    # the BRDF of the composite takes a nadir view (see
+    # transforms.correct_composite)
+    for band in ('red', 'nir'):
+        assert abs(values[band] - scene_values[band]) <= \
+            0.08 * abs(scene_values[band]) + 2, band
+
+    with pytest.raises(ValueError):
+        bap.Bap(season=seas, correction='mosaic')
+
+
+priority_l8 = bap.priority.ID8SR
+
+
+def test_satellite_out_of_range():
+    # years out of the priority table take the nearest period
+    last = bap.priority.DEFAULT_TABLE.breaks[-1] - 1
+    for year in (last + 10, ee.Number(last + 10)):
+        score = scores.Satellite.compute(None, collection_id=priority_l8,
+                                         year=year, name='sat')
+        assert score.get('SAT').getInfo() == 1
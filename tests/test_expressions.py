@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from geebap.expressions import Expression
+
+
+def test_eval_array():
+    exp = Expression.Exponential(range=(0, 100))
+    values = np.array([[0, 25], [50, 100]])
+    result = exp.eval(values)
+    assert result.shape == (2, 2)
+    np.testing.assert_allclose(result[1, 0], exp.eval(50))
+    np.testing.assert_allclose(exp.eval_normalized(values),
+                               result / exp.max_result)
+
+
+def test_memoized():
+    exp = Expression.Exponential(range=(0, 100))
+    assert exp.max_result is exp.max_result
+    first = exp.max_result
+
+    # changing a parameter the result depends on invalidates the cache
+    exp.params['a'] = -2
+    assert exp.max_result != first
+    np.testing.assert_allclose(exp.max_result, exp.eval(0))
+
+    # and so does changing the range (mean and std follow it)
+    mean = exp.mean
+    exp.range = (0, 50)
+    assert exp.mean != mean
+    np.testing.assert_allclose(exp.std, np.std(exp.range_values))
+
+
+def test_compile():
+    from geebap.expgen import ExpGen
+    compiled = ExpGen.compile('{var}*(1/{max}*{a})+max({var}, {var})',
+                              var='var', max=100, a=-10)
+    assert compiled.ee == 'var*(-0.1)+var'
+    assert compiled.numpy == 'var*(-0.1)+var'
+    assert ExpGen.compile('max(var, 2*3)').ee == '(var>6?var:6)'
+    assert ExpGen.compile('max(var, 2*3)').numpy == 'max(var, 6)'
+
+    exp = Expression.Exponential(range=(0, 100))
+    assert '1/100' not in exp.format_ee()
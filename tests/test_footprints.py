@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+from geebap import footprints
+
+# (lon, lat): path/row and Sentinel-2 tile
+PLACES = {'santiago': ((-70.66, -33.45), (233, 83), '19HCD'),
+          'paris': ((2.35, 48.85), (199, 26), '31UDQ'),
+          'new_york': ((-74.0, 40.71), (14, 32), '18TWL')}
+
+# Sample of the USGS WRS-2 descending footprints: path/row, center (lon, lat)
+# and the westernmost, easternmost, southernmost and northernmost corners.
+# The first four are the scenes with the corner farthest from the computed
+# center
+WRS2_REFERENCE = {
+    (111, 33): ((134.786, 38.9064), [(133.5096, 38.3051), (136.0624, 39.5013),
+                                     (135.5784, 38.0042),
+                                     (133.9507, 39.8085)]),
+    (80, 33): ((-177.317, 38.9064), [(-178.5934, 38.3051),
+                                     (-176.0406, 39.5013),
+                                     (-176.5246, 38.0042),
+                                     (-178.1523, 39.8085)]),
+    (49, 33): ((-129.42, 38.9064), [(-130.6964, 38.3051),
+                                    (-128.1436, 39.5013),
+                                    (-128.6276, 38.0042),
+                                    (-130.2553, 39.8085)]),
+    (127, 33): ((110.065, 38.9064), [(108.7886, 38.3051),
+                                     (111.3414, 39.5013),
+                                     (110.8574, 38.0042),
+                                     (109.2297, 39.8085)]),
+    (1, 1): ((2.9461, 80.7722), [(-3.6613, 81.0912), (9.5535, 80.3429),
+                                 (1.5588, 79.691), (5.2814, 81.8533)]),
+    (117, 60): ((116.173, 0.0), [(115.191, -0.6401), (117.155, 0.6401),
+                                 (116.8327, -0.8786), (115.5123, 0.8786)]),
+    (40, 15): ((-103.069, 64.2242), [(-105.4832, 63.7632),
+                                     (-100.6548, 64.6573),
+                                     (-101.9782, 63.2376),
+                                     (-104.3245, 65.2108)]),
+    (200, 110): ((-41.5768, -70.9156), [(-44.9041, -71.2151),
+                                        (-38.2495, -70.5668),
+                                        (-40.2397, -71.9561),
+                                        (-42.6734, -69.875)]),
+    (150, 100): ((48.2689, -57.3097), [(46.3727, -57.8164),
+                                       (50.1651, -56.7859),
+                                       (49.3766, -58.2602),
+                                       (47.2698, -56.3592)]),
+    (10, 45): ((-73.7414, 21.6736), [(-74.8006, 21.0435),
+                                     (-72.6822, 22.3009),
+                                     (-73.0473, 20.7889),
+                                     (-74.4534, 22.5582)]),
+    (180, 70): ((15.7166, -14.4584), [(14.7014, -15.0927),
+                                      (16.7317, -13.8224),
+                                      (16.4007, -15.3395),
+                                      (15.0435, -13.5772)]),
+    (60, 5): ((-111.7075, 77.0496), [(-116.7329, 76.939),
+                                     (-106.6821, 77.0674),
+                                     (-111.1312, 75.9416),
+                                     (-112.4525, 78.1575)]),
+    (90, 118): ((97.7128, -80.0226), [(91.3743, -79.726),
+                                      (104.0513, -80.2031),
+                                      (96.56, -81.1318),
+                                      (98.3796, -78.9134)]),
+}
+
+# Sample of the ESA Sentinel-2 tiling grid: tile and its corners (lon, lat).
+# The first five cross the boundary of their latitude band
+S2_REFERENCE = {
+    '20KQU': [(-61.0364, -23.5026), (-59.9728, -23.4855),
+              (-59.9498, -24.466), (-61.0215, -24.4838)],
+    '19HBE': [(-72.1562, -31.6009), (-71.0114, -31.6241),
+              (-71.0329, -32.6041), (-72.1901, -32.5801)],
+    '20KMU': [(-63.9745, -23.5119), (-62.9098, -23.5149),
+              (-62.9091, -24.4968), (-63.9819, -24.4936)],
+    '19KEP': [(-68.9948, -23.515), (-67.9301, -23.5113),
+              (-67.9219, -24.4929), (-68.9948, -24.4968)],
+    '21HTE': [(-60.1562, -31.6009), (-59.0114, -31.6241),
+              (-59.0329, -32.6041), (-60.1901, -32.5801)],
+    '19HCD': [(-71.1235, -32.5243), (-69.9665, -32.5386),
+              (-69.9772, -33.519), (-71.1472, -33.5042)],
+    '17MRV': [(-78.3002, -0.005), (-77.3249, -0.005), (-77.3243, -0.9864),
+              (-78.2998, -0.9873)],
+    '18GYU': [(-72.5965, -41.5311), (-71.2958, -41.4965),
+              (-71.2385, -42.4735), (-72.5595, -42.5093)],
+    '20JKN': [(-66.0708, -28.8976), (-64.9569, -28.9184),
+              (-64.9757, -29.899), (-66.1005, -29.8773)],
+    '22JBP': [(-54.0449, -27.9961), (-52.9403, -28.0161),
+              (-52.9583, -28.9968), (-54.0732, -28.9759)],
+}
+
+
+def test_pathrows():
+    for (lon, lat), pathrow, _ in PLACES.values():
+        assert pathrow in footprints.pathrows((lon, lat, lon, lat))
+
+
+def test_wrs2_reference():
+    lat, lon = footprints.wrs2_centers()
+    for (path, row), (center, corners) in WRS2_REFERENCE.items():
+        # the computed centers are less than 25 km away from the real ones
+        distance = footprints.distance(lat[path - 1, row - 1],
+                                       lon[path - 1, row - 1],
+                                       center[1], center[0])
+        assert distance < 25, (path, row)
+        for x, y in [center] + corners:
+            assert (path, row) in footprints.pathrows((x, y, x, y)), \
+                (path, row, x, y)
+
+
+def test_mgrs_tiles():
+    for (lon, lat), _, tile in PLACES.values():
+        assert tile in footprints.mgrs_tiles((lon, lat, lon, lat))
+
+
+def test_bounds():
+    geojson = {'type': 'Polygon',
+               'coordinates': [[[-71.78, -42.79], [-71.78, -42.89],
+                                [-71.57, -42.89], [-71.57, -42.79]]]}
+    assert footprints.bounds(geojson) == (-71.78, -42.89, -71.57, -42.79)
+
+
+def test_s2_reference():
+    for tile, corners in S2_REFERENCE.items():
+        for x, y in corners:
+            assert tile in footprints.mgrs_tiles((x, y, x, y)), (tile, x, y)
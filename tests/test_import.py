@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import subprocess
+
+# Earth Engine can't be imported
+CODE = """
+import sys
+sys.modules['ee'] = None
+import geebap
+assert geebap.__version__
+local = geebap.local
+assert local.scores.index_values
+assert 'geebap.bap' not in sys.modules
+"""
+
+
+def test_import_without_ee():
+    subprocess.check_call([sys.executable, '-c', CODE])
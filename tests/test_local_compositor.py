@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+import numpy as np
+from geebap.local.stack import SceneStack
+from geebap.local.compositor import Compositor, benchmark, pixel_score
+
+bands = ['blue', 'green', 'red', 'nir', 'swir', 'swir2']
+scores = [('CloudDist', {'dmax': 5}),
+          ('MaskPercentKernel', {'distance': 3}),
+          ('Index', {'index': 'ndvi'}),
+          ('Satellite', {}),
+          ('MaskPercent', {})]
+
+
+def make_stack(path):
+    rng = np.random.RandomState(0)
+    stack = SceneStack.create(path, bands, 30, 40)
+    for i in range(5):
+        data = rng.randint(1, 5000, (6, 30, 40)).astype(np.int16)
+        mask = np.ones(data.shape, dtype=bool)
+        mask[:, rng.randint(0, 30), :] = False
+        stack.append(data, mask, col_id=i % 2 + 1,
+                     date='2017-01-{:02d}'.format(i + 1))
+    return stack
+
+
+def test_blocks(tmpdir):
+    stack = make_stack(str(tmpdir.join('stack')))
+    relation = {2017: [1, 2]}
+    whole = Compositor(stack, scores, relation=relation, block_size=64)
+    blocks = Compositor(stack, scores, relation=relation, block_size=7)
+    assert blocks.halo == 5
+
+    expected = whole.run(str(tmpdir.join('whole')), workers=1)
+    result = blocks.run(str(tmpdir.join('blocks')), workers=2)
+    np.testing.assert_array_equal(result.index, expected.index)
+    np.testing.assert_array_equal(result.data, expected.data)
+    assert set(np.unique(result.col_id)) <= {1, 2}
+
+
+def test_benchmark(tmpdir):
+    stack = make_stack(str(tmpdir.join('stack')))
+    compositor = Compositor(stack, scores[:1], block_size=16)
+    results = benchmark(compositor, workers=(1, 2))
+    assert [res['workers'] for res in results] == [1, 2]
+    assert all(res['pixels_per_second'] > 0 for res in results)
+
+
+def test_medoid_sample_by(tmpdir):
+    stack = make_stack(str(tmpdir.join('stack')))
+    for scene, cover in zip(stack.scenes, [40, 10, 90, 60, 30]):
+        scene['cloud_cover'] = cover
+    medoid = ('Medoid', {'sample_size': 1, 'sample_by': 'CLOUD_COVER',
+                         'discard_zeros': False})
+    result = Compositor(stack, [medoid]).run(str(tmpdir.join('cover')), 1)
+    # the subsample is the less cloudy scene
+    assert set(np.unique(result.index[stack.mask[1, 0]])) == {1}
+
+    medoid[1]['sample_ascending'] = False
+    result = Compositor(stack, [medoid]).run(str(tmpdir.join('desc')), 1)
+    assert set(np.unique(result.index[stack.mask[2, 0]])) == {2}
+
+    medoid[1]['sample_by'] = 'SUN_ELEVATION'
+    with pytest.raises(ValueError):
+        Compositor(stack, [medoid]).run(str(tmpdir.join('unknown')), 1)
+
+
+def test_scene_scores(tmpdir):
+    stack = make_stack(str(tmpdir.join('stack')))
+    # the relation of the score, with the years clamped to it
+    satellite = ('Satellite', {'relation': {2015: [2, 1]}})
+    total = Compositor(stack, [satellite]).scene_scores()
+    np.testing.assert_allclose(total, [0.95, 1, 0.95, 1, 0.95])
+
+    with pytest.raises(ValueError):
+        Compositor(stack, [('Satellite', {})]).scene_scores()
+    with pytest.raises(ValueError):
+        Compositor(stack, [('Doy', {})]).scene_scores()
+
+    total = Compositor(stack, [('MaskPercent', {})],
+                       block_size=7).scene_scores()
+    # one masked row of 30 in each scene
+    np.testing.assert_allclose(total, 1 - np.trunc(1e4 / 30) / 1e4)
+
+
+def test_threshold_bands_required(tmpdir):
+    stack = make_stack(str(tmpdir.join('stack')))
+    data, mask = stack.window(slice(0, 2), slice(0, 2))
+    context = Compositor(stack, []).context
+    with pytest.raises(ValueError):
+        pixel_score('Threshold', {'bands': None, 'range_out': (0, 1)},
+                    data, mask, context)
+    params = {'bands': {'blue': {'max': 5000}}, 'range_out': (0, 1)}
+    score = pixel_score('Threshold', params, data, mask, context)
+    assert score.shape == (len(stack), 2, 2)
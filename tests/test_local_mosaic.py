@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from geebap.local import mosaic
+
+# 4 images of 1 band and 1x3 pixels
+data = np.array([[10, 20, 30],
+                 [11, 21, 31],
+                 [12, 22, 32],
+                 [13, 23, 33]], dtype=np.int16).reshape((4, 1, 1, 3))
+mask = np.ones(data.shape, dtype=bool)
+score = np.array([[0.5, 0.1, np.nan],
+                  [0.9, 0.1, np.nan],
+                  [0.7, 0.3, np.nan],
+                  [0.2, 0.3, np.nan]], dtype=np.float32).reshape((4, 1, 3))
+col_ids = [1, 1, 2, 3]
+dates = np.array(['2017-01-01', '2017-01-10', '2017-01-20', '2017-02-01'],
+                 dtype='datetime64[D]')
+
+
+def test_quality_mosaic():
+    result = mosaic.quality_mosaic(data, mask, score, col_ids, dates)
+    # ties go to the first image
+    np.testing.assert_array_equal(result.index[0], [1, 2, -1])
+    np.testing.assert_array_equal(result.data[0, 0, :2], [11, 22])
+    np.testing.assert_array_equal(result.mask[0, 0], [True, True, False])
+    assert result.col_id[0, 0] == 1
+    assert result.date[0, 1] == np.datetime64('2017-01-20')
+
+    blocks = mosaic.quality_mosaic(data, mask, score, block_size=2)
+    np.testing.assert_array_equal(blocks.index, result.index)
+
+
+def test_reduce_collection():
+    result = mosaic.reduce_collection(data, mask, score, set=2,
+                                      col_ids=col_ids)
+    np.testing.assert_allclose(result.data[0, 0, 0], (11 + 12) / 2.)
+    np.testing.assert_array_equal(result.index[:, 0, 0], [1, 2])
+    np.testing.assert_array_equal(result.col_id[:, 0, 0], [1, 2])
+
+    # lowest score of the set
+    first = mosaic.reduce_collection(data, mask, score, set=2,
+                                     reducer='first', block_size=1)
+    np.testing.assert_allclose(first.data[0, 0, 0], 12)
+    np.testing.assert_allclose(first.score[0, 0], 0.7)
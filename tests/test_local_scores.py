@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from geebap.local import scores
+
+bands = ['blue', 'green', 'red', 'nir', 'swir']
+
+# 3 images of 2x2 pixels
+data = np.zeros((3, 5, 2, 2), dtype=np.int16)
+data[:, 0] = [[[100, 400], [1200, 0]],
+              [[200, 300], [2000, 50]],
+              [[150, 100], [900, 60]]]
+data[:, 2] = 500
+data[:, 3] = 3000
+mask = np.ones(data.shape, dtype=bool)
+mask[1, :, 0, 0] = False
+
+
+def test_index():
+    ndvi = scores.index_values(data, mask, bands, 'ndvi')
+    assert ndvi.shape == (3, 2, 2)
+    assert np.isnan(ndvi[1, 0, 0])
+    np.testing.assert_allclose(ndvi[0, 0, 0], 2500 / 3500., rtol=1e-6)
+
+    score = scores.index(ndvi, target=0.8, range_out=(0, 2))
+    # abs(x-0.8)*(-1)*(2/0.8)+2
+    expected = abs(2500 / 3500. - 0.8) * (-2 / 0.8) + 2
+    np.testing.assert_allclose(score[0, 0, 0], expected, rtol=1e-5)
+    assert np.isnan(score[1, 0, 0])
+
+
+def test_threshold():
+    score = scores.threshold(data, mask, bands,
+                             {'blue': {'min': 150, 'max': 1000},
+                              'red': {'max': 400}})
+    # red is always out, so the score is 0.5 when blue is inside
+    expected = np.array([[[0, 0.5], [0, 0]],
+                         [[np.nan, 0.5], [0, 0]],
+                         [[0.5, 0], [0.5, 0]]])
+    np.testing.assert_allclose(score, expected)
+
+
+def test_threshold_range_out():
+    score = scores.threshold(data, mask, bands, {'blue': {'min': 150}},
+                             range_out=(0, 10))
+    assert score[0, 0, 1] == 10
+    assert score[0, 0, 0] == 0
+
+
+def test_satellite():
+    relation = {2016: ['A', 'B', 'C']}
+    score = scores.satellite(['A', 'C', 'D'], [2016, 2016, 2016], relation)
+    np.testing.assert_allclose(score, [1, 0.9, 0])
+
+    # years out of the relation take the nearest one
+    relation = {2016: ['A', 'B'], 2017: ['B', 'A']}
+    score = scores.satellite(['A', 'A'], [2010, 2030], relation)
+    np.testing.assert_allclose(score, [1, 0.95])
+
+
+def test_doy():
+    dates = np.array(['2017-01-10', '2017-01-15', '2017-02-14'],
+                     dtype='datetime64[D]')
+    score = scores.doy(dates, np.datetime64('2017-01-15'))
+    # distances: -5, 0, 30 -> t = 30
+    np.testing.assert_allclose(score, [1 - 5 / 30., 1, 0], rtol=1e-6)
+
+
+def test_multi_year():
+    score = scores.multi_year([2015, 2016, 2017], 2016, range_out=(0, 2))
+    np.testing.assert_allclose(score, [0, 2, 0])
+
+
+def test_multi_year_one_year():
+    # a single year stack: every scene is at the same distance
+    for function in ('linear', 'gauss'):
+        score = scores.multi_year([2020, 2020], 2020, function,
+                                  range_out=(0, 2))
+        np.testing.assert_allclose(score, [2, 2])
+    score = scores.doy(np.array(['2017-01-15'], dtype='datetime64[D]'),
+                       np.datetime64('2017-01-15'))
+    np.testing.assert_allclose(score, [1])
+    np.testing.assert_allclose(scores.index([0.5, 0.7], 0.5, (0.5, 0.5),
+                                            'gauss'), [1, 1])
+
+
+def test_mask_percent():
+    score = scores.mask_percent(mask[:, 0], data=data[:, 0],
+                                count_zeros=True)
+    np.testing.assert_allclose(score, [0.75, 0.75, 1])
+
+    # the counts of the blocks add up to the counts of the scenes
+    top = scores.mask_count(mask[:, 0, :1], data=data[:, 0, :1],
+                            count_zeros=True)
+    bottom = scores.mask_count(mask[:, 0, 1:], data=data[:, 0, 1:],
+                               count_zeros=True)
+    counts = (top[0] + bottom[0], top[1] + bottom[1])
+    np.testing.assert_allclose(scores.mask_percent(None, counts=counts),
+                               score)
+
+
+def test_cloud_scene():
+    score = scores.cloud_scene([0, 50, 100])
+    assert score[0] > score[1] > score[2]
+    np.testing.assert_allclose(score[1], 0.5)
+
+
+def test_cloud_dist():
+    cloud = np.ones((2, 5, 7), dtype=bool)
+    cloud[0, 2, 0] = False
+    score = scores.cloud_dist(cloud, dmax=4)
+    assert np.isnan(score[0, 2, 0])
+    # distance 3 from the cloud
+    expected = 1 - np.exp(-3 / (4 * 0.2))
+    np.testing.assert_allclose(score[0, 2, 3], expected, rtol=1e-5)
+    # further than dmax
+    assert score[0, 2, 6] == 1
+    # no clouds in the second image
+    assert (score[1] == 1).all()
+
+    manhattan = scores.cloud_dist(cloud, dmax=4, kernel='manhattan')
+    expected = 1 - np.exp(-2 / (4 * 0.2))
+    np.testing.assert_allclose(manhattan[0, 1, 1], expected, rtol=1e-5)
+
+
+def test_mask_percent_kernel():
+    valid = np.ones((1, 4, 4), dtype=bool)
+    valid[0, 0, 0] = False
+    score = scores.mask_percent_kernel(valid, size=1)
+    assert np.isnan(score[0, 0, 0])
+    # corner pixel: 4 valid pixels of 9
+    np.testing.assert_allclose(score[0, 3, 3], 4 / 9.)
+    np.testing.assert_allclose(score[0, 1, 1], 8 / 9.)
+
+    for kernel in ('circle', 'diamond', 'plus'):
+        count = scores.neighborhood_count(valid, kernel, 1)
+        # with radius 1 these kernels are a plus (5 pixels)
+        assert count[0, 1, 1] == 5
+
+
+def test_outliers():
+    values = np.array([100, 110, 90, 0, 500], dtype=np.int16)
+    stack = values.reshape((5, 1, 1, 1))
+    valid = np.ones(stack.shape, dtype=bool)
+    flags = scores.outlier_flags(stack, valid, ['blue'], reducer='mean',
+                                 amount=1)
+    # zero is not part of the statistics but it is an outlier
+    stats = np.array([100, 110, 90, 500])
+    mmin, mmax = stats.mean() - stats.std(), stats.mean() + stats.std()
+    expected = [float(not (mmin <= val <= mmax)) for val in values]
+    np.testing.assert_allclose(flags[:, 0, 0, 0], expected)
+
+    score = scores.outliers(stack, valid, ['blue'], ['blue'], 'mean', 1)
+    np.testing.assert_allclose(score[:, 0, 0], 1 - np.array(expected))
+
+
+def test_medoid():
+    values = np.array([[100, 100], [110, 100], [500, 0], [120, 90]],
+                      dtype=np.int16)
+    stack = values.reshape((4, 2, 1, 1))
+    valid = np.ones(stack.shape, dtype=bool)
+    score = scores.medoid(stack, valid, ['blue', 'red'], normalize=False,
+                          block_size=1)
+
+    def distance(a, b):
+        diff = np.where((a == 0) | (b == 0), 0, a - b).astype(float)
+        return np.sqrt((diff ** 2).sum())
+
+    expected = [-sum(distance(values[i], values[j]) for j in range(4))
+                for i in range(4)]
+    np.testing.assert_allclose(score[:, 0, 0], expected, rtol=1e-6)
+
+    normalized = scores.medoid(stack, valid, ['blue', 'red'])
+    assert np.nanargmax(normalized[:, 0, 0]) == np.argmax(expected)
+
+
+def test_medoid_approximate_order():
+    values = np.array([[100, 100], [110, 100], [500, 0], [120, 90]],
+                      dtype=np.int16)
+    stack = values.reshape((4, 2, 1, 1))
+    valid = np.ones(stack.shape, dtype=bool)
+    cloud_cover = [5, 80, 10, 60]
+
+    assert list(scores.sample_indices(4, 2, cloud_cover)) == [1, 3]
+    assert list(scores.sample_indices(4, 2, cloud_cover, True)) == [0, 2]
+
+    def best(**kwargs):
+        score = scores.medoid_approximate(stack, valid, ['blue', 'red'],
+                                          sample_size=1,
+                                          sort_values=cloud_cover,
+                                          normalize=False, **kwargs)
+        return np.nanargmax(score[:, 0, 0])
+
+    # cloud properties take the less cloudy images, like Medoid.subsample
+    assert scores.ascending_default('CLOUDY_PIXEL_PERCENTAGE')
+    assert not scores.ascending_default('SUN_ELEVATION')
+    assert best(sort_by='cloud_cover') == 0
+    assert best(sort_by='cloud_cover', ascending=False) == 1
+    assert best() == 1
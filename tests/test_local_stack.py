@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from geebap.local.stack import SceneStack
+
+
+def test_append(tmpdir):
+    path = str(tmpdir.join('stack'))
+    stack = SceneStack.create(path, ['blue', 'red'], 3, 4, capacity=1)
+
+    first = np.arange(24, dtype=np.int16).reshape((2, 3, 4))
+    stack.append(first, col_id=1, date='2017-01-10', cloud_cover=5)
+    view = stack.data
+    # grow the files
+    mask = np.ones((2, 3, 4), dtype=bool)
+    mask[:, 0, 0] = False
+    stack.append(first * 2, mask, col_id=2, date='2017-01-20')
+    stack.append(first * 3, col_id=2, date='2017-01-30')
+    assert stack.capacity == 4
+    np.testing.assert_array_equal(view[0], first)
+
+    stack.flush()
+    reopened = SceneStack(path, 'r')
+    assert len(reopened) == 3
+    np.testing.assert_array_equal(reopened.data[2], first * 3)
+    np.testing.assert_array_equal(reopened.col_ids, [1, 2, 2])
+    assert reopened.dates[1] == np.datetime64('2017-01-20')
+
+    data, valid = reopened.window(slice(0, 2), slice(0, 2))
+    assert data.shape == (3, 2, 2, 2)
+    assert not valid[1, 0, 0, 0]
+    # no copy
+    assert isinstance(data, np.memmap)
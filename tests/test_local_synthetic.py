@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from geebap.local import synthetic, scores
+
+relation = {2010: ['LANDSAT/LT05/C01/T1_SR', 'LANDSAT/LT05/C01/T1_TOA',
+                   'LANDSAT/LE07/C01/T1_SR', 'LANDSAT/LE07/C01/T1_TOA']}
+
+
+def make(seed=1):
+    return synthetic.SyntheticScenes(2010, 64, 80, start='2010-01-01',
+                                     end='2010-03-31', relation=relation,
+                                     seed=seed)
+
+
+def test_scenes():
+    scenes = make()
+    col_ids = [col_id for col_id, date in scenes.scenes]
+    assert set(col_ids) == {'LANDSAT/LT05/C01/T1_SR',
+                            'LANDSAT/LE07/C01/T1_SR'}
+    assert scenes.scenes is scenes.scenes
+    # the list follows the parameters
+    scenes.toa = True
+    assert len(scenes.scenes) == 2 * len(col_ids)
+    scenes.toa = False
+    data, mask, properties = scenes.arrays()
+    assert data.shape == scenes.shape
+    assert data.dtype == np.int16
+    assert 0 <= data.min() and data.max() <= 10000
+
+    # same seed, same scenes
+    again, _, _ = make().arrays()
+    np.testing.assert_array_equal(data, again)
+
+    # SLC-off gaps in Landsat 7 only
+    for i, props in enumerate(properties):
+        gaps = (data[i] == 0).all(axis=0)
+        assert gaps.any() == ('LE07' in props['col_id'])
+        assert 0 <= props['cloud_cover'] <= 80
+
+    # vegetation
+    ndvi = scores.index_values(data, mask, synthetic.BANDS, 'ndvi')
+    assert 0.2 < np.nanmedian(ndvi) < 0.9
+
+
+def test_to_stack(tmpdir):
+    scenes = make()
+    stack = scenes.to_stack(str(tmpdir.join('stack')))
+    assert len(stack) == len(scenes.scenes)
+    assert stack.dates[0] == np.datetime64('2010-01-01')
+    props = synthetic.ee_properties(stack.scenes[0])
+    assert props['system:time_start'] == 1262304000000
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import ee
+ee.Initialize()
+
+from geebap import scores
+from geetools import tools
+
+p = ee.Geometry.Point([-71.56871795654297, -43.35720861888331])
+
+# one constant image per value, the cloud cover grows with the value
+values = [1, 2, 3, 4, 20]
+images = [ee.Image.constant(value).rename('B1').toFloat()
+          .set('CLOUD_COVER', value * 5)
+          .set('system:time_start', ee.Date('2016-01-01')
+               .advance(i, 'day').millis())
+          for i, value in enumerate(values)]
+col = ee.ImageCollection.fromImages(images)
+
+
+def scores_at(collection, name):
+    imlist = collection.sort('system:time_start').toList(len(values))
+    return [tools.image.getValue(ee.Image(imlist.get(i)), p, 30,
+                                 side='client')[name]
+            for i in range(len(values))]
+
+
+def test_subsample():
+    lowest = scores.Medoid.subsample(col, 2, 'CLOUD_COVER')
+    assert lowest.aggregate_array('CLOUD_COVER').getInfo() == [5, 10]
+
+    highest = scores.Medoid.subsample(col, 2, 'CLOUD_COVER', False)
+    assert highest.aggregate_array('CLOUD_COVER').getInfo() == [100, 20]
+
+    stride = scores.Medoid.subsample(col, 2)
+    # stride 2 over time
+    assert stride.aggregate_array('CLOUD_COVER').getInfo() == [5, 15]
+
+
+def test_subsample_sentinel2():
+    s2 = col.map(lambda img: img.set('CLOUDY_PIXEL_PERCENTAGE',
+                                     img.get('CLOUD_COVER')))
+    medoid = scores.Medoid(sample_size=2,
+                           sample_by='CLOUDY_PIXEL_PERCENTAGE')
+    assert medoid.sample_ascending
+    assert not scores.Medoid.ascending_default('SUN_ELEVATION')
+    assert not scores.Medoid.ascending_default(None)
+
+    lowest = scores.Medoid.subsample(s2, 2, 'CLOUDY_PIXEL_PERCENTAGE')
+    assert lowest.aggregate_array('CLOUDY_PIXEL_PERCENTAGE').getInfo() == \
+        [5, 10]
+
+
+def test_approximate():
+    name = 'score-medoid'
+    exact = scores.Medoid(bands=['B1'], discard_zeros=False, name=name)
+    approximate = scores.Medoid(bands=['B1'], discard_zeros=False,
+                                name=name, sample_size=len(values))
+    exact_scores = scores_at(exact.map(col), name)
+    approximate_scores = scores_at(approximate.map(col), name)
+
+    # the medoid (3) gets the top score and the outlier (20) the lowest
+    for result in (exact_scores, approximate_scores):
+        assert result.index(max(result)) == 2
+        assert result.index(min(result)) == 4
+    assert abs(approximate_scores[2] - 1) < 1e-6
+    assert abs(exact_scores[2] - 1) < 1e-6
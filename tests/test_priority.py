@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from geebap import priority
+
+
+def test_default_table():
+    table = priority.DEFAULT_TABLE
+    for year, satellites in priority.SeasonPriority.relation.items():
+        assert table.satellites(year) == satellites
+
+
+def test_from_config():
+    config = {'name': 'custom',
+              'periods': [[2022, ['LANDSAT/LC09/C02/T1_L2']],
+                          [2013, ['LANDSAT/LC08/C02/T1_L2']]],
+              'end': 2030}
+    table = priority.PriorityTable.from_config(config)
+    assert table.breaks == [2013, 2022, 2030]
+    assert table.satellites(2021) == ['LANDSAT/LC08/C02/T1_L2']
+    assert table.satellites(2022) == ['LANDSAT/LC09/C02/T1_L2']
+    with pytest.raises(KeyError):
+        table.period(2030)
+    with pytest.raises(KeyError):
+        table.period(2012)
+
+
+def test_clamp():
+    table = priority.DEFAULT_TABLE
+    assert table.satellites(table.clamp(1960)) == [priority.ID1]
+    last = table.breaks[-1] - 1
+    assert table.clamp(last + 50) == last
+    assert table.satellites(table.clamp(last + 50)) == table.satlist[-1]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import ee
+ee.Initialize()
+from geebap import scores, bap, season, masks, filters
+from geetools import tools
+
+
+# SEASON
+seas = season.Season('11-15', '02-15')
+
+# SITES
+site = ee.Geometry.Polygon(
+    [[[-71.78, -42.79],
+      [-71.78, -42.89],
+      [-71.57, -42.89],
+      [-71.57, -42.79]]])
+p = ee.Geometry.Point([-71.68, -42.84])
+
+
+def make_bap(score_dtype=None):
+    return bap.Bap(season=seas,
+                   scores=(scores.Index(), scores.MaskPercent(),
+                           scores.Satellite(), scores.CloudDist()),
+                   masks=(masks.Mask(),),
+                   filters=(filters.CloudCover(),),
+                   score_dtype=score_dtype)
+
+
+def test_uint8_selection():
+    float_bap = make_bap()
+    quant_bap = make_bap('uint8')
+
+    step = quant_bap.score_step
+    assert step == float_bap.max_score / 255.0
+
+    # Float score of every image in the collection at the point
+    float_col = float_bap.compute_scores(2016, site)
+    float_values = tools.imagecollection.getValues(float_col, p, 30,
+                                                   side='client')
+    float_scores = dict(
+        [((val['col_id'], val['date']), val['score'])
+         for val in float_values.values() if val['score'] is not None])
+    best_float = max(float_scores.values())
+
+    # Pixel selected using the quantized score
+    composite = quant_bap.build_composite_best(2016, site)
+    selected = tools.image.getValue(composite, p, 30, side='client')
+    selected_float = float_scores[(selected['col_id'], selected['date'])]
+
+    assert abs(selected['score'] * step - selected_float) <= step
+    assert best_float - selected_float <= step
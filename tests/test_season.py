@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import numpy as np
+from geebap import season
+
+
+def test_is_leap():
+    assert season.is_leap(2000)
+    assert season.is_leap(2016)
+    assert not season.is_leap(1900)
+    assert not season.is_leap(2017)
+
+
+def test_dates():
+    seas = season.Season('11-15', '02-29')
+    assert seas.over_end
+    assert seas.dates(2016) == (datetime.date(2015, 11, 15),
+                                datetime.date(2016, 2, 29))
+    assert seas.dates(2017)[1] == datetime.date(2017, 2, 28)
+    assert seas.range_in_days == 105
+    assert seas.date_range_millis(2017)[0] == 1479168000000
+
+
+def test_date_range_table():
+    seas = season.Season('11-15', '02-29')
+    years = list(range(1995, 2030))
+    table = seas.date_range_table(years)
+    for year, start, end in zip(years, table['start'], table['end']):
+        expected = seas.dates(year)
+        assert start == np.datetime64(expected[0])
+        assert end == np.datetime64(expected[1])
+
+
+def test_date():
+    seas = season.Season('11-15', '02-29')
+    assert seas.date('01-15', 2017) == datetime.date(2017, 1, 15)
+    assert seas.date('12-01', 2017) == datetime.date(2016, 12, 1)
+    seas = season.Season('01-01', '03-31')
+    assert seas.date('02-29', 2017) == datetime.date(2017, 2, 28)
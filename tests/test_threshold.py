@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import ee
+import pytest
 ee.Initialize()
 from geebap import scores
 from geetools import tools
@@ -36,3 +37,26 @@ def test_minmax():
     assert val1 == 1
     assert val2 == 0
     assert val3 == 0
+
+
+def test_only_max():
+
+    thres = scores.Threshold()
+    newimg = thres.compute(img, thresholds={
+        'B4': {'max':2000}
+    }, name=thres.name)
+
+    val1 = tools.image.getValue(newimg, point=p1, scale=30, side='client')[thres.name]
+    val2 = tools.image.getValue(newimg, point=p2, scale=30, side='client')[thres.name]
+    val3 = tools.image.getValue(newimg, point=p3, scale=30, side='client')[thres.name]
+
+    assert val1 == 1
+    assert val2 == 1
+    assert val3 == 0
+
+
+def test_bands_required():
+    thres = scores.Threshold()
+    assert thres.required_bands == []
+    with pytest.raises(ValueError):
+        thres.map(ee.ImageCollection([img]))
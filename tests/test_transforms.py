@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+import ee
+ee.Initialize()
+from geetools import collection
+from geebap import transforms, priority, functions
+
+site = ee.Geometry.Polygon(
+    [[[-71.78, -42.79],
+      [-71.78, -42.89],
+      [-71.57, -42.89],
+      [-71.57, -42.79]]])
+
+TARGET = collection.Landsat8SR()
+
+
+def current_chain(image, col, harmonize):
+    """ Rescale and harmonize as two separate steps """
+    image = collection.rescale(image, col, TARGET, renamed=True)
+    if harmonize and 'harmonize' in col.algorithms.keys():
+        image = col.harmonize(image, renamed=True)
+    return image
+
+
+def max_value(image, reference):
+    """ Maximum of each band in the projection of the reference image, so
+    resampling is not measured """
+    projection = reference.projection().getInfo()
+    return image.reduceRegion(
+        ee.Reducer.max(), site, crs=projection['crs'],
+        crsTransform=projection['transform']).getInfo()
+
+
+def max_difference(first, second, bands):
+    difference = first.select(bands).toFloat() \
+        .subtract(second.select(bands).toFloat()).abs()
+    return max_value(difference, first.select(bands[0]))
+
+
+def test_harmonize_coefficients():
+    l8 = collection.Landsat8SR()
+    coefficients = transforms.harmonize_coefficients(l8)
+    gain, offset = coefficients['red']
+    assert abs(gain - 1 / 0.9825) < 1e-9
+    assert abs(offset - 0.0022 * 10000 / 0.9825) < 1e-9
+    assert transforms.harmonize_coefficients(collection.Landsat7SR()) == {}
+
+
+def test_resample():
+    l8 = collection.Landsat8SR()
+    harmonized = transforms.linear_transform(l8, TARGET, True)
+    red = harmonized.bands.index('red')
+    assert harmonized.resample[red]
+    assert not any(transforms.linear_transform(l8, TARGET, False).resample)
+
+
+def test_equivalence():
+    ids = set()
+    for satellites in priority.DEFAULT_TABLE.satlist:
+        ids.update(satellites)
+    ids.update([priority.S2, priority.S2SR])
+
+    for col_id in sorted(ids):
+        col = priority.get_collection(col_id)
+        image = col.rename(ee.Image(col.collection.filterBounds(site).first()))
+        for harmonize in (True, False):
+            transform = transforms.linear_transform(col, TARGET, harmonize)
+            if not transform.bands:
+                continue
+            fused = transforms.apply(image, transform)
+            chain = current_chain(image, col, harmonize)
+            differences = max_difference(fused, chain, list(transform.bands))
+            for band, value in differences.items():
+                precision = transform.precisions[
+                    transform.bands.index(band)]
+                # the chain rounds twice when it harmonizes
+                tolerance = 1e-4 if precision in ('float', 'double') else 2
+                assert value is None or value <= tolerance, (col_id, band)
+
+
+def test_correct_composite():
+    l8 = collection.Landsat8SR()
+    col_id = functions.get_col_id(l8)
+    image = l8.rename(ee.Image(l8.collection.filterBounds(site).first()))
+    bands = list(transforms.HARMONIZE_BANDS)
+    composite = image.addBands(ee.Image.constant(col_id).rename('col_id'))
+    corrected = transforms.correct_composite(
+        composite, [l8], [col_id], TARGET, bands, harmonize=True)
+    transform = transforms.linear_transform(l8, TARGET, True)
+    differences = max_difference(corrected, transforms.apply(image, transform),
+                                 bands)
+    for band, value in differences.items():
+        assert value is None or value <= 1, band
+
+    unchanged = transforms.correct_composite(composite, [l8], [col_id],
+                                             TARGET, bands)
+    assert unchanged is composite
+
+
+def test_correct_composite_brdf():
+    l8 = collection.Landsat8SR()
+    col_id = functions.get_col_id(l8)
+    image = l8.rename(ee.Image(l8.collection.filterBounds(site).first()))
+    bands = list(transforms.HARMONIZE_BANDS)
+    date = ee.Number.parse(image.date().format('yyyyMMdd'))
+    composite = image \
+        .addBands(ee.Image.constant(col_id).rename('col_id')) \
+        .addBands(ee.Image.constant(date).toUint32().rename('date'))
+    corrected = transforms.correct_composite(composite, [l8], [col_id],
+                                             TARGET, bands, brdf=True)
+    scene = l8.brdf(image, renamed=True)
+
+    # the composite takes a nadir view and the scene views up to 7.5°, so
+    # the c-factors differ up to about 8%. Dark pixels are left out because
+    # of the rounding to integers
+    valid = image.select(bands).gt(100)
+    ratio = corrected.select(bands).toFloat() \
+        .divide(scene.select(bands).toFloat()).subtract(1).abs() \
+        .updateMask(valid)
+    for band, value in max_value(ratio, image.select(bands[0])).items():
+        assert value is None or value <= 0.08, band
+
+    # pixels of collections without a BRDF correction are not changed
+    unchanged = transforms.correct_composite(
+        composite, [collection.Sentinel2()], [col_id], TARGET, bands,
+        brdf=True)
+    for band, value in max_difference(unchanged, image, bands).items():
+        assert value is None or value == 0, band